@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+'''
+Benchmarks of the G2VPico client against the local Pico simulator.
+
+Per-command latency percentiles and bulk operation throughput are measured
+for every combination of channel count and simulated network round trip
+time, and written as JSON. The round trip delays the responses like a
+network does, so a pipelined batch costs one round trip. A service time
+can be added on top of it, which the simulator spends on every command in
+turn. A run can be compared against a stored baseline to flag
+regressions.
+
+    python -m benchmarks.bench_client --output results.json
+    python -m benchmarks.bench_client --output results.json --compare baseline.json
+'''
+
+import argparse
+import datetime as dt
+import json
+import math
+import platform
+import sys
+import time
+
+from g2vpico import G2VPico
+from g2vpico.simulator import DEFAULT_PICO_ID, PicoSimulator
+
+RESULTS_VERSION = 1
+
+# Commands timed one call at a time, each is called with a connected pico
+LATENCY_CASES = {
+    'get_channel_value': lambda pico: pico.get_channel_value(1),
+    'set_channel_value': lambda pico: pico.set_channel_value(1, 100),
+    'get_channel_limit': lambda pico: pico.get_channel_limit(1),
+    'get_channel_wavelength_range': lambda pico: pico.get_channel_wavelength_range(1),
+    'get_global_intensity': lambda pico: pico.get_global_intensity(),
+    'set_global_intensity': lambda pico: pico.set_global_intensity(50.0),
+    'is_fixture_on': lambda pico: pico.is_fixture_on(),
+    'turn_on': lambda pico: pico.turn_on(),
+}
+
+def percentile(ordered, percent):
+    ''' nearest rank percentile of a sorted list '''
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def summarize(durations):
+    ''' latency statistics in milliseconds of a list of durations in seconds '''
+    ordered = sorted(durations)
+    return {
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+        'samples': len(ordered),
+    }
+
+
+def time_calls(function, iterations):
+    ''' durations in seconds of iterations calls of function '''
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        function()
+        durations.append((time.perf_counter_ns() - start) / 1e9)
+    return durations
+
+
+def throughput(function, iterations, items):
+    ''' operations and items per second of iterations calls of function '''
+    start = time.perf_counter()
+    for index in range(iterations):
+        function(index)
+    elapsed = time.perf_counter() - start
+    return {
+        'ops_per_sec': iterations / elapsed,
+        'items_per_sec': iterations * items / elapsed,
+        'seconds': elapsed,
+    }
+
+
+def bench_latency(pico, iterations):
+    ''' latency percentiles of every command in LATENCY_CASES '''
+    results = {}
+    for name, case in LATENCY_CASES.items():
+        case(pico)
+        results[name] = summarize(time_calls(lambda: case(pico), iterations))
+    return results
+
+
+def bench_throughput(pico, iterations):
+    ''' throughput of the bulk spectrum operations and of waveform playback '''
+    channels = pico.channel_list
+    spectra = [[{'channel': str(channel), 'value': (channel + offset) % 4000} for channel in channels]
+               for offset in range(2)]
+
+    results = {}
+    results['set_spectrum'] = throughput(lambda index: pico.set_spectrum(spectra[index % 2]), iterations, len(channels))
+    results['get_spectrum'] = throughput(lambda index: pico.get_spectrum(), iterations, len(channels))
+    results['clear_channels'] = throughput(lambda index: pico.clear_channels(), iterations, len(channels))
+
+    try:
+        from g2vpico.waveform import Samples, WaveformPlayer
+    except ImportError:
+        # waveform playback needs numpy
+        return results
+
+    # a timeline whose steps are all due at once measures the step rate the client can reach
+    steps = iterations * 10
+    timeline = Samples([index % 1000 / 10 for index in range(steps)], interval=1e-9).timeline()
+    player = WaveformPlayer(pico, timeline)
+    start = time.perf_counter()
+    player.play()
+    elapsed = time.perf_counter() - start
+    results['waveform_playback'] = {
+        'ops_per_sec': len(timeline) / elapsed,
+        'items_per_sec': len(timeline) / elapsed,
+        'seconds': elapsed,
+    }
+    return results
+
+
+def run(channel_counts, rtts, iterations, service_time=0.0):
+    '''
+    Run every benchmark for each channel count and simulated round trip time
+
+    Parameters
+    ----------
+    channel_counts : list
+        The channel counts to simulate
+
+    rtts : list
+        The network round trip times in seconds to simulate
+
+    iterations : int
+        The calls timed for each latency benchmark
+
+    service_time : float
+        The time in seconds the simulator spends on each command
+
+    Returns
+    -------
+    dict
+        The results keyed by "<kind>/<benchmark>/ch=<channels>/rtt=<seconds>"
+    '''
+    results = {}
+    for channel_count in channel_counts:
+        for rtt in rtts:
+            with PicoSimulator(channels=channel_count, latency=service_time, rtt=rtt) as simulator:
+                pico = G2VPico('127.0.0.1', DEFAULT_PICO_ID, port=simulator.port)
+                try:
+                    suffix = f"ch={channel_count}/rtt={rtt}"
+                    for name, result in bench_latency(pico, iterations).items():
+                        results[f"latency/{name}/{suffix}"] = result
+                    for name, result in bench_throughput(pico, max(iterations // 10, 1)).items():
+                        results[f"throughput/{name}/{suffix}"] = result
+                finally:
+                    pico.close()
+
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    '''
+    Compare results against a baseline
+
+    A latency benchmark regresses when its p50 or p99 is more than threshold
+    slower, and a throughput benchmark when its ops_per_sec is more than
+    threshold lower.
+
+    Returns
+    -------
+    list
+        (key, metric, baseline, current, change) for every regression
+    '''
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key, None)
+        if base is None:
+            continue
+
+        if key.startswith('latency/'):
+            for metric in ('p50_ms', 'p99_ms'):
+                if base[metric] > 0 and result[metric] > base[metric] * (1 + threshold):
+                    regressions.append((key, metric, base[metric], result[metric], result[metric] / base[metric] - 1))
+        elif base['ops_per_sec'] > 0 and result['ops_per_sec'] < base['ops_per_sec'] * (1 - threshold):
+            regressions.append((key, 'ops_per_sec', base['ops_per_sec'], result['ops_per_sec'],
+                                result['ops_per_sec'] / base['ops_per_sec'] - 1))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the G2VPico client against the Pico simulator")
+    parser.add_argument('--channels', type=int, nargs='+', default=[8, 32], help="Channel counts to simulate")
+    parser.add_argument('--rtt', type=float, nargs='+', default=[0.0, 0.001],
+                        help="Simulated network round trip times in seconds")
+    parser.add_argument('--service-time', type=float, default=0.0,
+                        help="Simulated time in seconds the Pico spends on each command")
+    parser.add_argument('--iterations', type=int, default=200, help="Calls timed for each latency benchmark")
+    parser.add_argument('--output', default=None, help="Write the results to this JSON file")
+    parser.add_argument('--compare', default=None, help="A baseline results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Relative change flagged as a regression")
+    args = parser.parse_args(argv)
+
+    data = {}
+    data['version'] = RESULTS_VERSION
+    data['timestamp'] = dt.datetime.now().isoformat()
+    data['python'] = platform.python_version()
+    data['platform'] = platform.platform()
+    data['service_time'] = args.service_time
+    data['results'] = run(args.channels, args.rtt, args.iterations, args.service_time)
+
+    for key, result in data['results'].items():
+        if key.startswith('latency/'):
+            print(f"{key:<60} p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms")
+        else:
+            print(f"{key:<60} {result['ops_per_sec']:10.1f} ops/s  {result['items_per_sec']:12.1f} items/s")
+
+    if args.output is not None:
+        with open(args.output, 'w') as outfile:
+            json.dump(data, outfile, indent=4)
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as infile:
+            baseline = json.load(infile)
+
+        regressions = compare(data['results'], baseline['results'], args.threshold)
+        for key, metric, base, current, change in regressions:
+            print(f"REGRESSION {key} {metric}: {base:.3f} -> {current:.3f} ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}")
+
+    return 0
+
+
+if __name__=="__main__":
+    sys.exit(main())
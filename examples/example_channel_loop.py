@@ -3,10 +3,12 @@
 '''
 This example demonstrates how to loop through all channels in a Pico and increment
 the channel value from 0 to the maximum limit of the channel.
+
+Commands are paced to the rate the Pico sustains instead of sleeping a fixed
+time between them, the learned rate is printed after each channel.
 '''
 
-import time
-from g2vpico import G2VPico
+from g2vpico import G2VPico, Pacer
 
 PICO_ID = "00000000c2ca735f"
 
@@ -14,7 +16,8 @@ PICO_IP_ADDRESS = "192.168.1.69"
 
 def main():
     ## Create an instance of the G2VPico
-    pico = G2VPico(PICO_IP_ADDRESS, PICO_ID)
+    pacer = Pacer()
+    pico = G2VPico(PICO_IP_ADDRESS, PICO_ID, pacer=pacer)
 
     print(str(pico))
 
@@ -36,7 +39,7 @@ def main():
     pico.turn_on()
 
     ## Go through each channel and change the value until the limit is reached
-    ## Sleep for 10 ms between each change
+    ## The pacer spaces the changes at the highest rate the Pico keeps up with
     for channel in pico.channel_list:
         value = 0
         channel_limit = pico.get_channel_limit(channel)
@@ -45,10 +48,9 @@ def main():
             pico.set_channel_value(channel, value)
             print("Changing Pico channel {c} to value {v}".format(c=channel, v=value), end="\r")
             value += 10
-            time.sleep(0.01)
 
         pico.set_channel_value(channel, 0)
-        print("Finished going through channel {c}".format(c=channel))
+        print("Finished going through channel {c} at {r:.1f} commands/s".format(c=channel, r=pacer.rate))
 
     pico.turn_off()
     print("Turning off the Pico")
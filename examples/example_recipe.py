@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+'''
+This example script shows how to replay a year of 1 minute irradiance data
+from a CSV file on the global intensity of the pico. The rows are streamed
+from the file while they are played and the recipe time of the last step is
+saved, so running the script again resumes where it stopped.
+'''
+
+import json
+import os
+import sys
+
+from g2vpico import G2VPico, RecipePlayer
+from g2vpico.recipe import dedupe, quantize, read_csv, resample
+
+PICO_ID                 = "00000000c2ca735f"
+PICO_IP_ADDRESS         = "192.168.1.69"
+
+IRRADIANCE_CSV          = "irradiance.csv"
+POSITION_FILE           = "irradiance_position.json"
+
+# irradiance in W/m2 that is played as 100% global intensity
+FULL_SUN                = 1000.0
+
+if __name__=="__main__":
+
+    # create a pico object, make sure it is turned off
+    pico = G2VPico(PICO_IP_ADDRESS, PICO_ID)
+    pico.turn_off()
+
+    start = None
+    if os.path.isfile(POSITION_FILE):
+        with open(POSITION_FILE, 'r') as infile:
+            start = json.load(infile)['position']
+        print(f"Resuming from recipe time {start}")
+
+    # parse, resample to the minute, scale to a percentage, round to 0.1% and drop unchanged steps
+    rows = read_csv(IRRADIANCE_CSV, time_column='timestamp', value_column='ghi', start=start)
+    rows = ((time_s, ghi / FULL_SUN * 100) for time_s, ghi in resample(rows, 60))
+    player = RecipePlayer(pico, dedupe(quantize(rows, 0.1, 0, 100)))
+
+    try:
+        pico.turn_on()
+        stats = player.play(start=start)
+        print(f"Step timing: {stats}")
+    except KeyboardInterrupt:
+        print("Keyboard Interrupt Caught - Exiting script")
+    finally:
+        if player.position is not None:
+            with open(POSITION_FILE, 'w') as outfile:
+                json.dump({'position': player.position}, outfile)
+        print("Turning off the Pico")
+        pico.turn_off()
+
+    sys.exit(0)
@@ -12,10 +12,15 @@ import warnings
 import os
 
 from g2vpico import G2VPico
+from g2vpico.latency import measure_latency
+from g2vpico.scheduler import Scheduler
 
 PICO_ID                 = "00000000c2ca735f"
 PICO_IP_ADDRESS         = "192.168.1.69"
 
+# the minimum dwell time when there is no connected Pico to measure
+DEFAULT_MINIMUM_STEP    = 0.25
+
 class TimestepWarning(UserWarning):
     pass
 
@@ -25,9 +30,14 @@ class IntensityWarning(UserWarning):
 class SawtoothWaveform():
     ''' class to run a sawtooth on a pico '''
 
-    def __init__(self, picoobj):
+    def __init__(self, picoobj, calibrate=True):
+        '''
+        picoobj is the pico to run the waveform on. When calibrate is True and
+        it is a connected G2VPico, the minimum step is derived from its
+        measured latency, otherwise DEFAULT_MINIMUM_STEP is used.
+        '''
 
-        self._waveform_minimum_step = 0.25  # minimum dwell time
+        self._waveform_minimum_step = DEFAULT_MINIMUM_STEP  # minimum dwell time
 
         self._period = None
         self._cycles = None
@@ -42,9 +52,17 @@ class SawtoothWaveform():
 
         self.cycle_count = 1
         self.step_count = 0
+        self.lateness = None
 
         self.pico = picoobj
-        
+
+        # only a connected Pico has an ID to measure and cache the latency under
+        if calibrate and getattr(picoobj, 'id', None) is not None:
+            try:
+                self.calibrate()
+            except (ConnectionError, OSError):
+                pass
+
     @property
     def period(self):
         return self._period
@@ -122,6 +140,10 @@ class SawtoothWaveform():
     def timestep(self):
         return self._timestep
 
+    @property
+    def minimum_step(self):
+        return self._waveform_minimum_step
+
     @property
     def verboseFlag(self):
         return self._verboseFlag
@@ -133,6 +155,14 @@ class SawtoothWaveform():
         else:
             raise ValueError("verboseFlag must be a boolean value.")
     
+    def calibrate(self, samples=20):
+        ''' method to derive the minimum step from the measured latency of the pico '''
+        profile = measure_latency(self.pico, samples)
+        self._waveform_minimum_step = profile.minimum_step
+        if self.verboseFlag:
+            print(f"Measured {profile}, minimum step is now {self._waveform_minimum_step} s")
+        return profile
+
     def calculate_timestep(self):
         ''' method to calculate timestep '''
         if self._steps is None:
@@ -176,33 +206,33 @@ class SawtoothWaveform():
         if self.verboseFlag: 
             print(f"Setting Pico global intensity to {self._trough}")
         
-        t0 = dt.datetime.now()
+        # steps are aimed at absolute deadlines on the monotonic clock, so the
+        # time spent sending commands does not add up over the waveform
+        scheduler = Scheduler(self._timestep)
+        self.lateness = scheduler.stats
 
         try:
-            time_next_action = t0 + dt.timedelta(seconds=self._timestep)
-
             while True:
-                if dt.datetime.now() >= time_next_action:
-                    time_next_action = time_next_action + dt.timedelta(seconds=self._timestep)
-
-                    if self.step_count > (self._steps - 1):
-                        if self.verboseFlag:
-                            print(f"Cycle {self.cycle_count} completed")
-                        self.cycle_count += 1
-                        if self.cycle_count > self._cycles:
-                            break
-                        self.step_count = 0
-                    else:
-                        self.step_count += 1
-
-                    next_intensity = self._trough + self.step_count * self._intensitystep
-                    if next_intensity > 100:
-                        warnings.warn("Sawtooth tried to write global intensity above 100.", IntensityWarning)
-                        next_intensity = 100
-
-                    self.pico.set_global_intensity(next_intensity)
+                scheduler.wait()
+
+                if self.step_count > (self._steps - 1):
                     if self.verboseFlag:
-                        print(f"Time: {dt.datetime.now()} Cycle: {self.cycle_count} Step: {self.step_count} Next Intensity: {next_intensity}")
+                        print(f"Cycle {self.cycle_count} completed")
+                    self.cycle_count += 1
+                    if self.cycle_count > self._cycles:
+                        break
+                    self.step_count = 0
+                else:
+                    self.step_count += 1
+
+                next_intensity = self._trough + self.step_count * self._intensitystep
+                if next_intensity > 100:
+                    warnings.warn("Sawtooth tried to write global intensity above 100.", IntensityWarning)
+                    next_intensity = 100
+
+                self.pico.set_global_intensity(next_intensity)
+                if self.verboseFlag:
+                    print(f"Time: {dt.datetime.now()} Cycle: {self.cycle_count} Step: {self.step_count} Next Intensity: {next_intensity}")
 
         except KeyboardInterrupt:
             print("Keyboard Interrupt Caught - Exiting script")
@@ -210,6 +240,7 @@ class SawtoothWaveform():
             print(f"Unknown exception occurred - {e}")
         finally:
             if self.verboseFlag:
+                print(f"Step timing: {self.lateness}")
                 print("Setting Pico to zero spectrum")
             self.pico.turn_off()
             self.pico.clear_channels()
@@ -231,7 +262,7 @@ if __name__=="__main__":
         print("Setting Pico to use test spectrum")
         pico.set_spectrum(new_spectrum)
 
-        waveformgenerator = SawtoothWaveform(pico)      # create sawtooth generator with pico object
+        waveformgenerator = SawtoothWaveform(pico)      # create sawtooth generator, it measures how short the steps can be
         waveformgenerator.verboseFlag = True
 
         # Adjust these paramters to change waveform
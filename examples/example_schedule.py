@@ -10,6 +10,7 @@ import time
 import json
 import datetime as dt
 from g2vpico import G2VPico
+from g2vpico.scheduler import Scheduler
 
 PICO_ID = "00000000c2ca735f"
 
@@ -23,8 +24,6 @@ def main():
 
     print(str(pico))
 
-    spectrum_check_time = dt.datetime.now()
-
     pico.turn_off()
 
     if os.path.isfile("test_spectrum.json") is False:
@@ -40,22 +39,25 @@ def main():
         print("Setting Pico global intensity to 100.0%")
         pico.set_global_intensity(100.0)
 
+        scheduler = Scheduler(SPECTRUM_PERIOD_SEC)
+
         try:
             while True:
-                if (dt.datetime.now() >= (spectrum_check_time + dt.timedelta(seconds=SPECTRUM_PERIOD_SEC))):
-                    spectrum_check_time = dt.datetime.now()
-                    if pico.is_fixture_on():
-                        print("{dt} Turning Pico Off".format(dt=spectrum_check_time))
-                        pico.turn_off()
-                    else:
-                        print("{dt} Turning Pico On".format(dt=spectrum_check_time))
-                        pico.turn_on()
+                scheduler.wait()
+                spectrum_check_time = dt.datetime.now()
+                if pico.is_fixture_on():
+                    print("{dt} Turning Pico Off".format(dt=spectrum_check_time))
+                    pico.turn_off()
+                else:
+                    print("{dt} Turning Pico On".format(dt=spectrum_check_time))
+                    pico.turn_on()
 
         except KeyboardInterrupt:
             print("Exiting script")
         except Exception as e:
             print("Unknown exception occurred - {e}".format(e=e))
         finally:
+            print("Step timing: {stats}".format(stats=scheduler.stats))
             print("Turning off the Pico")
             pico.turn_off()
             pico.clear_channels()
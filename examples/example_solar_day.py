@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+'''
+This example script shows how to play a clear-sky solar day on the
+global intensity of the pico, compressed to play a day in 24 minutes
+'''
+
+import json
+import os
+import sys
+
+from g2vpico import G2VPico
+from g2vpico.solar import solar_timeline
+from g2vpico.waveform import WaveformPlayer
+
+PICO_ID                 = "00000000c2ca735f"
+PICO_IP_ADDRESS         = "192.168.1.69"
+
+LATITUDE                = 45.42
+LONGITUDE               = -75.70
+
+# solar seconds played per second
+COMPRESSION             = 60
+
+if __name__=="__main__":
+
+    # create a pico object, make sure it is turned off
+    pico = G2VPico(PICO_IP_ADDRESS, PICO_ID)
+    pico.turn_off()
+    pico.clear_channels()
+
+    if os.path.isfile("test_spectrum.json") is False:
+        print("ERROR: Could not find test_spectrum.json file")
+        print("Exiting script")
+    else:
+        with open("test_spectrum.json", 'r') as infile:
+            new_spectrum = json.load(infile)
+
+        print("Setting Pico to use test spectrum")
+        pico.set_spectrum(new_spectrum)
+
+        # the summer solstice from local midnight, the profile is computed once and then read from the cache
+        timeline = solar_timeline(LATITUDE, LONGITUDE, '2023-06-21T05:00', '2023-06-22T05:00',
+                                  compression=COMPRESSION, cache_dir="solar_cache")
+        print(f"Playing {timeline}")
+
+        try:
+            pico.set_global_intensity(timeline.values[0])
+            pico.turn_on()
+            stats = WaveformPlayer(pico, timeline).play()
+            print(f"Step timing: {stats}")
+        except KeyboardInterrupt:
+            print("Keyboard Interrupt Caught - Exiting script")
+        finally:
+            print("Setting Pico to zero spectrum")
+            pico.turn_off()
+            pico.clear_channels()
+
+    sys.exit(0)
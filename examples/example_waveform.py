@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+'''
+This example script shows how to play a precomputed sine waveform
+on the global intensity of the pico
+'''
+
+import json
+import os
+import sys
+
+from g2vpico import G2VPico
+from g2vpico.waveform import Sine, WaveformPlayer
+
+PICO_ID                 = "00000000c2ca735f"
+PICO_IP_ADDRESS         = "192.168.1.69"
+
+if __name__=="__main__":
+
+    # create a pico object, make sure it is turned off
+    pico = G2VPico(PICO_IP_ADDRESS, PICO_ID)
+    pico.turn_off()
+    pico.clear_channels()
+
+    if os.path.isfile("test_spectrum.json") is False:
+        print("ERROR: Could not find test_spectrum.json file")
+        print("Exiting script")
+    else:
+        with open("test_spectrum.json", 'r') as infile:
+            new_spectrum = json.load(infile)
+
+        print("Setting Pico to use test spectrum")
+        pico.set_spectrum(new_spectrum)
+
+        # 5 cycles of a 10 second sine wave between 20% and 90% global intensity,
+        # sampled 200 times per cycle and rounded to 0.1%
+        timeline = Sine(period=10, steps=200, trough=20, peak=90).timeline(cycles=5, resolution=0.1)
+        print(f"Playing {timeline}")
+
+        try:
+            pico.set_global_intensity(timeline.values[0])
+            pico.turn_on()
+            stats = WaveformPlayer(pico, timeline).play()
+            print(f"Step timing: {stats}")
+        except KeyboardInterrupt:
+            print("Keyboard Interrupt Caught - Exiting script")
+        finally:
+            print("Setting Pico to zero spectrum")
+            pico.turn_off()
+            pico.clear_channels()
+
+    sys.exit(0)
@@ -25,7 +25,11 @@ POSSIBILITY OF SUCH DAMAGE.
 
 import traceback
 import socket
-import json
+import time
+
+from . import protocol
+from .protocol import MessageDecoder
+from .shadow import ShadowState
 
 class G2VPico():
     '''
@@ -33,7 +37,8 @@ class G2VPico():
     '''
     __DEFAULT_PORT_NUMBER = 50000
 
-    def __init__(self, ip_address, pico_id):
+    def __init__(self, ip_address, pico_id, port=None, metadata_cache=None, validate_metadata=True,
+                 shadow=False, metrics=None, recorder=None, pacer=None):
         '''
         Parameters
         ----------
@@ -42,22 +47,73 @@ class G2VPico():
 
         pico_id : str
             The 16 character ID of the Pico
+
+        port : int, optional
+            The TCP port of the Pico API, defaults to 50000
+
+        metadata_cache : MetadataCache, optional
+            When given, the channel list, channel limits and wavelength ranges
+            are loaded from the cache instead of the Pico, and stored in it
+            when they are read from the Pico
+
+        validate_metadata : bool
+            When True cached metadata is only used if the channel count reported
+            by the Pico still matches, which costs a single round trip
+
+        shadow : bool
+            When True a copy of the channel values, global intensity and fixture
+            state is kept from every acknowledged command. Reads are answered from
+            the copy and set_spectrum only sends channels whose value changes.
+
+        metrics : MetricsHook, optional
+            Receives the latency, bytes and errors of every command, for example
+            a PicoMetrics. Nothing is measured when it is not given.
+
+        recorder : Recorder, optional
+            Appends every command and response with its time to a session log
+            that can be replayed later
+
+        pacer : Pacer, optional
+            Paces commands to the rate the Pico sustains, learned from the
+            round trip time of every command
         '''
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._ip_address = ip_address
+        self._port = G2VPico.__DEFAULT_PORT_NUMBER if port is None else int(port)
         self._id = str(pico_id)
+        self._decoder = MessageDecoder()
+
+        self._metadata_cache = metadata_cache
+        self._channel_count = None
+        self._channel_list = None
+        self._channel_limits = None
+        self._wavelength_ranges = None
+        self._shadow = ShadowState() if shadow else None
+        self._metrics = metrics
+        self._recorder = recorder
+        self._pacer = pacer
 
         init_success = True
         try:
-            self._socket.connect((self._ip_address, G2VPico.__DEFAULT_PORT_NUMBER))
+            self._socket.connect((self._ip_address, self._port))
         except ConnectionRefusedError:
             init_success = False
 
         if not init_success:
             raise ConnectionRefusedError(f"Connection to PICO at {ip_address} refused")
 
-        self._channel_count = self.__get_channel_count()
-        self._channel_list = self.__get_channel_list()
+        if self._metrics is not None:
+            self._metrics.on_connect(self._id)
+
+        if metadata_cache is not None:
+            self.__load_metadata(validate_metadata)
+
+        if self._channel_list is None:
+            if metadata_cache is None:
+                self._channel_count, self._channel_list = self.__execute_batch(
+                    [protocol.get_channel_count(self._id), protocol.get_channel_list(self._id)])
+            else:
+                self.refresh_metadata()
 
         if self._channel_count is None or self._channel_list is None:
             raise Exception("Instance can not be initialized")
@@ -77,12 +133,22 @@ class G2VPico():
         restricted_list.append("get_channel_limit")
         restricted_list.append("get_spectrum")
         restricted_list.append("set_spectrum")
+        restricted_list.append("get_spectrum_array")
+        restricted_list.append("set_spectrum_array")
         restricted_list.append("get_channel_wavelength_range")
         restricted_list.append("get_global_intensity")
         restricted_list.append("set_global_intensity")
         restricted_list.append("turn_off")
         restricted_list.append("turn_on")
         restricted_list.append("is_fixture_on")
+        restricted_list.append("batch")
+        restricted_list.append("refresh_metadata")
+        restricted_list.append("shadow")
+        restricted_list.append("verify")
+        restricted_list.append("metrics")
+        restricted_list.append("recorder")
+        restricted_list.append("pacer")
+        restricted_list.append("close")
 
         return restricted_list
 
@@ -107,89 +173,252 @@ class G2VPico():
         '''
         return self._channel_list
 
-    ### Private Internal Methods    
-
-    def __error_handler(self, error, command):
-        if "Pico ID invalid" in error:
-            raise RuntimeError("Pico ID is invalid")
-        if "Command type invalid" in error:
-            raise NotImplementedError(f"Command {command} is not implemented")
-        if "Pico is not Variable" in error:
-            raise RuntimeError("Operation not allowed in Fixed Picos")
-        if "Pico API not enabled" in error:
-            raise RuntimeError("Pico API not enabled")
-        
-        raise Exception(f"Unknown error occurred: {error}")
+    @property
+    def shadow(self):
+        '''
+        The ShadowState holding the last acknowledged state of the Pico,
+        None when the Pico was created without shadow state
+        '''
+        return self._shadow
 
-    def __send_cmd(self, cmd):
+    @property
+    def metrics(self):
+        '''
+        The MetricsHook receiving the traffic of the Pico, None when not measured
+        '''
+        return self._metrics
+
+    @property
+    def recorder(self):
+        '''
+        The Recorder writing the session log of the Pico, None when not recorded
+        '''
+        return self._recorder
+
+    @property
+    def pacer(self):
+        '''
+        The Pacer limiting the command rate of the Pico, None when not paced
+        '''
+        return self._pacer
+
+    def close(self):
+        '''
+        Close the connection to the Pico
+        '''
+        self._socket.close()
+        self._decoder.clear()
+
+    ### Private Internal Methods
+
+    def __send_cmd(self, request):
+        if self._metrics is not None or self._recorder is not None or self._pacer is not None:
+            return self.__send_many([request])[0]
 
         try:
-            self._socket.sendall(json.dumps(cmd).encode('utf-8'))
+            self._socket.sendall(request.encode())
         except Exception as e:
-            print(f"Failed to send cmd {cmd} - {e} - {traceback.format_exc()}")
+            print(f"Failed to send cmd {request.cmd} - {e} - {traceback.format_exc()}")
             return None
 
-        data = self._socket.recv(1024)
-        data = data.decode('utf-8')
-        if data is not None:
-            return json.loads(data)
+        return self.__recv_responses(1)[0]
 
-        return None
+    def __send_many(self, requests):
+        '''Internal method for writing several commands back-to-back and reading all responses'''
+        if not requests:
+            return []
 
+        payload = b''.join(request.encode() for request in requests)
+        if self._pacer is not None:
+            return self.__send_paced(requests, payload)
 
-    def __get_channel_count(self):
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'get_channel_count'
-        response = self.__send_cmd(cmd)
-
-        if response is not None:
-            new_cmd = response.get('cmd')
-            error = response.get('error', None)
-            value = response.get('channel_count', None)
-
-            if error is not None:
-                self.__error_handler(error, new_cmd)
-                
-            if new_cmd == cmd['cmd']:
-                return value
+        return self.__send_recorded(requests, payload)
+
+    def __send_recorded(self, requests, payload):
+        '''Internal method for sending the encoded requests, recording them when a recorder is set'''
+        if self._recorder is None:
+            return self.__send_payload(requests, payload)
 
-        return None
+        self._recorder.record_commands(self._id, requests, payload)
+        responses = self.__send_payload(requests, payload)
+        self._recorder.record_responses(self._id, requests, responses)
+        return responses
+
+    def __send_paced(self, requests, payload):
+        '''Internal method for sending the encoded requests at the rate of the pacer and reporting their round trip'''
+        self._pacer.acquire(len(requests))
+        start = time.perf_counter()
+        error = True
+        try:
+            responses = self.__send_recorded(requests, payload)
+            error = any(not isinstance(response, dict) or 'error' in response for response in responses)
+        finally:
+            self._pacer.observe(time.perf_counter() - start, len(requests), error)
+        return responses
 
-    def __get_channel_list(self):
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'get_channel_list'
-        response = self.__send_cmd(cmd)
+    def __send_payload(self, requests, payload):
+        '''Internal method for writing the encoded requests and reading their responses'''
+        if self._metrics is not None:
+            return self.__send_measured(requests, payload)
 
-        if response is not None:
-            new_cmd = response.get('cmd')
-            error = response.get('error', None)
-            value = response.get('channel_list', None)
+        try:
+            self._socket.sendall(payload)
+        except Exception as e:
+            print(f"Failed to send {len(requests)} cmds - {e} - {traceback.format_exc()}")
+            return [None] * len(requests)
 
-            if error is not None:
-                self.__error_handler(error, new_cmd)
+        return self.__recv_responses(len(requests))
 
-            if new_cmd == cmd['cmd']:
-                int_list = [int(x) for x in value]
-                return int_list
+    def __send_measured(self, requests, payload):
+        '''
+        Internal method for writing commands and reading their responses while
+        reporting the latency of each command, its errors and the bytes on the
+        connection to the metrics hook.
+        '''
+        metrics = self._metrics
+        start = time.perf_counter()
 
-        return None
+        try:
+            self._socket.sendall(payload)
+        except Exception as e:
+            print(f"Failed to send {len(requests)} cmds - {e} - {traceback.format_exc()}")
+            for request in requests:
+                metrics.on_command(self._id, request.name, time.perf_counter() - start, 'connection')
+            return [None] * len(requests)
 
-    
-    def __get_channel_check(self, channel):
-        '''Internal method for verifying that a channel is valid and converting to int'''
+        responses = []
+        received = 0
         try:
-            channel = int(channel)
-        except Exception as exc:
-            raise ValueError(f"Channel type of {channel} is invalid") from exc
+            while len(responses) < len(requests):
+                if not self._decoder:
+                    received += self._decoder.recv_into(self._socket)
+
+                seconds = time.perf_counter() - start
+                while self._decoder and len(responses) < len(requests):
+                    response = self._decoder.pop()
+                    error = response.get('error', None) if isinstance(response, dict) else None
+                    category = None if error is None else protocol.error_category(str(error))
+                    metrics.on_command(self._id, requests[len(responses)].name, seconds, category)
+                    responses.append(response)
+        except Exception:
+            for request in requests[len(responses):]:
+                metrics.on_command(self._id, request.name, time.perf_counter() - start, 'connection')
+            raise
+        finally:
+            metrics.on_bytes(self._id, len(payload), received)
+
+        return responses
+
+    def __recv_responses(self, count):
+        '''Internal method for reading the next count responses from the Pico in order'''
+        while len(self._decoder) < count:
+            self._decoder.recv_into(self._socket)
+
+        return [self._decoder.pop() for _ in range(count)]
+
+    def __request(self, request):
+        '''Internal method for sending a single request and returning its result'''
+        result = request.parse(self.__send_cmd(request))
+
+        if self._shadow is not None:
+            self._shadow.update(request, result)
+
+        return result
+
+    def __execute_batch(self, requests):
+        '''
+        Internal method for sending the requests queued in a PicoBatch.
 
-        if channel not in self._channel_list:
-            raise ValueError(f"A channel value of {channel} is invalid")
+        Responses are matched to their request in order. All responses are read
+        before an error is raised so the connection stays in step with the Pico.
+        '''
+        responses = self.__send_many(requests)
 
-        return channel
+        results = []
+        first_error = None
+        for request, response in zip(requests, responses):
+            result = None
+            try:
+                result = request.parse(response)
+            except Exception as exc:
+                if first_error is None:
+                    first_error = exc
+            else:
+                if self._shadow is not None:
+                    self._shadow.update(request, result)
+            results.append(result)
+
+        if first_error is not None:
+            raise first_error
+
+        return results
+
+    def __get_channel_count(self):
+        return self.__request(protocol.get_channel_count(self._id))
+
+    def __load_metadata(self, validate):
+        '''Internal method for taking the channel information from the metadata cache'''
+        metadata = self._metadata_cache.get(self._id)
+        if metadata is None:
+            return False
+
+        try:
+            channel_count = int(metadata['channel_count'])
+            channel_list = [int(x) for x in metadata['channel_list']]
+            channel_limits = list(metadata['channel_limits'])
+            wavelength_ranges = [list(x) for x in metadata['wavelength_ranges']]
+        except (KeyError, TypeError, ValueError):
+            return False
+
+        if len(channel_list) != len(channel_limits) or len(channel_list) != len(wavelength_ranges):
+            return False
+
+        if validate and self.__get_channel_count() != channel_count:
+            return False
+
+        self._channel_count = channel_count
+        self._channel_list = channel_list
+        self._channel_limits = dict(zip(channel_list, channel_limits))
+        self._wavelength_ranges = dict(zip(channel_list, wavelength_ranges))
+        return True
+
+    def __get_channel_check(self, channel):
+        '''Internal method for verifying that a channel is valid and converting to int'''
+        return protocol.check_channel(channel, self._channel_list)
+
+    def __get_channel_values(self):
+        '''Internal method for reading every channel value in a single batch, in the order of channel_list'''
+        values = {}
+        if self._shadow is not None:
+            for channel in self._channel_list:
+                value = self._shadow.channel_value(channel)
+                if value is not None:
+                    values[channel] = value
+
+        unknown_channels = [channel for channel in self._channel_list if channel not in values]
+        batch = self.batch()
+        for channel in unknown_channels:
+            batch.get_channel_value(channel)
+        values.update(zip(unknown_channels, batch.send()))
+
+        return [values[channel] for channel in self._channel_list]
+
+    def __set_channel_values(self, values):
+        '''Internal method for sending validated (channel, value) pairs in a single batch'''
+        with self.batch() as batch:
+            for channel, value in values:
+                if self._shadow is None or self._shadow.channel_value(channel) != value:
+                    batch.set_channel_value(channel=channel, value=value)
+
+    def __get_channel_limits(self):
+        '''Internal method for the channel limits in the order of channel_list, read once in a single batch'''
+        if self._channel_limits is None:
+            batch = self.batch()
+            for channel in self._channel_list:
+                batch.get_channel_limit(channel)
+            self._channel_limits = dict(zip(self._channel_list, batch.send()))
+
+        return [self._channel_limits[channel] for channel in self._channel_list]
 
 
     def get_channel_value(self, channel):
@@ -213,27 +442,12 @@ class G2VPico():
         '''
         channel = self.__get_channel_check(channel)
 
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'get_channel_value'
-        cmd['channel'] = channel
-
-        response = self.__send_cmd(cmd)
-
-        if response is not None:
-            new_cmd = response.get('cmd')
-            channel = response.get('channel')
-            error = response.get('error', None)
-            value = response.get('value', None)
-
-            if error is not None:
-                self.__error_handler(error, new_cmd)
-
-            if new_cmd == cmd['cmd']:
+        if self._shadow is not None:
+            value = self._shadow.channel_value(channel)
+            if value is not None:
                 return value
 
-        return None
+        return self.__request(protocol.get_channel_value(self._id, channel))
 
 
     def set_channel_value(self, channel, value):
@@ -266,34 +480,9 @@ class G2VPico():
             Raised when the value parameter is an invalid type
         '''
         channel = self.__get_channel_check(channel)
+        value = protocol.check_value(value)
 
-        try:
-            value = int(value)
-        except Exception as exc:
-            raise ValueError(f"Value type of {value} is invalid") from exc
-
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'set_channel_value'
-        cmd['channel'] = channel
-        cmd['value'] = value
-
-        response = self.__send_cmd(cmd)
-
-        if response is not None:
-            new_cmd = response.get('cmd')
-            channel = response.get('channel')
-            error = response.get('error', None)
-            result = response.get('result', None)
-
-            if error is not None:
-                self.__error_handler(error, new_cmd)
-
-            if new_cmd == cmd['cmd']:
-                return result
-
-        return None
+        return self.__request(protocol.set_channel_value(self._id, channel, value))
 
 
     def clear_channels(self):
@@ -305,9 +494,10 @@ class G2VPico():
         bool
             True when all channels have been set to 0
         '''
-        result_array = {}
-        for channel in self._channel_list:
-            result_array[channel] = self.set_channel_value(channel,0)
+        with self.batch() as batch:
+            for channel in self._channel_list:
+                if self._shadow is None or self._shadow.channel_value(channel) != 0:
+                    batch.set_channel_value(channel, 0)
 
         return True
 
@@ -339,27 +529,10 @@ class G2VPico():
         '''
         channel = self.__get_channel_check(channel)
 
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'get_channel_limit'
-        cmd['channel'] = channel
+        if self._channel_limits is not None:
+            return self._channel_limits[channel]
 
-        response = self.__send_cmd(cmd)
-
-        if response is not None:
-            new_cmd = response.get('cmd')
-            channel = response.get('channel')
-            error = response.get('error', None)
-            limit = response.get('limit', None)
-
-            if error is not None:
-                self.__error_handler(error, new_cmd)
-
-            if new_cmd == cmd['cmd']:
-                return limit
-
-        return None
+        return self.__request(protocol.get_channel_limit(self._id, channel))
 
 
     def get_spectrum(self):
@@ -374,10 +547,10 @@ class G2VPico():
         '''
         spectrum_array = []
 
-        for channel in self._channel_list:
+        for channel, value in zip(self._channel_list, self.__get_channel_values()):
             spectrum_dict = {}
             spectrum_dict['channel'] = str(channel)
-            spectrum_dict['value'] = self.get_channel_value(channel=channel)
+            spectrum_dict['value'] = value
 
             spectrum_array.append(spectrum_dict)
 
@@ -413,33 +586,157 @@ class G2VPico():
         ValueError
             Raised when the channel is not in the range [0, channel_count]
         '''
-        spectrum_list = []
-        if isinstance(channel_list, str):
-            load_good = True
-            try:
-                spectrum_list = json.loads(channel_list)
-            except Exception:
-                load_good = False
+        values = []
+        for channel, value in protocol.spectrum_items(channel_list):
+            values.append((self.__get_channel_check(channel), protocol.check_value(value)))
+
+        self.__set_channel_values(values)
+
+        return True
+
+
+    def get_spectrum_array(self):
+        '''
+        Get the current spectrum as an array aligned with channel_list
+
+        Requires numpy.
+
+        Returns
+        -------
+        numpy.ndarray
+            The uint16 value of every channel in the order of channel_list
+
+        Exceptions
+        ----------
+        RuntimeError
+            Raised when a channel value could not be read from the Pico
+        '''
+        import numpy as np
+
+        values = self.__get_channel_values()
+        if None in values:
+            raise RuntimeError("Spectrum could not be read from the Pico")
+
+        return np.array(values, dtype=np.uint16)
+
+
+    def set_spectrum_array(self, values, clip=True):
+        '''
+        Load in a spectrum from an array aligned with channel_list or a Spectrum
+
+        The channel limits are read from the Pico once and kept, unless they
+        are already known from the metadata cache. Requires numpy.
+
+        Parameters
+        ----------
+        values : numpy.ndarray, Spectrum
+            The value of every channel in the order of channel_list, or a
+            Spectrum holding any of the channels of the Pico. Like set_spectrum,
+            the channels a Spectrum does not hold keep their value.
+
+        clip : bool
+            When True values are rounded and clipped to [0, channel_limit],
+            otherwise values that are not whole numbers in that range raise
+            a ValueError
+
+        Returns
+        -------
+        bool
+            True if the new spectrum has been loaded
 
-            if not load_good:
-                raise ValueError("Spectrum data could not be loaded")
+        Exceptions
+        ----------
+        ValueError
+            Raised when values does not match channel_list or is out of range
+        '''
+        import numpy as np
+        from .spectrum import Spectrum, clip_values
+
+        channels = self._channel_list
+        if isinstance(values, Spectrum):
+            channels = values.channels.tolist()
+            if not set(channels).issubset(self._channel_list):
+                raise ValueError("Spectrum holds channels that are not available in the Pico")
+            values = values.values
 
-        elif isinstance(channel_list, list):
-            spectrum_list = channel_list
-        else:
-            raise ValueError(f"Spectrum data of type {channel_list} is invalid")
+        values = np.asarray(values)
+        if values.shape != (len(channels),):
+            raise ValueError(f"Spectrum array must hold {len(channels)} values")
 
-        for item in spectrum_list:
-            channel = item.get('channel', None)
-            value = item.get('value', None)
+        if not clip:
+            exact = np.asarray(values, dtype=np.float64)
+            if not np.all(np.isfinite(exact)) or not np.array_equal(exact, np.rint(exact)):
+                raise ValueError("Spectrum array holds values that are not whole numbers")
 
-            result_array = {}
-            if channel and (value or value == 0):
-                result_array[channel] = self.set_channel_value(channel=channel, value=value)
+        limits = dict(zip(self._channel_list, self.__get_channel_limits()))
+        clipped = clip_values(values, [limits[channel] for channel in channels])
+        if not clip and not np.array_equal(clipped, values):
+            raise ValueError("Spectrum array holds values outside of the channel limits")
+
+        self.__set_channel_values(zip(channels, clipped.tolist()))
 
         return True
 
 
+    def refresh_metadata(self):
+        '''
+        Read the channel list, channel limits and wavelength ranges from the Pico.
+
+        Afterwards get_channel_limit and get_channel_wavelength_range are answered
+        without contacting the Pico, and the metadata cache is updated if one is
+        in use. The whole refresh costs two round trips.
+
+        Returns
+        -------
+        bool
+            True if the metadata has been read from the Pico
+        '''
+        channel_count, channel_list = self.__execute_batch(
+            [protocol.get_channel_count(self._id), protocol.get_channel_list(self._id)])
+
+        if channel_count is None or channel_list is None:
+            return False
+
+        self._channel_count = channel_count
+        self._channel_list = channel_list
+
+        batch = self.batch()
+        for channel in channel_list:
+            batch.get_channel_limit(channel)
+            batch.get_channel_wavelength_range(channel)
+        results = batch.send()
+
+        self._channel_limits = dict(zip(channel_list, results[0::2]))
+        self._wavelength_ranges = dict(zip(channel_list, results[1::2]))
+
+        if self._metadata_cache is not None:
+            metadata = {}
+            metadata['channel_count'] = channel_count
+            metadata['channel_list'] = channel_list
+            metadata['channel_limits'] = results[0::2]
+            metadata['wavelength_ranges'] = results[1::2]
+            self._metadata_cache.put(self._id, metadata)
+
+        return True
+
+
+    def batch(self):
+        '''
+        Create a batch of channel commands that are sent to the Pico together.
+
+        Queued commands are written back-to-back in a single send and their
+        responses are collected afterwards, so a batch costs about one round
+        trip no matter how many commands it holds. When used as a context
+        manager the batch is sent on exit.
+
+        Returns
+        -------
+        PicoBatch
+            An empty batch bound to this Pico
+        '''
+        return PicoBatch(self._id, self.__get_channel_check, self.__execute_batch)
+
+
     def get_channel_wavelength_range(self, channel):
         '''
         Returns the minimum and maximum wavelength values for a channel in nm
@@ -466,29 +763,11 @@ class G2VPico():
         '''
         channel = self.__get_channel_check(channel)
 
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'get_channel_range'
-        cmd['channel'] = channel
-
-        response = self.__send_cmd(cmd)
-
-        if response is not None:
-            new_cmd = response.get('cmd')
-            error = response.get('error', None)
-
-            if error is not None:
-                self.__error_handler(error, new_cmd)
-
-            if new_cmd == cmd['cmd']:
-                x_low = response.get('x_low', None)
-                x_high = response.get('x_high', None)
-
-                return [x_low, x_high]
+        if self._wavelength_ranges is not None:
+            return list(self._wavelength_ranges[channel])
 
+        return self.__request(protocol.get_channel_range(self._id, channel))
 
-        return None
 
     def get_global_intensity(self):
         '''
@@ -500,23 +779,11 @@ class G2VPico():
             A value between 0.0 and 100.0 where 100.0 means all channels are fully on
             and a value of 0.0 means all channels are 0.
         '''
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'get_global_intensity'
+        if self._shadow is not None and self._shadow.global_intensity is not None:
+            return self._shadow.global_intensity
 
-        response = self.__send_cmd(cmd)
+        return self.__request(protocol.get_global_intensity(self._id))
 
-        if response is not None:
-            new_cmd = response.get('cmd')
-            error = response.get('error', None)
-
-            if error is not None:
-                raise Exception(error)
-
-            if new_cmd == cmd['cmd']:
-                return response.get('global_intensity', None)
-        return None
 
     def set_global_intensity(self, value):
         '''
@@ -534,24 +801,7 @@ class G2VPico():
             True if the global intensity has been set successfully
             False if the global intensity was not changed
         '''
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'set_global_intensity'
-        cmd['global_intensity'] = value
-
-        response = self.__send_cmd(cmd)
-
-        if response is not None:
-            new_cmd = response.get('cmd')
-            error = response.get('error', None)
-
-            if error is not None:
-                raise Exception(error)
-
-            if new_cmd == cmd['cmd']:
-                return response.get('result', None)
-        return None
+        return self.__request(protocol.set_global_intensity(self._id, value))
 
 
     def turn_off(self):
@@ -564,24 +814,7 @@ class G2VPico():
             True if the fixture was turned off
             False if the fixture failed to turn off
         '''
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'set_fixture_on'
-        cmd['fixture_on'] = False
-
-        response = self.__send_cmd(cmd)
-
-        if response is not None:
-            new_cmd = response.get('cmd')
-            error = response.get('error', None)
-
-            if error is not None:
-                raise Exception(error)
-
-            if new_cmd == cmd['cmd']:
-                return response.get('result', None)
-        return None
+        return self.__request(protocol.set_fixture_on(self._id, False))
 
 
     def turn_on(self):
@@ -594,24 +827,7 @@ class G2VPico():
             True if the fixture was turned on and channels set to their value
             False if the fixture failed to turn on
         '''
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'set_fixture_on'
-        cmd['fixture_on'] = True
-
-        response = self.__send_cmd(cmd)
-
-        if response is not None:
-            new_cmd = response.get('cmd')
-            error = response.get('error', None)
-
-            if error is not None:
-                raise Exception(error)
-
-            if new_cmd == cmd['cmd']:
-                return response.get('result', None)
-        return None
+        return self.__request(protocol.set_fixture_on(self._id, True))
 
 
     def is_fixture_on(self):
@@ -624,20 +840,218 @@ class G2VPico():
             True if the fixture is on
             False if the fixture is off
         '''
-        cmd = {}
-        cmd['command'] = 'api'
-        cmd['pico_id'] = self._id
-        cmd['cmd'] = 'get_fixture_on'
+        if self._shadow is not None and self._shadow.fixture_on is not None:
+            return self._shadow.fixture_on
+
+        return self.__request(protocol.get_fixture_on(self._id))
+
+
+    def verify(self):
+        '''
+        Compare the shadow state with the Pico and bring it back in line.
+
+        Every channel value, the global intensity and the fixture state are
+        read from the Pico in a single batch and replace the shadow state.
+
+        Returns
+        -------
+        dict
+            The values that differed, keyed by channel number, 'global_intensity'
+            or 'fixture_on', as (shadow value, Pico value) tuples
+
+        Exceptions
+        ----------
+        RuntimeError
+            Raised when the Pico was created without shadow state
+        '''
+        if self._shadow is None:
+            raise RuntimeError("Shadow state is not enabled for this Pico")
+
+        expected = self._shadow.snapshot()
+        self._shadow.clear()
+
+        batch = self.batch()
+        for channel in self._channel_list:
+            batch.get_channel_value(channel)
+        batch.get_global_intensity()
+        batch.is_fixture_on()
+        batch.send()
+
+        actual = self._shadow.snapshot()
+        mismatches = {}
+        for key, value in expected.items():
+            if actual.get(key, None) != value:
+                mismatches[key] = (value, actual.get(key, None))
+
+        return mismatches
+
+
+class PicoBatch():
+    '''
+    A group of channel commands sent to a G2V Pico in a single write.
+
+    Created with G2VPico.batch(). Commands are validated when they are queued
+    and nothing is sent until send() is called or the with block exits.
+
+    Example
+    -------
+    with pico.batch() as batch:
+        batch.set_channel_value(1, 100)
+        batch.set_channel_value(2, 250)
+
+    print(batch.results)
+    '''
+
+    def __init__(self, pico_id, channel_check, execute):
+        self._id = pico_id
+        self._channel_check = channel_check
+        self._execute = execute
+        self._requests = []
+        self._results = None
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is None:
+            self.send()
+        return False
+
+    @property
+    def results(self):
+        '''
+        The results of the commands in the order they were queued,
+        None until the batch has been sent
+        '''
+        return self._results
+
+    def get_channel_value(self, channel):
+        '''
+        Queue a read of the current PWM value of the channel
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self._channel_check(channel)
+
+        self._requests.append(protocol.get_channel_value(self._id, channel))
+
+    def set_channel_value(self, channel, value):
+        '''
+        Queue a change of the chosen channel to the specified value
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        value : str, int, float
+            The value to set the chosen channel to in the range [0, channel_limit]
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+
+        ValueError
+            Raised when the value parameter is an invalid type
+        '''
+        channel = self._channel_check(channel)
+        value = protocol.check_value(value)
+
+        self._requests.append(protocol.set_channel_value(self._id, channel, value))
+
+    def get_channel_limit(self, channel):
+        '''
+        Queue a read of the maximum limit of the channel
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self._channel_check(channel)
+
+        self._requests.append(protocol.get_channel_limit(self._id, channel))
+
+    def get_channel_wavelength_range(self, channel):
+        '''
+        Queue a read of the minimum and maximum wavelength of the channel in nm
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self._channel_check(channel)
+
+        self._requests.append(protocol.get_channel_range(self._id, channel))
 
-        response = self.__send_cmd(cmd)
+    def get_global_intensity(self):
+        '''
+        Queue a read of the global intensity
+        '''
+        self._requests.append(protocol.get_global_intensity(self._id))
 
-        if response is not None:
-            new_cmd = response.get('cmd')
-            error = response.get('error', None)
+    def set_global_intensity(self, value):
+        '''
+        Queue a change of the global intensity
 
-            if error is not None:
-                raise Exception(error)
+        Parameters
+        ----------
+        value : float
+            The value of the new global intensity in the range [0.0, 100.0]
+        '''
+        self._requests.append(protocol.set_global_intensity(self._id, value))
 
-            if new_cmd == cmd['cmd']:
-                return response.get('fixture_on', None)
-        return None
+    def turn_off(self):
+        '''
+        Queue turning the fixture off
+        '''
+        self._requests.append(protocol.set_fixture_on(self._id, False))
+
+    def turn_on(self):
+        '''
+        Queue turning the fixture on
+        '''
+        self._requests.append(protocol.set_fixture_on(self._id, True))
+
+    def is_fixture_on(self):
+        '''
+        Queue a read of whether the fixture is on
+        '''
+        self._requests.append(protocol.get_fixture_on(self._id))
+
+    def send(self):
+        '''
+        Send all queued commands to the Pico and collect their responses
+
+        Returns
+        -------
+        list
+            The result of each command in the order it was queued
+        '''
+        requests = self._requests
+        self._requests = []
+        self._results = self._execute(requests)
+        return self._results
@@ -6,4 +6,22 @@
 #                                                                              #
 ################################################################################
 
-from .MainClass import G2VPico
+from .MainClass import G2VPico, PicoBatch
+from .async_client import AsyncG2VPico
+from .fleet import PicoFleet, FleetResult
+from .metadata import MetadataCache
+from .metrics import MetricsHook, PicoMetrics
+from .recorder import Recorder
+from .threaded_client import ThreadSafeG2VPico
+from .coalesce import CoalescingSender
+from .pacing import Pacer
+from .recipe import RecipePlayer
+
+try:
+    from .spectrum import Spectrum
+    from .solver import SpectrumSolver
+    from .telemetry import TelemetryPoller
+    from .library import SpectrumLibrary
+except ImportError:
+    # numpy is not installed, the array based spectrum API, solver, telemetry and library are unavailable
+    pass
@@ -0,0 +1,463 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import asyncio
+import collections
+import traceback
+
+from . import protocol
+from .protocol import MessageDecoder
+
+class AsyncG2VPico():
+    '''
+    An asyncio client for a G2V Pico with the same methods as G2VPico.
+
+    Every method is a coroutine. Commands are written as soon as they are
+    awaited and responses are matched to them in order by a single reader
+    task, so any number of commands can be in flight on one connection
+    without extra threads.
+
+    Example
+    -------
+    async with AsyncG2VPico('192.168.1.70', '00000000c2ca735f') as pico:
+        await pico.set_global_intensity(50.0)
+    '''
+    __DEFAULT_PORT_NUMBER = 50000
+
+    def __init__(self, ip_address, pico_id, port=None):
+        '''
+        The connection is opened by connect() or by entering the
+        object as an async context manager.
+
+        Parameters
+        ----------
+        ip_addres : str
+            The IP address of the Pico on the network
+
+        pico_id : str
+            The 16 character ID of the Pico
+
+        port : int, optional
+            The TCP port of the Pico API, defaults to 50000
+        '''
+        self._ip_address = ip_address
+        self._port = AsyncG2VPico.__DEFAULT_PORT_NUMBER if port is None else int(port)
+        self._id = str(pico_id)
+        self._decoder = MessageDecoder()
+        self._pending = collections.deque()
+
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._drain_lock = None
+
+        self._channel_count = None
+        self._channel_list = None
+
+    def __repr__(self):
+        return f"PICO {self._id} at {self._ip_address}"
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.close()
+        return False
+
+    @property
+    def id(self):
+        '''
+        The ID of the Pico used to intialize the object
+        '''
+        return self._id
+
+    @property
+    def channel_count(self):
+        '''
+        The number of channels available in the Pico
+        '''
+        return self._channel_count
+
+    @property
+    def channel_list(self):
+        '''
+        A list of the available channels in the Pico
+        '''
+        return self._channel_list
+
+    async def connect(self):
+        '''
+        Open the connection to the Pico and read its channel information
+
+        Exceptions
+        ----------
+        ConnectionRefusedError
+            Raised when the Pico refuses the connection
+        '''
+        try:
+            self._reader, self._writer = await asyncio.open_connection(self._ip_address, self._port)
+        except ConnectionRefusedError as exc:
+            raise ConnectionRefusedError(f"Connection to PICO at {self._ip_address} refused") from exc
+
+        self._drain_lock = asyncio.Lock()
+        self._read_task = asyncio.ensure_future(self.__read_responses())
+
+        try:
+            self._channel_count, self._channel_list = await asyncio.gather(
+                self.__request(protocol.get_channel_count(self._id)),
+                self.__request(protocol.get_channel_list(self._id)))
+        except BaseException:
+            # also on cancellation, such as a timeout around connect()
+            await self.close()
+            raise
+
+        if self._channel_count is None or self._channel_list is None:
+            await self.close()
+            raise Exception("Instance can not be initialized")
+
+    async def close(self):
+        '''
+        Close the connection to the Pico. Commands still waiting for a
+        response raise ConnectionError.
+        '''
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        if self._read_task is not None:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+            self._read_task = None
+
+        self.__fail_pending(ConnectionError(f"Connection to PICO at {self._ip_address} closed"))
+
+    ### Private Internal Methods
+
+    def __fail_pending(self, exc):
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(exc)
+
+    async def __read_responses(self):
+        '''Internal task matching every response from the Pico to the oldest waiting command'''
+        try:
+            while True:
+                data = await self._reader.read(4096)
+                if not data:
+                    raise ConnectionError(f"Connection to PICO at {self._ip_address} closed")
+
+                self._decoder.feed(data)
+                for response in self._decoder.messages():
+                    if not self._pending:
+                        continue
+                    future = self._pending.popleft()
+                    if not future.done():
+                        future.set_result(response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self.__fail_pending(exc)
+
+    async def __send_cmd(self, request):
+        if self._writer is None or self._read_task is None or self._read_task.done():
+            raise ConnectionError(f"Not connected to PICO at {self._ip_address}")
+
+        try:
+            self._writer.write(request.encode())
+        except Exception as e:
+            print(f"Failed to send cmd {request.cmd} - {e} - {traceback.format_exc()}")
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+
+        async with self._drain_lock:
+            await self._writer.drain()
+
+        return await future
+
+    async def __request(self, request):
+        '''Internal method for sending a single request and returning its result'''
+        return request.parse(await self.__send_cmd(request))
+
+    async def __gather(self, requests):
+        '''
+        Internal method for sending several requests at once.
+
+        All responses are awaited before an error is raised, matching the
+        behaviour of a G2VPico batch.
+        '''
+        results = await asyncio.gather(*(self.__request(request) for request in requests),
+                                       return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        return results
+
+    def __get_channel_check(self, channel):
+        '''Internal method for verifying that a channel is valid and converting to int'''
+        return protocol.check_channel(channel, self._channel_list)
+
+    async def get_channel_value(self, channel):
+        '''
+        Returns the current PWM value of the channel
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Returns
+        -------
+        int
+            The current value of the channel in the range [0, 4096]
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self.__get_channel_check(channel)
+
+        return await self.__request(protocol.get_channel_value(self._id, channel))
+
+    async def set_channel_value(self, channel, value):
+        '''
+        Sets the chosen channel to the specified value.
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        value : str, int, float
+            The value to set the chosen channel to in the range [0, channel_limit]
+
+        Returns
+        -------
+        bool
+            True if the channel has been set to the new value
+            False if the channel has not been changed
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+
+        ValueError
+            Raised when the value parameter is an invalid type
+        '''
+        channel = self.__get_channel_check(channel)
+        value = protocol.check_value(value)
+
+        return await self.__request(protocol.set_channel_value(self._id, channel, value))
+
+    async def clear_channels(self):
+        '''
+        Set all channels in the Pico to a value of 0
+
+        Returns
+        -------
+        bool
+            True when all channels have been set to 0
+        '''
+        await self.__gather([protocol.set_channel_value(self._id, channel, 0)
+                             for channel in self._channel_list])
+
+        return True
+
+    async def get_channel_limit(self, channel):
+        '''
+        Returns the maximum limit [0-4096] of the channel.
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Returns
+        -------
+        int
+            The maximum limit of the channel in the range [0, 4096]
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self.__get_channel_check(channel)
+
+        return await self.__request(protocol.get_channel_limit(self._id, channel))
+
+    async def get_spectrum(self):
+        '''
+        Get the current spectrum as a list of dict itmes
+
+        Returns
+        -------
+        list
+            A list of dict items channel and value keys forming
+            the current spectrum in the Pico.
+        '''
+        values = await self.__gather([protocol.get_channel_value(self._id, channel)
+                                      for channel in self._channel_list])
+
+        spectrum_array = []
+        for channel, value in zip(self._channel_list, values):
+            spectrum_dict = {}
+            spectrum_dict['channel'] = str(channel)
+            spectrum_dict['value'] = value
+
+            spectrum_array.append(spectrum_dict)
+
+        return spectrum_array
+
+    async def set_spectrum(self, channel_list):
+        '''
+        Load in a spectrum either as a json string or a dictionary
+
+        Parameters
+        ----------
+        channel_list : str, list
+            str - A JSON formatted string contain channels and their corresponding values
+            list - A list of dict objects containing 'channel' and 'value' keys
+
+        Returns
+        -------
+        bool
+            True if the new spectrum has been loaded
+
+        Exceptions
+        ----------
+        ValueError
+            If the spectrum data in channel_list is invalid or of an invalid type
+
+        ValueError
+            Raised when a channel or channel value is invalid
+        '''
+        requests = []
+        for channel, value in protocol.spectrum_items(channel_list):
+            channel = self.__get_channel_check(channel)
+            value = protocol.check_value(value)
+            requests.append(protocol.set_channel_value(self._id, channel, value))
+
+        await self.__gather(requests)
+
+        return True
+
+    async def get_channel_wavelength_range(self, channel):
+        '''
+        Returns the minimum and maximum wavelength values for a channel in nm
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Returns
+        -------
+        list
+            A list where index 0 is the minimum wavelength and index 1 is the maximum wavelength
+            Units are nm
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self.__get_channel_check(channel)
+
+        return await self.__request(protocol.get_channel_range(self._id, channel))
+
+    async def get_global_intensity(self):
+        '''
+        Returns the global intensity that is applied to all channels
+
+        Returns
+        -------
+        float
+            A value between 0.0 and 100.0
+        '''
+        return await self.__request(protocol.get_global_intensity(self._id))
+
+    async def set_global_intensity(self, value):
+        '''
+        Sets the global intensity that is applied to all channels.
+
+        Parameters
+        ----------
+        value : float
+            The value of the new global intensity in the range [0.0, 100.0]
+
+        Returns
+        -------
+        bool
+            True if the global intensity has been set successfully
+            False if the global intensity was not changed
+        '''
+        return await self.__request(protocol.set_global_intensity(self._id, value))
+
+    async def turn_off(self):
+        '''
+        Turns the fixture off while preserving channel values
+
+        Returns
+        -------
+        bool
+            True if the fixture was turned off
+            False if the fixture failed to turn off
+        '''
+        return await self.__request(protocol.set_fixture_on(self._id, False))
+
+    async def turn_on(self):
+        '''
+        Turns the fixture on with previously stored spectrum
+
+        Returns
+        -------
+        bool
+            True if the fixture was turned on and channels set to their value
+            False if the fixture failed to turn on
+        '''
+        return await self.__request(protocol.set_fixture_on(self._id, True))
+
+    async def is_fixture_on(self):
+        '''
+        Returns whether the fixture is on or off
+
+        Returns
+        -------
+        bool :
+            True if the fixture is on
+            False if the fixture is off
+        '''
+        return await self.__request(protocol.get_fixture_on(self._id))
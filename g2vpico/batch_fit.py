@@ -0,0 +1,283 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .solver import SpectrumSolver
+
+_MANIFEST_VERSION = 2
+
+# Rows of the targets hashed at a time, so a memory-mapped library is not read in at once
+_HASH_BYTES = 64 * 1024 * 1024
+
+_worker_solver = None
+
+def _init_worker(solver):
+    '''Internal function that keeps one solver per worker process'''
+    global _worker_solver
+    _worker_solver = solver
+
+
+def _fit_chunk(targets, start, stop, path):
+    '''Internal function that fits one chunk of targets in a worker process and writes it'''
+    if isinstance(targets, str):
+        targets = np.load(targets, mmap_mode='r')
+
+    values = _worker_solver.fit_many(targets[start:stop])
+    _save_atomic(path, values)
+    return stop - start
+
+
+def _save_atomic(path, array):
+    '''Internal function for writing a .npy file in a single step'''
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.chunk-', suffix='.npy')
+    try:
+        with os.fdopen(handle, 'wb') as outfile:
+            np.save(outfile, array)
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+def load_targets(targets):
+    '''
+    Load a target library
+
+    Parameters
+    ----------
+    targets : numpy.ndarray, str
+        ndarray - An (N, wavelengths) array
+        str - A .npy file, which is memory-mapped, or a comma separated text file
+
+    Returns
+    -------
+    numpy.ndarray
+        The (N, wavelengths) targets
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when the targets are not a two dimensional array
+    '''
+    if isinstance(targets, str):
+        if targets.endswith('.npy'):
+            targets = np.load(targets, mmap_mode='r')
+        else:
+            targets = np.loadtxt(targets, delimiter=',', ndmin=2)
+
+    targets = np.asarray(targets)
+    if targets.ndim != 2:
+        raise ValueError("Targets must be an (N, wavelengths) array")
+
+    return targets
+
+
+def fit_library(solver, targets, output, chunk_size=1000, max_workers=None, progress=None):
+    '''
+    Fit a library of target spectra over a process pool and write the channel values to disk
+
+    The targets are split into chunks that are each fitted in a single
+    vectorized solve. Every chunk is written to the output directory as soon
+    as it is done, so an interrupted job continues where it stopped when it
+    is run again with the same output directory. The directory records a
+    hash of the targets and of the solver, and a job whose targets, limits,
+    ranges or profiles differ is refused instead of resumed.
+
+    Parameters
+    ----------
+    solver : SpectrumSolver
+        The solver for the fixture
+
+    targets : numpy.ndarray, str
+        An (N, wavelengths) array, a .npy file or a comma separated text file
+
+    output : str
+        The output directory
+
+    chunk_size : int
+        The number of targets fitted in each task
+
+    max_workers : int, optional
+        The number of worker processes, defaults to the number of CPUs
+
+    progress : callable, optional
+        Called with (completed, total) target counts as chunks finish
+
+    Returns
+    -------
+    str
+        The path of values.npy, an (N, channels) uint16 array of channel
+        values in the order of solver.channel_list
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when the output directory holds a job with different settings,
+        targets or solver
+    '''
+    target_path = targets if isinstance(targets, str) and targets.endswith('.npy') else None
+    targets = load_targets(targets)
+    count = targets.shape[0]
+
+    if targets.shape[1] != solver.wavelengths.size:
+        raise ValueError(f"Targets must hold {solver.wavelengths.size} values per spectrum")
+
+    os.makedirs(output, exist_ok=True)
+    _check_manifest(output, solver, targets, chunk_size)
+
+    chunks = []
+    completed = 0
+    for index, start in enumerate(range(0, count, chunk_size)):
+        stop = min(start + chunk_size, count)
+        path = os.path.join(output, f"chunk-{index:06d}.npy")
+        if _chunk_done(path, stop - start, len(solver.channel_list)):
+            completed += stop - start
+        else:
+            chunks.append((start, stop, path))
+
+    if progress is not None:
+        progress(completed, count)
+
+    if chunks:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(solver,)) as executor:
+            futures = []
+            for start, stop, path in chunks:
+                # Workers map a .npy library themselves so chunks are not copied through the pool
+                chunk_targets = target_path if target_path is not None else np.asarray(targets[start:stop])
+                offset = 0 if target_path is None else start
+                futures.append(executor.submit(_fit_chunk, chunk_targets, offset, offset + stop - start, path))
+
+            for future in as_completed(futures):
+                completed += future.result()
+                if progress is not None:
+                    progress(completed, count)
+
+    values_path = os.path.join(output, 'values.npy')
+    values = np.lib.format.open_memmap(values_path + '.tmp', mode='w+', dtype=np.uint16,
+                                       shape=(count, len(solver.channel_list)))
+    for index, start in enumerate(range(0, count, chunk_size)):
+        chunk = np.load(os.path.join(output, f"chunk-{index:06d}.npy"), mmap_mode='r')
+        values[start:start + chunk.shape[0]] = chunk
+    values.flush()
+    del values
+    os.replace(values_path + '.tmp', values_path)
+
+    return values_path
+
+
+def _check_manifest(output, solver, targets, chunk_size):
+    '''Internal function that records the job settings and refuses to resume a different job'''
+    manifest = {}
+    manifest['version'] = _MANIFEST_VERSION
+    manifest['count'] = targets.shape[0]
+    manifest['chunk_size'] = chunk_size
+    manifest['channel_list'] = solver.channel_list
+    manifest['wavelengths'] = solver.wavelengths.tolist()
+    manifest['targets_sha256'] = _targets_digest(targets)
+    manifest['solver_sha256'] = solver.digest()
+
+    path = os.path.join(output, 'manifest.json')
+    if os.path.isfile(path):
+        with open(path, 'r') as infile:
+            existing = json.load(infile)
+        if existing != manifest:
+            raise ValueError(f"Output directory {output} holds a different job")
+    else:
+        with open(path, 'w') as outfile:
+            json.dump(manifest, outfile, indent=4)
+
+
+def _targets_digest(targets):
+    '''Internal function for a SHA-256 hex digest of the shape and values of the targets'''
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(targets.shape)).encode('utf-8'))
+    rows = max(1, _HASH_BYTES // max(targets.shape[1] * 8, 1))
+    for start in range(0, targets.shape[0], rows):
+        digest.update(np.ascontiguousarray(targets[start:start + rows], dtype='<f8').tobytes())
+    return digest.hexdigest()
+
+
+def _chunk_done(path, rows, channels):
+    '''Internal function that checks whether a chunk has already been written'''
+    try:
+        return np.load(path, mmap_mode='r').shape == (rows, channels)
+    except (OSError, ValueError):
+        return False
+
+
+def _parse_wavelengths(value):
+    '''Internal function for reading a wavelength grid as start:stop:step or a file'''
+    if os.path.isfile(value):
+        return load_targets(value).ravel()
+
+    start, stop, step = (float(part) for part in value.split(':'))
+    return np.arange(start, stop, step)
+
+
+def main(argv=None):
+    '''
+    Command line entry point, run with python -m g2vpico.batch_fit --help
+    '''
+    from .MainClass import G2VPico
+
+    parser = argparse.ArgumentParser(description="Fit a library of target spectra to the channel values of a Pico")
+    parser.add_argument('ip_address', help="The IP address of the Pico")
+    parser.add_argument('pico_id', help="The 16 character ID of the Pico")
+    parser.add_argument('targets', help="An (N, wavelengths) .npy file or comma separated text file")
+    parser.add_argument('output', help="The output directory, an interrupted job is resumed")
+    parser.add_argument('--wavelengths', required=True,
+                        help="The wavelength grid of the targets as start:stop:step or a file")
+    parser.add_argument('--profiles', default=None, help="A JSON file of channel emission profiles")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Targets fitted in each task")
+    parser.add_argument('--workers', type=int, default=None, help="The number of worker processes")
+    args = parser.parse_args(argv)
+
+    pico = G2VPico(args.ip_address, args.pico_id)
+    try:
+        solver = SpectrumSolver.from_pico(pico, _parse_wavelengths(args.wavelengths), args.profiles)
+    finally:
+        pico.close()
+
+    def report(completed, total):
+        print(f"\rFitted {completed} of {total} spectra", end='', file=sys.stderr, flush=True)
+
+    path = fit_library(solver, args.targets, args.output, chunk_size=args.chunk_size,
+                       max_workers=args.workers, progress=report)
+    print(f"\nChannel values written to {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
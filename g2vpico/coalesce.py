@@ -0,0 +1,262 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import threading
+
+from . import protocol
+
+_GLOBAL_INTENSITY = 'global_intensity'
+
+class CoalescingSender():
+    '''
+    Sends a stream of setpoints to a Pico, replacing writes that have not been
+    sent yet with the newest value for the same target.
+
+    The set and turn methods return immediately. A sender thread writes
+    everything that is pending as a single batch and waits for its responses
+    before sending the next, so a producer that runs faster than the Pico
+    answers never builds up a backlog: a new value reaches the Pico within
+    about one round trip after the batch in flight. A pending write to a
+    channel or to the global intensity is replaced by a newer write to the
+    same target. turn_on and turn_off are never dropped and keep their order
+    relative to the writes before and after them.
+
+    While the sender is open it owns the Pico, a G2VPico must not be used
+    directly by other threads at the same time.
+
+    Example
+    -------
+    with CoalescingSender(pico) as sender:
+        for value in setpoints:
+            sender.set_global_intensity(value)
+    '''
+
+    def __init__(self, pico):
+        '''
+        Parameters
+        ----------
+        pico : G2VPico, ThreadSafeG2VPico
+            The Pico the setpoints are sent to
+        '''
+        self._pico = pico
+        self._condition = threading.Condition()
+        # dicts of pending writes keyed by target, separated by on/off commands
+        self._pending = []
+        self._submitted = 0
+        self._completed = 0
+        self._sent = 0
+        self._coalesced = 0
+        self._error = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self.__run, name=f"g2vpico-coalesce-{pico.id}", daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return f"Coalescing sender for {self._pico}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+    @property
+    def sent(self):
+        '''
+        The number of commands written to the Pico
+        '''
+        return self._sent
+
+    @property
+    def coalesced(self):
+        '''
+        The number of writes that were replaced by a newer value before being sent
+        '''
+        return self._coalesced
+
+    @property
+    def pending(self):
+        '''
+        The number of commands waiting to be sent
+        '''
+        with self._condition:
+            return sum(len(item) if isinstance(item, dict) else 1 for item in self._pending)
+
+    def set_channel_value(self, channel, value):
+        '''
+        Queue a channel value, replacing a pending value of the same channel
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        value : str, int, float
+            The value to set the chosen channel to in the range [0, channel_limit]
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel or value parameter is an invalid type
+        '''
+        channel = protocol.check_channel(channel, self._pico.channel_list)
+        self.__write(channel, protocol.check_value(value))
+
+    def set_global_intensity(self, value):
+        '''
+        Queue a global intensity, replacing a pending global intensity
+
+        Parameters
+        ----------
+        value : float
+            The value of the new global intensity in the range [0.0, 100.0]
+        '''
+        self.__write(_GLOBAL_INTENSITY, value)
+
+    def turn_on(self):
+        '''
+        Queue turning the fixture on, after every write queued before it
+        '''
+        self.__append(True)
+
+    def turn_off(self):
+        '''
+        Queue turning the fixture off, after every write queued before it
+        '''
+        self.__append(False)
+
+    def flush(self, timeout=None):
+        '''
+        Wait until everything queued so far has been acknowledged by the Pico
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The longest time to wait in seconds
+
+        Returns
+        -------
+        bool
+            True when everything was sent, False if the timeout passed first
+
+        Exceptions
+        ----------
+        Exception
+            The first error raised while sending since the last flush
+        '''
+        with self._condition:
+            target = self._submitted
+            done = self._condition.wait_for(lambda: self._completed >= target or not self._thread.is_alive(),
+                                            timeout)
+            error, self._error = self._error, None
+
+        if error is not None:
+            raise error
+        return done
+
+    def close(self):
+        '''
+        Send everything that is pending and stop the sender thread
+
+        Exceptions
+        ----------
+        Exception
+            The first error raised while sending since the last flush
+        '''
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    ### Private Internal Methods
+
+    def __write(self, target, value):
+        '''Internal method for queueing a write, replacing a pending write to the same target'''
+        with self._condition:
+            self.__check_open()
+            if not self._pending or not isinstance(self._pending[-1], dict):
+                self._pending.append({})
+            writes = self._pending[-1]
+            if target in writes:
+                self._coalesced += 1
+            writes[target] = value
+            self._submitted += 1
+            self._condition.notify_all()
+
+    def __append(self, fixture_on):
+        '''Internal method for queueing an on/off command, it separates the writes before and after it'''
+        with self._condition:
+            self.__check_open()
+            self._pending.append(fixture_on)
+            self._submitted += 1
+            self._condition.notify_all()
+
+    def __check_open(self):
+        if self._closed:
+            raise RuntimeError("Coalescing sender is closed")
+
+    def __run(self):
+        '''Internal method run by the sender thread'''
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                items = self._pending
+                self._pending = []
+                taken = self._submitted
+
+            batch = self._pico.batch()
+            for item in items:
+                if item is True:
+                    batch.turn_on()
+                elif item is False:
+                    batch.turn_off()
+                else:
+                    for target, value in item.items():
+                        if target == _GLOBAL_INTENSITY:
+                            batch.set_global_intensity(value)
+                        else:
+                            batch.set_channel_value(target, value)
+
+            count = len(batch)
+            error = None
+            try:
+                batch.send()
+            except Exception as exc:
+                error = exc
+
+            with self._condition:
+                self._sent += count
+                if error is not None and self._error is None:
+                    self._error = error
+                self._completed = taken
+                self._condition.notify_all()
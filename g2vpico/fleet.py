@@ -0,0 +1,251 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from .MainClass import G2VPico
+
+class FleetResult(collections.namedtuple('FleetResult', ['value', 'error'])):
+    '''
+    The outcome of a fleet call on a single Pico.
+
+    value holds the return value of the call and error holds the exception
+    it raised, only one of them is set.
+    '''
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        '''
+        True if the call completed without raising
+        '''
+        return self.error is None
+
+
+class PicoFleet():
+    '''
+    A group of G2V Picos controlled together.
+
+    Every call is sent to all Picos in parallel from a thread pool, so a fleet
+    operation takes about as long as the slowest Pico rather than the sum of
+    all of them. Each call returns a dict of FleetResult keyed by Pico ID.
+
+    Example
+    -------
+    with PicoFleet.connect([('192.168.1.70', '00000000c2ca735f'),
+                            ('192.168.1.71', '00000000d7a1c3b2')]) as fleet:
+        results = fleet.set_global_intensity(80.0)
+    '''
+
+    def __init__(self, picos, max_workers=None):
+        '''
+        Parameters
+        ----------
+        picos : iterable
+            Connected G2VPico objects
+
+        max_workers : int, optional
+            The number of threads used for fan-out, defaults to one per Pico
+        '''
+        self._picos = list(picos)
+        self._failed = {}
+
+        if max_workers is None:
+            max_workers = max(len(self._picos), 1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="PicoFleet")
+
+    @classmethod
+    def connect(cls, addresses, port=None, max_workers=None):
+        '''
+        Connect to many Picos in parallel and return them as a fleet
+
+        Picos that can not be connected are left out of the fleet and
+        reported in the failed property.
+
+        Parameters
+        ----------
+        addresses : iterable
+            (ip_address, pico_id) or (ip_address, pico_id, port) tuples for each Pico
+
+        port : int, optional
+            The TCP port of the Pico API for addresses without a port, defaults to 50000
+
+        max_workers : int, optional
+            The number of threads used for fan-out, defaults to one per Pico
+
+        Returns
+        -------
+        PicoFleet
+            A fleet holding every Pico that was connected
+        '''
+        addresses = list(addresses)
+        fleet = cls([], max_workers=max_workers or max(len(addresses), 1))
+
+        futures = []
+        for address in addresses:
+            ip_address, pico_id = address[0], address[1]
+            pico_port = address[2] if len(address) > 2 else port
+            futures.append((str(pico_id), fleet._executor.submit(G2VPico, ip_address, pico_id, port=pico_port)))
+
+        for pico_id, future in futures:
+            try:
+                fleet._picos.append(future.result())
+            except Exception as exc:
+                fleet._failed[pico_id] = exc
+
+        return fleet
+
+    def __repr__(self):
+        return f"Fleet of {len(self._picos)} PICOs"
+
+    def __len__(self):
+        return len(self._picos)
+
+    def __iter__(self):
+        return iter(self._picos)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+    @property
+    def picos(self):
+        '''
+        A list of the Picos in the fleet
+        '''
+        return list(self._picos)
+
+    @property
+    def failed(self):
+        '''
+        A dict of the exception raised for each Pico ID that could not be
+        connected by PicoFleet.connect()
+        '''
+        return dict(self._failed)
+
+    def close(self):
+        '''
+        Close the connection to every Pico and stop the worker threads
+        '''
+        for pico in self._picos:
+            try:
+                pico.close()
+            except Exception:
+                pass
+
+        self._executor.shutdown(wait=True)
+
+    def call(self, method, *args, **kwargs):
+        '''
+        Call a G2VPico method on every Pico in parallel
+
+        Parameters
+        ----------
+        method : str
+            The name of the G2VPico method
+
+        args, kwargs
+            Passed to the method of every Pico
+
+        Returns
+        -------
+        dict
+            A FleetResult for each Pico ID, in the order of the fleet
+        '''
+        futures = [(pico, self._executor.submit(getattr(pico, method), *args, **kwargs))
+                   for pico in self._picos]
+
+        results = {}
+        for pico, future in futures:
+            try:
+                results[pico.id] = FleetResult(future.result(), None)
+            except Exception as exc:
+                results[pico.id] = FleetResult(None, exc)
+
+        return results
+
+    def get_channel_value(self, channel):
+        '''
+        Returns the current PWM value of the channel on every Pico
+        '''
+        return self.call('get_channel_value', channel)
+
+    def set_channel_value(self, channel, value):
+        '''
+        Sets the chosen channel to the specified value on every Pico
+        '''
+        return self.call('set_channel_value', channel, value)
+
+    def clear_channels(self):
+        '''
+        Set all channels to a value of 0 on every Pico
+        '''
+        return self.call('clear_channels')
+
+    def get_spectrum(self):
+        '''
+        Get the current spectrum of every Pico as a list of dict items
+        '''
+        return self.call('get_spectrum')
+
+    def set_spectrum(self, channel_list):
+        '''
+        Load the same spectrum into every Pico
+        '''
+        return self.call('set_spectrum', channel_list)
+
+    def get_global_intensity(self):
+        '''
+        Returns the global intensity of every Pico
+        '''
+        return self.call('get_global_intensity')
+
+    def set_global_intensity(self, value):
+        '''
+        Sets the global intensity of every Pico
+        '''
+        return self.call('set_global_intensity', value)
+
+    def turn_off(self):
+        '''
+        Turns every fixture off while preserving channel values
+        '''
+        return self.call('turn_off')
+
+    def turn_on(self):
+        '''
+        Turns every fixture on with its previously stored spectrum
+        '''
+        return self.call('turn_on')
+
+    def is_fixture_on(self):
+        '''
+        Returns whether each fixture is on or off
+        '''
+        return self.call('is_fixture_on')
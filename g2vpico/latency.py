@@ -0,0 +1,143 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import collections
+import math
+import threading
+import time
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+class LatencyProfile(collections.namedtuple('LatencyProfile', ['samples', 'p50', 'p90', 'p99', 'max'])):
+    '''
+    The measured round trip time of set_global_intensity on a Pico, in seconds.
+    '''
+    __slots__ = ()
+
+    # Headroom over the 99th percentile so that an occasional slow round trip
+    # does not push the following steps late
+    __STEP_MARGIN = 1.5
+
+    # Steps are never shorter than this, however fast the Pico answers
+    __STEP_FLOOR = 0.005
+
+    def __repr__(self):
+        return (f"LatencyProfile({self.samples} samples, p50 {self.p50 * 1000:.2f} ms, "
+                f"p90 {self.p90 * 1000:.2f} ms, p99 {self.p99 * 1000:.2f} ms, max {self.max * 1000:.2f} ms)")
+
+    @property
+    def minimum_step(self):
+        '''
+        The shortest waveform step in seconds that the measured latency allows,
+        rounded up to a whole millisecond
+        '''
+        step = max(self.p99 * LatencyProfile.__STEP_MARGIN, LatencyProfile.__STEP_FLOOR)
+        return math.ceil(step * 1000) / 1000
+
+
+def _percentile(ordered, percent):
+    '''Internal function for the nearest rank percentile of a sorted list'''
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def measure_latency(pico, samples=20, refresh=False):
+    '''
+    Measure the set_global_intensity round trip time of a Pico
+
+    The current global intensity is read and written back samples times, so
+    the output of the fixture does not change. When the Pico does not report
+    its global intensity nothing is written, the get_global_intensity round
+    trip is timed instead. The result is cached per Pico ID for the life of
+    the process.
+
+    Parameters
+    ----------
+    pico : G2VPico
+        A connected Pico
+
+    samples : int
+        The number of round trips in the calibration burst
+
+    refresh : bool
+        When True the cached result is ignored and the Pico is measured again
+
+    Returns
+    -------
+    LatencyProfile
+        The percentiles of the measured round trip times
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when samples is not greater than zero
+    '''
+    if samples <= 0:
+        raise ValueError("Samples must be greater than zero.")
+
+    pico_id = getattr(pico, 'id', None)
+    if not refresh and pico_id is not None:
+        with _profiles_lock:
+            profile = _profiles.get(pico_id, None)
+        if profile is not None:
+            return profile
+
+    intensity = pico.get_global_intensity()
+
+    round_trips = []
+    for _ in range(samples):
+        start = time.perf_counter_ns()
+        if intensity is None:
+            pico.get_global_intensity()
+        else:
+            pico.set_global_intensity(intensity)
+        round_trips.append((time.perf_counter_ns() - start) / 1e9)
+
+    round_trips.sort()
+    profile = LatencyProfile(samples, _percentile(round_trips, 50), _percentile(round_trips, 90),
+                             _percentile(round_trips, 99), round_trips[-1])
+
+    if pico_id is not None:
+        with _profiles_lock:
+            _profiles[pico_id] = profile
+
+    return profile
+
+
+def forget_latency(pico_id=None):
+    '''
+    Remove cached latency measurements
+
+    Parameters
+    ----------
+    pico_id : str, optional
+        The Pico to forget, every Pico when not given
+    '''
+    with _profiles_lock:
+        if pico_id is None:
+            _profiles.clear()
+        else:
+            _profiles.pop(pico_id, None)
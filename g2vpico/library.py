@@ -0,0 +1,514 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from .spectrum import Spectrum
+
+# The header and the channel list fill the first _DATA_OFFSET bytes, followed by
+# the value matrix and an index of records appended behind the matrix. A record
+# is the name of a new row ended by a newline, or a tag record of a NUL, the
+# name and its tags separated by tabs and ended by a newline.
+_MAGIC = b'G2VSPLIB'
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sIIQQQQ')
+_DATA_OFFSET = 4096
+
+class SpectrumLibrary():
+    '''
+    A file of named spectra that is memory-mapped instead of read.
+
+    The values of every spectrum are rows of an (N, channels) uint16 matrix
+    in the file, behind a header holding the channel list. An index of
+    records appended behind the matrix holds the name of each row and
+    optional tags. Opening a library only reads the header and the index, so
+    it takes milliseconds even for tens of thousands of spectra, and rows are
+    paged in from disk when they are used. Names are looked up in a dict and
+    new spectra are appended in place, the file grows by doubling its capacity.
+
+    Added spectra are written to the mapped matrix immediately, their index
+    records and the spectrum count are written by flush() and close().
+    Spectra added after the last flush are lost if the process stops
+    without closing, the spectra flushed before are never affected. A
+    library that is not closed is closed when it is garbage collected, but
+    the file and its mapping stay open until then, so use close() or a with
+    block.
+
+    Example
+    -------
+    with SpectrumLibrary.create('spectra.g2vlib', pico.channel_list) as library:
+        library.add('am15g', values, tags=['solar'])
+
+    library = SpectrumLibrary('spectra.g2vlib')
+    pico.set_spectrum_array(library.get('am15g'))
+    '''
+
+    def __init__(self, path, writable=False):
+        '''
+        Open an existing library
+
+        Parameters
+        ----------
+        path : str
+            The library file
+
+        writable : bool
+            When True spectra can be added
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the file is not a spectrum library
+        '''
+        self._path = str(path)
+        self._writable = writable
+        self._file = open(self._path, 'r+b' if writable else 'rb')
+        try:
+            header = self._file.read(_DATA_OFFSET)
+            magic, version, channel_count, capacity, count, index_offset, index_length = _HEADER.unpack(
+                header[:_HEADER.size].ljust(_HEADER.size, b'\0'))
+            if magic != _MAGIC or version != _FORMAT_VERSION:
+                raise ValueError(f"{self._path} is not a spectrum library")
+
+            self._channel_list = json.loads(header[_HEADER.size:].rstrip(b'\0').decode('utf-8'))
+            self._file.seek(index_offset)
+            text = self._file.read(index_length).decode('utf-8')
+        except Exception:
+            self._file.close()
+            raise
+
+        lines = text.split('\n')
+        lines.pop()
+        self._tags = {}
+        if '\0' in text:
+            # a later tag record of the same name replaces its tags
+            self._names = [line for line in lines if line[:1] != '\0']
+            for line in lines:
+                if line[:1] == '\0':
+                    fields = line[1:].split('\t')
+                    if len(fields) > 1:
+                        self._tags[fields[0]] = fields[1:]
+                    else:
+                        self._tags.pop(fields[0], None)
+        else:
+            self._names = lines
+
+        # the name lookup is built on first use, most of the cost of opening a large library
+        self._rows = None
+        self._capacity = capacity
+        self._index_offset = index_offset
+        self._index_length = index_length
+        self._pending = []
+        self._matrix = None
+        self.__map()
+
+        if len(self._names) != count or len(self._channel_list) != channel_count:
+            self.close()
+            raise ValueError(f"{self._path} has an inconsistent index")
+
+    @classmethod
+    def create(cls, path, channel_list, capacity=1024):
+        '''
+        Create an empty library, open for adding spectra
+
+        Parameters
+        ----------
+        path : str
+            The library file, it must not exist
+
+        channel_list : list
+            The channels of the columns, usually the channel_list of a Pico
+
+        capacity : int
+            The number of spectra space is reserved for, the file grows when it is full
+
+        Exceptions
+        ----------
+        FileExistsError
+            Raised when the file exists
+
+        ValueError
+            Raised when the channel list does not fit in the header
+        '''
+        channel_list = [int(channel) for channel in channel_list]
+        channels = json.dumps(channel_list, separators=(',', ':')).encode('utf-8')
+        if _HEADER.size + len(channels) > _DATA_OFFSET:
+            raise ValueError(f"A library can not hold {len(channel_list)} channels")
+
+        capacity = max(int(capacity), 1)
+        index_offset = _DATA_OFFSET + capacity * len(channel_list) * 2
+
+        with open(path, 'xb') as outfile:
+            outfile.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, len(channel_list), capacity, 0, index_offset, 0))
+            outfile.write(channels)
+            outfile.truncate(index_offset)
+
+        return cls(path, writable=True)
+
+    def __repr__(self):
+        return f"Spectrum library of {len(self)} spectra at {self._path}"
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self.__rows()
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __enter__(self):
+        return self
+
+    def __del__(self):
+        # a library that was never closed is closed when it is collected, the
+        # attribute is missing when the constructor failed before mapping the file
+        if hasattr(self, '_matrix'):
+            self.close()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+    @property
+    def path(self):
+        '''
+        The location of the library file
+        '''
+        return self._path
+
+    @property
+    def channel_list(self):
+        '''
+        The channels of the columns of the library
+        '''
+        return self._channel_list
+
+    @property
+    def names(self):
+        '''
+        The names of the spectra in the order they were added
+        '''
+        return list(self._names)
+
+    @property
+    def values(self):
+        '''
+        A read-only (N, channels) uint16 view of every spectrum, without copying
+        '''
+        return _read_only(self._matrix[:len(self._names)])
+
+    def index(self, name):
+        '''
+        Returns the row of a spectrum in values
+
+        Exceptions
+        ----------
+        KeyError
+            Raised when the library holds no spectrum of that name
+        '''
+        try:
+            return self.__rows()[name]
+        except KeyError:
+            raise KeyError(f"Spectrum {name} is not in the library") from None
+
+    def get(self, name):
+        '''
+        Returns the values of a spectrum, ordered by channel_list
+
+        The array is a read-only view of the file and can be passed to
+        G2VPico.set_spectrum_array when the library has the channels of the Pico.
+
+        Parameters
+        ----------
+        name : str
+            The name of the spectrum
+
+        Returns
+        -------
+        numpy.ndarray
+            The uint16 channel values
+
+        Exceptions
+        ----------
+        KeyError
+            Raised when the library holds no spectrum of that name
+        '''
+        return _read_only(self._matrix[self.index(name)])
+
+    def spectrum(self, name):
+        '''
+        Returns a spectrum as a Spectrum, accepted by G2VPico.set_spectrum_array
+        for any Pico that has the channels of the library
+        '''
+        return Spectrum(self._channel_list, self.get(name))
+
+    def to_list(self, name):
+        '''
+        Returns a spectrum in the list format accepted by G2VPico.set_spectrum
+        '''
+        return self.spectrum(name).to_list()
+
+    def tags(self, name):
+        '''
+        Returns the tags of a spectrum
+        '''
+        self.index(name)
+        return list(self._tags.get(name, []))
+
+    def find(self, tag):
+        '''
+        Returns the names of the spectra with a tag, in the order they were added
+        '''
+        return [name for name in self._names if tag in self._tags.get(name, ())]
+
+    def add(self, name, values, tags=None, replace=False):
+        '''
+        Add a spectrum
+
+        Parameters
+        ----------
+        name : str
+            The name of the spectrum
+
+        values : array_like, Spectrum, str, list
+            The value of each channel ordered by channel_list, a Spectrum, or the
+            list or JSON format accepted by G2VPico.set_spectrum. Channels a
+            Spectrum or list does not hold are 0.
+
+        tags : list, optional
+            Tags for finding the spectrum
+
+        replace : bool
+            When True a spectrum with the same name is overwritten
+
+        Returns
+        -------
+        int
+            The row of the spectrum
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the name exists and replace is False, the name or a tag is
+            empty or holds a newline, tab or NUL, or the values are invalid
+        '''
+        return self.add_many([name], [self.__row_values(values)], None if tags is None else [tags],
+                             replace=replace)[0]
+
+    def add_many(self, names, values, tags=None, replace=False):
+        '''
+        Add many spectra at once, writing the index only once
+
+        Parameters
+        ----------
+        names : list
+            The name of each spectrum
+
+        values : array_like
+            An (N, channels) array of values ordered by channel_list
+
+        tags : list, optional
+            A list of tags for each spectrum
+
+        replace : bool
+            When True spectra with existing names are overwritten
+
+        Returns
+        -------
+        list
+            The row of each spectrum
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when a name exists and replace is False, names are repeated,
+            a name or tag is empty or holds a newline, tab or NUL, or the values
+            are invalid
+        '''
+        if not self._writable:
+            raise ValueError("Spectrum library is open read-only")
+
+        names = [str(name) for name in names]
+        if not all(map(_valid_field, names)):
+            raise ValueError("Spectrum names must not be empty or hold a newline, tab or NUL")
+        if tags is not None:
+            tags = [[str(tag) for tag in spectrum_tags or ()] for spectrum_tags in tags]
+            if len(tags) != len(names):
+                raise ValueError(f"Expected tags for {len(names)} spectra, got {len(tags)}")
+            if not all(_valid_field(tag) for spectrum_tags in tags for tag in spectrum_tags):
+                raise ValueError("Tags must not be empty or hold a newline, tab or NUL")
+        values = np.asarray(values)
+        if values.ndim != 2 or values.shape != (len(names), len(self._channel_list)):
+            raise ValueError(f"Expected values of shape ({len(names)}, {len(self._channel_list)}), "
+                             f"got {values.shape}")
+        if values.dtype != np.uint16 and values.size:
+            if not np.all(np.isfinite(values)) or values.min() < 0 or values.max() > 65535:
+                raise ValueError("Spectrum values must be in the range [0, 65535]")
+        if len(set(names)) != len(names):
+            raise ValueError("Spectrum names must be unique")
+        rows_by_name = self.__rows()
+        if not replace:
+            existing = [name for name in names if name in rows_by_name]
+            if existing:
+                raise ValueError(f"Spectrum {existing[0]} is already in the library")
+
+        rows = []
+        new_names = []
+        for name in names:
+            row = rows_by_name.get(name, None)
+            if row is None:
+                row = len(self._names) + len(new_names)
+                new_names.append(name)
+            rows.append(row)
+
+        required = len(self._names) + len(new_names)
+        if required > self._capacity:
+            self.__grow(max(required, self._capacity * 2))
+
+        self._matrix[rows] = np.rint(values).astype(np.uint16) if values.dtype != np.uint16 else values
+        for name in new_names:
+            rows_by_name[name] = len(self._names)
+            self._names.append(name)
+        if new_names:
+            self._pending.append(''.join(name + '\n' for name in new_names).encode('utf-8'))
+
+        if tags is not None:
+            for name, spectrum_tags in zip(names, tags):
+                if spectrum_tags or name in self._tags:
+                    self._pending.append(('\0' + '\t'.join([name] + spectrum_tags) + '\n').encode('utf-8'))
+                if spectrum_tags:
+                    self._tags[name] = spectrum_tags
+                else:
+                    self._tags.pop(name, None)
+
+        return rows
+
+    def flush(self):
+        '''
+        Write the added spectra, the index and the spectrum count to the file
+        '''
+        if not self._writable or self._file.closed:
+            return
+
+        self._matrix.flush()
+        if not self._pending:
+            return
+
+        # new records are appended behind the index the header points at, so a
+        # crash before the header is written leaves the previous state intact
+        records = b''.join(self._pending)
+        self._file.seek(self._index_offset + self._index_length)
+        self._file.write(records)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        self.__write_header(self._capacity, self._index_offset, self._index_length + len(records))
+        self._index_length += len(records)
+        self._pending = []
+
+    def close(self):
+        '''
+        Flush the library and close the file
+        '''
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._matrix = None
+            self._file.close()
+
+    ### Private Internal Methods
+
+    def __rows(self):
+        '''Internal method for the row of every name, built on first use'''
+        if self._rows is None:
+            self._rows = dict(zip(self._names, range(len(self._names))))
+        return self._rows
+
+    def __map(self):
+        '''Internal method for mapping the value matrix of the file'''
+        self._matrix = np.memmap(self._file, dtype=np.uint16, mode='r+' if self._writable else 'r',
+                                 offset=_DATA_OFFSET, shape=(self._capacity, len(self._channel_list)))
+
+    def __write_header(self, capacity, index_offset, index_length):
+        '''Internal method for pointing the header at a new capacity and index'''
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, len(self._channel_list), capacity,
+                                      len(self._names), index_offset, index_length))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def __grow(self, capacity):
+        '''Internal method for making room for more spectra, the index moves behind the larger matrix'''
+        self.flush()
+        self._matrix.flush()
+        self._matrix = None
+
+        # the index is copied to a place that does not overlap the one the header points at
+        self._file.seek(self._index_offset)
+        index = self._file.read(self._index_length)
+        matrix_end = _DATA_OFFSET + capacity * len(self._channel_list) * 2
+        offset = max(matrix_end, self._index_offset + self._index_length)
+
+        self._file.seek(offset)
+        self._file.write(index)
+        self._file.truncate(offset + len(index))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.__write_header(capacity, offset, len(index))
+
+        self._capacity = capacity
+        self._index_offset = offset
+        self._index_length = len(index)
+        self.__map()
+
+    def __row_values(self, values):
+        '''Internal method for the values of one spectrum ordered by channel_list'''
+        if isinstance(values, str) or (isinstance(values, list) and values and isinstance(values[0], dict)):
+            values = Spectrum.from_list(values)
+        if isinstance(values, Spectrum):
+            return values.aligned(self._channel_list)
+
+        values = np.asarray(values)
+        if values.shape != (len(self._channel_list),):
+            raise ValueError(f"Expected {len(self._channel_list)} values, got shape {values.shape}")
+        return values
+
+
+def _valid_field(text):
+    '''Internal function checking a name or tag can be stored in the index'''
+    return bool(text) and '\n' not in text and '\t' not in text and '\0' not in text
+
+def _read_only(array):
+    '''A read-only view of an array'''
+    view = array.view(np.ndarray)
+    view.flags.writeable = False
+    return view
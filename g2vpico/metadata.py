@@ -0,0 +1,152 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import json
+import os
+import tempfile
+import threading
+
+class MetadataCache():
+    '''
+    A file that stores the channel metadata of each Pico between sessions.
+
+    The channel list, channel limits and wavelength ranges of a Pico do not
+    change during normal use, so a G2VPico created with a MetadataCache can
+    skip reading them from the Pico. Entries are keyed by Pico ID and are
+    checked against the channel count reported by the Pico.
+    '''
+    __FORMAT_VERSION = 1
+
+    def __init__(self, path=None):
+        '''
+        Parameters
+        ----------
+        path : str, optional
+            The cache file, defaults to ~/.cache/g2vpico/metadata.json
+        '''
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.cache', 'g2vpico', 'metadata.json')
+
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def __repr__(self):
+        return f"Pico metadata cache at {self._path}"
+
+    @property
+    def path(self):
+        '''
+        The location of the cache file
+        '''
+        return self._path
+
+    def get(self, pico_id):
+        '''
+        Returns the cached metadata of a Pico
+
+        Parameters
+        ----------
+        pico_id : str
+            The 16 character ID of the Pico
+
+        Returns
+        -------
+        dict
+            A dict with channel_count, channel_list, channel_limits and
+            wavelength_ranges keys, or None if the Pico is not cached
+        '''
+        with self._lock:
+            entry = self.__entries().get(str(pico_id), None)
+
+        if entry is None:
+            return None
+        return dict(entry)
+
+    def put(self, pico_id, metadata):
+        '''
+        Store the metadata of a Pico and write the cache file
+
+        Parameters
+        ----------
+        pico_id : str
+            The 16 character ID of the Pico
+
+        metadata : dict
+            A dict with channel_count, channel_list, channel_limits and
+            wavelength_ranges keys
+        '''
+        with self._lock:
+            self._entries = None
+            self.__entries()[str(pico_id)] = dict(metadata)
+            self.__save()
+
+    def remove(self, pico_id):
+        '''
+        Remove a Pico from the cache so that its metadata is read again
+
+        Parameters
+        ----------
+        pico_id : str
+            The 16 character ID of the Pico
+        '''
+        with self._lock:
+            self._entries = None
+            if self.__entries().pop(str(pico_id), None) is not None:
+                self.__save()
+
+    ### Private Internal Methods
+
+    def __entries(self):
+        '''Internal method for loading the cache file once'''
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self._path, 'r') as infile:
+                    data = json.load(infile)
+                if data.get('version', None) == MetadataCache.__FORMAT_VERSION:
+                    self._entries = data.get('picos', {})
+            except (OSError, ValueError, AttributeError):
+                pass
+
+        return self._entries
+
+    def __save(self):
+        '''Internal method for replacing the cache file in a single step'''
+        directory = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(directory, exist_ok=True)
+
+        data = {}
+        data['version'] = MetadataCache.__FORMAT_VERSION
+        data['picos'] = self._entries
+
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.metadata-')
+        try:
+            with os.fdopen(handle, 'w') as outfile:
+                json.dump(data, outfile, indent=4)
+            os.replace(temp_path, self._path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
@@ -0,0 +1,299 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import bisect
+import json
+import threading
+
+def _escape_label(value):
+    '''Escape a label value for the Prometheus text exposition format'''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsHook():
+    '''
+    The interface G2VPico reports its traffic to.
+
+    Pass an object with these methods as the metrics argument of G2VPico.
+    Every method does nothing here, so a subclass only needs to implement the
+    events it is interested in. Methods are called on the thread that sends
+    the command and must return quickly.
+    '''
+
+    def on_connect(self, pico_id):
+        '''
+        Called when a connection to a Pico has been opened
+
+        Parameters
+        ----------
+        pico_id : str
+            The ID of the Pico
+        '''
+
+    def on_command(self, pico_id, command, seconds, error):
+        '''
+        Called for every command once its response has arrived or it has failed
+
+        Parameters
+        ----------
+        pico_id : str
+            The ID of the Pico
+
+        command : str
+            The command name
+
+        seconds : float
+            The time from sending the command to receiving its response
+
+        error : str
+            None on success, otherwise the protocol.error_category of the
+            error returned by the Pico, or 'connection' when the command
+            could not be sent or its response was not received
+        '''
+
+    def on_bytes(self, pico_id, sent, received):
+        '''
+        Called with the bytes written and read for each command or batch
+
+        Parameters
+        ----------
+        pico_id : str
+            The ID of the Pico
+
+        sent : int
+            The number of bytes written
+
+        received : int
+            The number of bytes read
+        '''
+
+
+class LatencyHistogram():
+    '''
+    A histogram of command latencies with fixed bucket bounds in seconds.
+    '''
+    DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    def __init__(self, buckets=None):
+        '''
+        Parameters
+        ----------
+        buckets : list, optional
+            The increasing upper bounds of the buckets, an overflow bucket is added
+        '''
+        self._bounds = tuple(LatencyHistogram.DEFAULT_BUCKETS if buckets is None else sorted(buckets))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    @property
+    def count(self):
+        '''
+        The number of observations
+        '''
+        return self._count
+
+    @property
+    def sum(self):
+        '''
+        The total of all observations in seconds
+        '''
+        return self._sum
+
+    def observe(self, seconds):
+        '''
+        Add an observation in seconds
+        '''
+        self._counts[bisect.bisect_left(self._bounds, seconds)] += 1
+        self._sum += seconds
+        self._count += 1
+
+    def cumulative(self):
+        '''
+        Returns (upper bound, count of observations at or below it) pairs,
+        ending with float('inf') and the total count
+        '''
+        pairs = []
+        total = 0
+        for bound, count in zip(self._bounds + (float('inf'),), self._counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class PicoMetrics(MetricsHook):
+    '''
+    Collects the traffic of one or more Picos.
+
+    Latency histograms and error counts are kept per Pico and command, and
+    bytes, connections and reconnections per Pico. A Pico that connects
+    again with the same PicoMetrics counts as a reconnection. The collected
+    values can be exported as a JSON snapshot or in the Prometheus text format.
+
+    Example
+    -------
+    metrics = PicoMetrics()
+    pico = G2VPico('192.168.1.70', '00000000c2ca735f', metrics=metrics)
+    pico.get_spectrum()
+    print(metrics.to_prometheus())
+    '''
+
+    def __init__(self, buckets=None):
+        '''
+        Parameters
+        ----------
+        buckets : list, optional
+            The upper bounds in seconds of the latency histogram buckets
+        '''
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._picos = {}
+
+    def __repr__(self):
+        return f"Metrics of {len(self._picos)} PICOs"
+
+    def on_connect(self, pico_id):
+        with self._lock:
+            self.__pico(pico_id)['connects'] += 1
+
+    def on_command(self, pico_id, command, seconds, error):
+        with self._lock:
+            pico = self.__pico(pico_id)
+            histogram = pico['latency'].get(command, None)
+            if histogram is None:
+                histogram = pico['latency'][command] = LatencyHistogram(self._buckets)
+            histogram.observe(seconds)
+
+            if error is not None:
+                key = (command, error)
+                pico['errors'][key] = pico['errors'].get(key, 0) + 1
+
+    def on_bytes(self, pico_id, sent, received):
+        with self._lock:
+            pico = self.__pico(pico_id)
+            pico['bytes_sent'] += sent
+            pico['bytes_received'] += received
+
+    def reset(self):
+        '''
+        Forget everything collected so far
+        '''
+        with self._lock:
+            self._picos.clear()
+
+    def snapshot(self):
+        '''
+        Returns the collected values as a dict keyed by Pico ID
+
+        Each Pico holds connects, reconnects, bytes_sent and bytes_received
+        counts, a commands dict with the count, sum and cumulative buckets of
+        each command latency, and an errors dict of counts keyed by command
+        and then error category.
+        '''
+        with self._lock:
+            snapshot = {}
+            for pico_id, pico in self._picos.items():
+                entry = {}
+                entry['connects'] = pico['connects']
+                entry['reconnects'] = max(pico['connects'] - 1, 0)
+                entry['bytes_sent'] = pico['bytes_sent']
+                entry['bytes_received'] = pico['bytes_received']
+
+                entry['commands'] = {}
+                for command, histogram in pico['latency'].items():
+                    entry['commands'][command] = {
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        'buckets': [["+Inf" if bound == float('inf') else bound, count]
+                                    for bound, count in histogram.cumulative()],
+                    }
+
+                entry['errors'] = {}
+                for (command, category), count in pico['errors'].items():
+                    entry['errors'].setdefault(command, {})[category] = count
+
+                snapshot[pico_id] = entry
+
+        return snapshot
+
+    def to_json(self):
+        '''
+        Returns the snapshot as a JSON formatted string
+        '''
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self):
+        '''
+        Returns the collected values in the Prometheus text exposition format
+        '''
+        snapshot = self.snapshot()
+        lines = []
+
+        lines.append("# HELP g2vpico_command_seconds Time from sending a command to receiving its response")
+        lines.append("# TYPE g2vpico_command_seconds histogram")
+        for pico_id, entry in snapshot.items():
+            for command, histogram in entry['commands'].items():
+                labels = f'pico_id="{_escape_label(pico_id)}",command="{_escape_label(command)}"'
+                for bound, count in histogram['buckets']:
+                    lines.append(f'g2vpico_command_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"g2vpico_command_seconds_sum{{{labels}}} {histogram['sum']}")
+                lines.append(f"g2vpico_command_seconds_count{{{labels}}} {histogram['count']}")
+
+        lines.append("# HELP g2vpico_command_errors_total Commands that failed, by error category")
+        lines.append("# TYPE g2vpico_command_errors_total counter")
+        for pico_id, entry in snapshot.items():
+            for command, categories in entry['errors'].items():
+                for category, count in categories.items():
+                    lines.append(f'g2vpico_command_errors_total{{pico_id="{_escape_label(pico_id)}",'
+                                 f'command="{_escape_label(command)}",'
+                                 f'category="{_escape_label(category)}"}} {count}')
+
+        counters = (
+            ('bytes_sent', "g2vpico_bytes_sent_total", "Bytes written to the Pico"),
+            ('bytes_received', "g2vpico_bytes_received_total", "Bytes read from the Pico"),
+            ('connects', "g2vpico_connects_total", "Connections opened to the Pico"),
+            ('reconnects', "g2vpico_reconnects_total", "Connections opened after the first"),
+        )
+        for key, name, description in counters:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for pico_id, entry in snapshot.items():
+                lines.append(f'{name}{{pico_id="{_escape_label(pico_id)}"}} {entry[key]}')
+
+        return "\n".join(lines) + "\n"
+
+    ### Private Internal Methods
+
+    def __pico(self, pico_id):
+        '''Internal method for the entry of a Pico, created on first use'''
+        pico = self._picos.get(pico_id, None)
+        if pico is None:
+            pico = self._picos[pico_id] = {
+                'connects': 0,
+                'bytes_sent': 0,
+                'bytes_received': 0,
+                'latency': {},
+                'errors': {},
+            }
+        return pico
@@ -0,0 +1,308 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import collections
+import threading
+import time
+
+# Round trip changes smaller than this are jitter of the host and the network
+_NOISE_FLOOR = 0.001
+
+class Pacer():
+    '''
+    Learns the command rate a Pico sustains and paces commands to it.
+
+    Commands are released by a token bucket that fills at the current rate.
+    Every acknowledged single command adds its round trip time to a window
+    of recent samples, and the median of the window is compared to the
+    smallest round trip seen (min_rtt), so single slow commands do not count.
+    While the median stays close to min_rtt the Pico is keeping up. If the
+    token bucket held commands back, the rate then grows additively with
+    time, and at least to the throughput of the acknowledged commands. It
+    does not grow while the client sends slower than the rate, so the rate
+    stays an estimate of what the Pico delivers. When the median rises above
+    min_rtt by more than the tolerance and a noise floor of 1 ms, commands
+    are queueing up in the control box, and the rate is cut multiplicatively,
+    at most once per cut_interval. The Pico is considered caught up again
+    once the median is back within half of that margin. Errors also cut the
+    rate. This additive increase, multiplicative decrease (AIMD) settles just
+    below the highest rate without a backlog.
+
+    A round trip that stays high for rebaseline seconds although the rate
+    was cut is a change of the link and not a backlog, so it becomes the new
+    min_rtt and the rate from before the cuts is restored.
+
+    Example
+    -------
+    pacer = Pacer()
+    pico = G2VPico('192.168.1.70', '00000000c2ca735f', pacer=pacer)
+    for value in range(0, 4000, 10):
+        pico.set_channel_value(1, value)
+    print(pacer.rate)
+    '''
+
+    def __init__(self, rate=100.0, min_rate=1.0, max_rate=2000.0, increase=50.0, decrease=0.7,
+                 tolerance=0.5, alpha=0.125, burst=1.0, window=16, cut_interval=0.25, rebaseline=1.0):
+        '''
+        Parameters
+        ----------
+        rate : float
+            The initial rate in commands per second
+
+        min_rate : float
+            The rate is never cut below this
+
+        max_rate : float
+            The rate never grows above this
+
+        increase : float
+            How much the rate grows every second while the Pico keeps up and
+            the pacer holds commands back, in commands per second
+
+        decrease : float
+            The factor the rate is multiplied by when the Pico falls behind
+
+        tolerance : float
+            How far the median round trip may rise above min_rtt, as a fraction
+            of min_rtt, before the Pico is considered to fall behind
+
+        alpha : float
+            The weight of each new round trip time in srtt
+
+        burst : float
+            The number of commands that can be sent at once after the Pico was idle
+
+        window : int
+            The number of recent round trip times the median is taken over
+
+        cut_interval : float
+            The shortest time between two cuts of the rate in seconds, longer
+            when srtt is longer
+
+        rebaseline : float
+            The time in seconds the round trip may stay high before it is
+            taken as the new min_rtt
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when a parameter is out of range
+        '''
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError("Rates must satisfy 0 < min_rate <= rate <= max_rate.")
+        if not 0 < decrease < 1:
+            raise ValueError("Decrease must be between 0 and 1.")
+        if not 0 < alpha <= 1:
+            raise ValueError("Alpha must be between 0 and 1.")
+        if increase < 0 or tolerance < 0 or burst <= 0 or cut_interval < 0 or rebaseline <= 0:
+            raise ValueError("Increase, tolerance, burst, cut_interval and rebaseline must not be negative.")
+        if window < 1:
+            raise ValueError("Window must hold at least one round trip.")
+
+        self._initial_rate = float(rate)
+        self._min_rate = float(min_rate)
+        self._max_rate = float(max_rate)
+        self._increase = float(increase)
+        self._decrease = float(decrease)
+        self._tolerance = float(tolerance)
+        self._alpha = float(alpha)
+        self._burst = float(burst)
+        self._window = int(window)
+        self._cut_interval = float(cut_interval)
+        self._rebaseline = float(rebaseline)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        srtt = "unknown" if self._srtt is None else f"{self._srtt * 1000:.3f} ms"
+        return f"Pacer at {self._rate:.1f} commands/s, srtt {srtt}"
+
+    @property
+    def rate(self):
+        '''
+        The current estimate of the sustainable rate in commands per second
+        '''
+        return self._rate
+
+    @property
+    def interval(self):
+        '''
+        The time between commands at the current rate in seconds
+        '''
+        return 1.0 / self._rate
+
+    @property
+    def srtt(self):
+        '''
+        The smoothed round trip time in seconds, None before the first acknowledgement
+        '''
+        return self._srtt
+
+    @property
+    def min_rtt(self):
+        '''
+        The smallest round trip time in seconds since the last rebaseline, None
+        before the first acknowledgement
+        '''
+        return self._min_rtt
+
+    @property
+    def decreases(self):
+        '''
+        The number of times the rate was cut
+        '''
+        return self._decreases
+
+    @property
+    def rebaselines(self):
+        '''
+        The number of times a lasting change of the round trip became the new min_rtt
+        '''
+        return self._rebaselines
+
+    def reset(self):
+        '''
+        Forget the learned rate and round trip times
+        '''
+        with self._lock:
+            self._rate = self._initial_rate
+            self._tokens = self._burst
+            self._srtt = None
+            self._min_rtt = None
+            self._samples = collections.deque(maxlen=self._window)
+            self._decreases = 0
+            self._rebaselines = 0
+            self._behind_since = None
+            self._rate_before = self._rate
+            now = time.monotonic()
+            self._last_fill = now
+            self._last_observe = now
+            self._last_decrease = None
+            self._limited = False
+
+    def acquire(self, count=1):
+        '''
+        Wait until count commands may be sent at the current rate
+
+        A batch larger than the burst is let through at once and the
+        commands it borrowed are paid back by the commands after it.
+
+        Parameters
+        ----------
+        count : int
+            The number of commands about to be sent
+
+        Returns
+        -------
+        float
+            The time waited in seconds
+        '''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._last_fill) * self._rate)
+            self._last_fill = now
+            self._tokens -= count
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            if wait > 0:
+                self._limited = True
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def observe(self, seconds, count=1, error=False):
+        '''
+        Update the rate from an acknowledgement
+
+        Only single commands update the round trip times, since the response
+        time of a batch grows with its size.
+
+        Parameters
+        ----------
+        seconds : float
+            The time from sending the commands to receiving the last response
+
+        count : int
+            The number of commands acknowledged
+
+        error : bool
+            True when a command failed or was not acknowledged
+        '''
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_observe
+            self._last_observe = now
+
+            if count == 1 and not error:
+                if self._srtt is None:
+                    self._srtt = seconds
+                    self._min_rtt = seconds
+                else:
+                    self._srtt += self._alpha * (seconds - self._srtt)
+                    self._min_rtt = min(self._min_rtt, seconds)
+                self._samples.append(seconds)
+
+            if error or self.__behind(now):
+                # the commands already in flight saw the old rate, so the next cut waits for them
+                interval = max(self._cut_interval, self._srtt or 0.0)
+                if self._last_decrease is None or now - self._last_decrease >= interval:
+                    self._rate = max(self._min_rate, self._rate * self._decrease)
+                    self._last_decrease = now
+                    self._decreases += 1
+            elif self._limited:
+                # the pacer is what holds the client back, the commands acknowledged
+                # in seconds show a throughput the Pico delivers without a backlog
+                rate = self._rate + self._increase * min(elapsed, 1.0)
+                if seconds > 0:
+                    rate = max(rate, count / seconds)
+                self._rate = min(self._max_rate, rate)
+            self._limited = False
+
+    ### Private Internal Methods
+
+    def __behind(self, now):
+        '''Internal method for whether commands are queueing up, from the median recent round trip'''
+        # a few samples do not tell jitter from a backlog
+        if len(self._samples) < (self._window + 1) // 2:
+            return False
+
+        ordered = sorted(self._samples)
+        median = ordered[len(ordered) // 2]
+        margin = self._min_rtt * self._tolerance + _NOISE_FLOOR
+
+        if self._behind_since is None:
+            if median > self._min_rtt + margin:
+                self._behind_since = now
+                self._rate_before = self._rate
+        elif median <= self._min_rtt + margin / 2:
+            self._behind_since = None
+        elif now - self._behind_since >= self._rebaseline:
+            # cutting the rate did not bring the round trip back, so the link itself changed
+            self._min_rtt = median
+            self._rate = max(self._rate, self._rate_before)
+            self._behind_since = None
+            self._rebaselines += 1
+
+        return self._behind_since is not None
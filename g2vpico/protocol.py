@@ -0,0 +1,648 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import collections
+import functools
+import json
+import re
+
+try:
+    import orjson as _orjson
+except ImportError:
+    # orjson is optional, responses are decoded with the json module without it
+    _orjson = None
+
+_WHITESPACE = b' \t\r\n'
+
+# The bytes that change the nesting of a message outside and inside its strings
+_STRUCTURE = re.compile(rb'["{}\[\]]')
+_STRING = re.compile(rb'["\\]')
+_QUOTE = ord('"')
+_BACKSLASH = ord('\\')
+
+# What may follow the position of a decoding error when the message is only cut short
+_LITERALS = ('true', 'false', 'null', 'NaN', 'Infinity', '-Infinity')
+_NUMBER_TAIL = re.compile(r'[.eE][0-9eE+\-]*\Z')
+# a complete escape is also reported while a second escape of a surrogate pair may follow it
+_UNICODE_ESCAPE = re.compile(r'u[0-9a-fA-F]{0,4}(\\(u[0-9a-fA-F]{0,4})?)?\Z')
+
+class MessageDecoder():
+    '''
+    An incremental decoder that splits the byte stream from a Pico into JSON messages.
+
+    The Pico does not delimit its responses, so a single read can hold part of a
+    message, exactly one message or several messages back-to-back. Bytes are
+    received into a preallocated buffer and every complete message is decoded
+    and queued until it is taken with pop(). When orjson is installed it
+    decodes the common case of a buffer holding exactly one message.
+
+    A message that is still incomplete after its first read is not decoded
+    again on every read. The bytes that arrive are scanned once for the end of
+    the message, and the partial message is checked for invalid JSON whenever
+    it has doubled in size, so that large messages take linear time and a
+    corrupt stream is rejected without waiting for max_message_size bytes.
+    '''
+
+    def __init__(self, buffer_size=4096, max_message_size=1048576):
+        '''
+        Parameters
+        ----------
+        buffer_size : int
+            The initial size of the receive buffer in bytes
+
+        max_message_size : int
+            The largest message in bytes that will be buffered before the
+            stream is treated as corrupt
+        '''
+        self._buffer = bytearray(buffer_size)
+        self._read_size = max(buffer_size // 4, 1)
+        self._start = 0
+        self._end = 0
+        self._max_message_size = max_message_size
+        self._decoder = json.JSONDecoder()
+        self._messages = collections.deque()
+        self.__reset_scan()
+
+    def __len__(self):
+        return len(self._messages)
+
+    @property
+    def buffered(self):
+        '''
+        The number of received bytes that are not part of a complete message yet
+        '''
+        return self._end - self._start
+
+    def recv_into(self, sock):
+        '''
+        Receive available bytes from the socket and decode any complete messages
+
+        Parameters
+        ----------
+        sock : socket.socket
+            A connected socket
+
+        Returns
+        -------
+        int
+            The number of bytes received
+
+        Exceptions
+        ----------
+        ConnectionError
+            Raised when the connection has been closed by the Pico
+
+        ValueError
+            Raised when the received data is not a valid stream of JSON messages
+        '''
+        self.__reserve(self._read_size)
+        with memoryview(self._buffer) as view:
+            count = sock.recv_into(view[self._end:])
+
+        if count == 0:
+            raise ConnectionError("Connection closed by the Pico")
+
+        self._end += count
+        self.__decode()
+        return count
+
+    def feed(self, data):
+        '''
+        Add bytes that were received elsewhere and decode any complete messages
+
+        Parameters
+        ----------
+        data : bytes
+            Bytes received from the Pico
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the received data is not a valid stream of JSON messages
+        '''
+        self.__reserve(len(data))
+        self._buffer[self._end:self._end + len(data)] = data
+        self._end += len(data)
+        self.__decode()
+
+    def pop(self):
+        '''
+        Remove and return the oldest complete message
+
+        Exceptions
+        ----------
+        IndexError
+            Raised when no complete message is available
+        '''
+        return self._messages.popleft()
+
+    def messages(self):
+        '''
+        A generator yielding complete messages in the order they were received
+        '''
+        while self._messages:
+            yield self._messages.popleft()
+
+    def clear(self):
+        '''
+        Discard all buffered bytes and decoded messages
+        '''
+        self._start = 0
+        self._end = 0
+        self._messages.clear()
+        self.__reset_scan()
+
+    def __reserve(self, size):
+        '''Internal method for making room for at least size more bytes at the end of the buffer'''
+        if self._start == self._end:
+            self._start = 0
+            self._end = 0
+        elif self._start > 0 and len(self._buffer) - self._end < size:
+            pending = self._end - self._start
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._start = 0
+            self._end = pending
+
+        free = len(self._buffer) - self._end
+        if free < size:
+            if self._end + size > self._max_message_size:
+                self.clear()
+                raise ValueError("Response from the Pico is too large to decode")
+            self._buffer.extend(bytes(max(size - free, len(self._buffer))))
+
+    def __reset_scan(self):
+        '''Internal method for starting the scan of a new message'''
+        self._scanned = 0
+        self._depth = 0
+        self._in_string = False
+        self._checked = 0
+
+    def __decode(self):
+        '''Internal method for moving every complete message in the buffer to the message queue'''
+        while True:
+            if self._scanned == 0:
+                self.__decode_complete()
+                if self._start == self._end:
+                    return
+                self._checked = self._end - self._start
+
+            end = self.__scan()
+            if end is None:
+                self.__check_partial()
+                return
+
+            data = self._buffer[self._start:end]
+            self._start = end
+            self.__reset_scan()
+            try:
+                self._messages.append(json.loads(data) if _orjson is None else _orjson.loads(data))
+            except ValueError as exc:
+                self.clear()
+                raise ValueError("Response from the Pico is not a JSON message") from exc
+
+    def __decode_complete(self):
+        '''Internal method for decoding the messages at the start of the buffer up to the first partial message'''
+        while self._start < self._end and self._buffer[self._start] in _WHITESPACE:
+            self._start += 1
+        if self._start == self._end:
+            return
+
+        if self._buffer[self._start] not in b'{[':
+            self.clear()
+            raise ValueError("Response from the Pico is not a JSON message")
+
+        data = self._buffer[self._start:self._end]
+        if _orjson is not None:
+            try:
+                message = _orjson.loads(data)
+            except _orjson.JSONDecodeError:
+                # a partial message or several messages, split below
+                pass
+            else:
+                self._messages.append(message)
+                self._start = self._end
+                return
+
+        text = self.__decode_text(data)
+        index = 0
+        while index < len(text):
+            try:
+                message, end = self._decoder.raw_decode(text, index)
+            except json.JSONDecodeError as exc:
+                if not _cut_short(text, exc):
+                    self.clear()
+                    raise ValueError("Response from the Pico is not a JSON message") from exc
+                break
+
+            self._messages.append(message)
+            index = end
+            while index < len(text) and text[index] in ' \t\r\n':
+                index += 1
+
+        if text.isascii():
+            self._start += index
+        else:
+            self._start += len(text[:index].encode('utf-8'))
+
+        if self._start < self._end and self._buffer[self._start] not in b'{[':
+            self.clear()
+            raise ValueError("Response from the Pico is not a JSON message")
+
+    def __decode_text(self, data):
+        '''Internal method for decoding received bytes, leaving out a character that is cut short'''
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError as exc:
+            if exc.reason != 'unexpected end of data':
+                self.clear()
+                raise ValueError("Response from the Pico is not valid UTF-8") from exc
+            return data[:exc.start].decode('utf-8')
+
+    def __scan(self):
+        '''Internal method for the end of the message at the start of the buffer, None while it is incomplete'''
+        buffer = self._buffer
+        position = self._start + self._scanned
+        while True:
+            match = (_STRING if self._in_string else _STRUCTURE).search(buffer, position, self._end)
+            if match is None:
+                self._scanned = self._end - self._start
+                return None
+
+            position = match.end()
+            char = buffer[match.start()]
+            if char == _QUOTE:
+                self._in_string = not self._in_string
+            elif char == _BACKSLASH:
+                if position == self._end:
+                    # the escaped character has not arrived, scan the escape again
+                    self._scanned = match.start() - self._start
+                    return None
+                position += 1
+            elif char in b'{[':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return position
+
+    def __check_partial(self):
+        '''Internal method for rejecting a partial message that can not become valid JSON'''
+        pending = self._end - self._start
+        if pending < 2 * self._checked:
+            return
+        self._checked = pending
+
+        text = self.__decode_text(self._buffer[self._start:self._end])
+        try:
+            self._decoder.raw_decode(text)
+        except json.JSONDecodeError as exc:
+            if not _cut_short(text, exc):
+                self.clear()
+                raise ValueError("Response from the Pico is not a JSON message") from exc
+
+
+def _cut_short(text, error):
+    '''Whether a JSON decoding error is only caused by the text ending early'''
+    if error.pos >= len(text) or error.msg.startswith("Unterminated string"):
+        return True
+
+    rest = text[error.pos:]
+    if error.msg == "Expecting value":
+        return any(literal.startswith(rest) for literal in _LITERALS)
+    if error.msg.startswith("Expecting ','"):
+        return text[error.pos - 1].isdigit() and _NUMBER_TAIL.match(rest) is not None
+    if error.msg.startswith("Invalid \\uXXXX escape"):
+        return _UNICODE_ESCAPE.match(rest) is not None
+    return False
+
+
+# The errors returned by the Pico, each with the short name from error_category
+# and the exception error_handler raises for it. The message is formatted with
+# the command the error was returned for.
+_ERRORS = (
+    ("Pico ID invalid", "pico_id_invalid", RuntimeError, "Pico ID is invalid"),
+    ("Command type invalid", "command_invalid", NotImplementedError, "Command {command} is not implemented"),
+    ("Pico is not Variable", "not_variable", RuntimeError, "Operation not allowed in Fixed Picos"),
+    ("Pico API not enabled", "api_not_enabled", RuntimeError, "Pico API not enabled"),
+)
+
+def _find_error(error):
+    '''Returns the entry of _ERRORS matching an error string, or None'''
+    for entry in _ERRORS:
+        if entry[0] in error:
+            return entry
+    return None
+
+
+def error_handler(error, command):
+    '''
+    Raise the exception matching an error string returned by the Pico
+
+    Parameters
+    ----------
+    error : str
+        The error returned by the Pico
+
+    command : str
+        The command the error was returned for
+    '''
+    entry = _find_error(error)
+    if entry is not None:
+        _, _, exception, message = entry
+        raise exception(message.format(command=command))
+
+    raise Exception(f"Unknown error occurred: {error}")
+
+
+def error_category(error):
+    '''
+    Returns a short name for the kind of error returned by the Pico, matching
+    the cases handled by error_handler
+
+    Parameters
+    ----------
+    error : str
+        The error returned by the Pico
+    '''
+    entry = _find_error(error)
+    if entry is None:
+        return "unknown"
+    return entry[1]
+
+
+def check_channel(channel, channel_list):
+    '''Verify that a channel is valid and convert it to int'''
+    try:
+        channel = int(channel)
+    except Exception as exc:
+        raise ValueError(f"Channel type of {channel} is invalid") from exc
+
+    if channel not in channel_list:
+        raise ValueError(f"A channel value of {channel} is invalid")
+
+    return channel
+
+
+def check_value(value):
+    '''Verify that a channel value is valid and convert it to int'''
+    try:
+        value = int(value)
+    except Exception as exc:
+        raise ValueError(f"Value type of {value} is invalid") from exc
+
+    return value
+
+
+def spectrum_items(channel_list):
+    '''
+    Read the channel and value pairs out of a spectrum
+
+    Parameters
+    ----------
+    channel_list : str, list
+        str - A JSON formatted string contain channels and their corresponding values
+        list - A list of dict objects containing 'channel' and 'value' keys
+
+    Returns
+    -------
+    list
+        A list of (channel, value) tuples for every item that has both keys set
+
+    Exceptions
+    ----------
+    ValueError
+        If the spectrum data in channel_list is invalid when of str type
+
+    ValueError
+        If the type of channel_list is invalid
+    '''
+    spectrum_list = []
+    if isinstance(channel_list, str):
+        load_good = True
+        try:
+            spectrum_list = json.loads(channel_list)
+        except Exception:
+            load_good = False
+
+        if not load_good:
+            raise ValueError("Spectrum data could not be loaded")
+
+    elif isinstance(channel_list, list):
+        spectrum_list = channel_list
+    else:
+        raise ValueError(f"Spectrum data of type {channel_list} is invalid")
+
+    items = []
+    for item in spectrum_list:
+        channel = item.get('channel', None)
+        value = item.get('value', None)
+
+        if channel and (value or value == 0):
+            items.append((channel, value))
+
+    return items
+
+
+class Request():
+    '''
+    A command for the Pico together with the way its response is read.
+
+    The functions below build a Request for every command in the Pico API so
+    that all clients send identical commands and interpret responses the same way.
+    The command is encoded from cached byte templates instead of building and
+    serializing a dict on every call, producing the same bytes as json.dumps.
+    '''
+    __slots__ = ('pico_id', 'name', 'keys', 'values', 'key', 'convert', 'map_errors')
+
+    def __init__(self, pico_id, name, keys, values, key, convert=None, map_errors=True):
+        '''
+        Parameters
+        ----------
+        pico_id : str
+            The 16 character ID of the Pico
+
+        name : str
+            The name of the command sent to the Pico
+
+        keys : tuple
+            The names of the additional command fields in the order they are sent
+
+        values : tuple
+            The value of each additional command field
+
+        key : str, tuple
+            The response key holding the result, or a tuple of keys whose
+            values are returned as a list
+
+        convert : callable, optional
+            Applied to the result when it is not None
+
+        map_errors : bool
+            When True errors are raised through error_handler, otherwise the
+            error string is raised as an Exception
+        '''
+        self.pico_id = pico_id
+        self.name = name
+        self.keys = keys
+        self.values = values
+        self.key = key
+        self.convert = convert
+        self.map_errors = map_errors
+
+    def __repr__(self):
+        return f"Request({self.cmd})"
+
+    @property
+    def cmd(self):
+        '''
+        The command sent to the Pico as a dict
+        '''
+        return build_command(self.pico_id, self.name, **dict(zip(self.keys, self.values)))
+
+    def encode(self):
+        '''
+        The bytes sent to the Pico for this command
+        '''
+        parts = _command_template(self.pico_id, self.name, self.keys)
+        if not self.values:
+            return parts[0]
+
+        encoded = [parts[0]]
+        for part, value in zip(parts[1:], self.values):
+            # bool is a subclass of int but is sent as true or false
+            encoded.append(b'%d' % value if type(value) is int else json.dumps(value).encode('utf-8'))
+            encoded.append(part)
+        return b''.join(encoded)
+
+    def parse(self, response):
+        '''
+        Return the result held in a response to this command
+
+        Parameters
+        ----------
+        response : dict, None
+            The decoded response from the Pico
+
+        Returns
+        -------
+        object
+            The result, or None if the response does not belong to this command
+        '''
+        if response is not None:
+            new_cmd = response.get('cmd')
+            error = response.get('error', None)
+
+            if error is not None:
+                if self.map_errors:
+                    error_handler(error, new_cmd)
+                raise Exception(error)
+
+            if new_cmd == self.name:
+                if isinstance(self.key, tuple):
+                    return [response.get(key, None) for key in self.key]
+
+                value = response.get(self.key, None)
+                if value is not None and self.convert is not None:
+                    value = self.convert(value)
+                return value
+
+        return None
+
+
+def build_command(pico_id, name, **fields):
+    '''
+    Build the dict sent to the Pico for a command
+
+    Parameters
+    ----------
+    pico_id : str
+        The 16 character ID of the Pico
+
+    name : str
+        The name of the command
+
+    fields
+        Any additional command fields in the order they are sent
+    '''
+    cmd = {}
+    cmd['command'] = 'api'
+    cmd['pico_id'] = pico_id
+    cmd['cmd'] = name
+    cmd.update(fields)
+    return cmd
+
+
+@functools.lru_cache(maxsize=1024)
+def _command_template(pico_id, name, keys):
+    '''
+    The encoded command split around its field values, a Pico ID and command
+    name are only serialized the first time they are used
+    '''
+    text = json.dumps(build_command(pico_id, name))
+    if not keys:
+        return (text.encode('utf-8'),)
+
+    parts = [text[:-1]]
+    for key in keys:
+        parts[-1] += f", {json.dumps(key)}: "
+        parts.append('')
+    parts[-1] = '}'
+    return tuple(part.encode('utf-8') for part in parts)
+
+
+def _int_list(values):
+    return [int(x) for x in values]
+
+### Requests for each command in the Pico API
+
+def get_channel_count(pico_id):
+    return Request(pico_id, 'get_channel_count', (), (), 'channel_count')
+
+def get_channel_list(pico_id):
+    return Request(pico_id, 'get_channel_list', (), (), 'channel_list', convert=_int_list)
+
+def get_channel_value(pico_id, channel):
+    return Request(pico_id, 'get_channel_value', ('channel',), (channel,), 'value')
+
+def set_channel_value(pico_id, channel, value):
+    return Request(pico_id, 'set_channel_value', ('channel', 'value'), (channel, value), 'result')
+
+def get_channel_limit(pico_id, channel):
+    return Request(pico_id, 'get_channel_limit', ('channel',), (channel,), 'limit')
+
+def get_channel_range(pico_id, channel):
+    return Request(pico_id, 'get_channel_range', ('channel',), (channel,), ('x_low', 'x_high'))
+
+def get_global_intensity(pico_id):
+    return Request(pico_id, 'get_global_intensity', (), (), 'global_intensity', map_errors=False)
+
+def set_global_intensity(pico_id, value):
+    return Request(pico_id, 'set_global_intensity', ('global_intensity',), (value,), 'result', map_errors=False)
+
+def set_fixture_on(pico_id, fixture_on):
+    return Request(pico_id, 'set_fixture_on', ('fixture_on',), (fixture_on,), 'result', map_errors=False)
+
+def get_fixture_on(pico_id):
+    return Request(pico_id, 'get_fixture_on', (), (), 'fixture_on', map_errors=False)
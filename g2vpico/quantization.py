@@ -0,0 +1,67 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import decimal
+
+def quantize_values(values, resolution):
+    '''
+    Round values to the nearest multiple of a resolution
+
+    The values are rounded to a whole number of steps first and then
+    multiplied by the resolution once, so every result lies on the grid of
+    the resolution. The product is rounded to the decimal places of the
+    resolution to remove floating point noise, so 0.1 * 3 is 0.3.
+
+    Parameters
+    ----------
+    values : float, numpy.ndarray
+        A value or an array of values
+
+    resolution : float
+        The step between output values, 0 returns the values unchanged
+
+    Returns
+    -------
+    float, numpy.ndarray
+        The rounded values, of the same type as values
+    '''
+    if not resolution:
+        return values
+
+    resolution = float(resolution)
+    decimals = resolution_decimals(resolution)
+    steps = values / resolution
+    if hasattr(steps, 'round'):
+        # numpy arrays and scalars
+        return (steps.round() * resolution).round(decimals)
+    return round(round(steps) * resolution, decimals)
+
+
+def resolution_decimals(resolution):
+    '''
+    Returns the number of decimal places of a resolution, 2 for 0.25 and 0 for 5
+    '''
+    exponent = decimal.Decimal(repr(float(resolution))).normalize().as_tuple().exponent
+    return max(0, -exponent)
@@ -0,0 +1,542 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import array
+import bisect
+import csv
+import datetime as dt
+import math
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from .quantization import quantize_values
+from .scheduler import Scheduler
+
+# A recipe file is a header holding the row count, followed by a column of the
+# float64 times of every row and then a column of their float64 values
+_MAGIC = b'G2VRCP\x00\x01'
+_HEADER = struct.Struct('<8sQ')
+_CHUNK_ROWS = 4096
+_EPOCH = dt.datetime(1970, 1, 1)
+
+def read_csv(path, time_column=0, value_column=1, start=None, delimiter=','):
+    '''
+    Stream the (time, value) rows of a CSV file, one line at a time
+
+    Times are seconds, either as numbers or ISO 8601 timestamps that are
+    converted to seconds since the epoch, UTC when they have no time zone.
+    A first line that does not parse is skipped as a header.
+
+    Parameters
+    ----------
+    path : str
+        The CSV file
+
+    time_column : int, str
+        The index of the time column, or its name in the header line
+
+    value_column : int, str
+        The index of the value column, or its name in the header line
+
+    start : float, optional
+        Skip the rows before the last one at or before this time
+
+    delimiter : str
+        The field delimiter
+
+    Returns
+    -------
+    generator
+        (time, value) tuples of floats
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when a line cannot be parsed or a column name is not in the header
+    '''
+    with open(path, 'r', newline='') as infile:
+        reader = csv.reader(infile, delimiter=delimiter)
+
+        named = isinstance(time_column, str) or isinstance(value_column, str)
+        if named:
+            header = [field.strip() for field in next(reader, [])]
+            time_column, value_column = (_column_index(header, column, path)
+                                         for column in (time_column, value_column))
+
+        # the time format is found from the first row instead of tried for every row
+        parse_time = None
+        previous = None
+        for fields in reader:
+            if not fields:
+                continue
+            try:
+                if parse_time is None:
+                    parse_time = _time_parser(fields[time_column])
+                row = (parse_time(fields[time_column]), float(fields[value_column]))
+            except (ValueError, IndexError) as e:
+                if reader.line_num == 1 and not named:
+                    continue
+                raise ValueError(f"{path} line {reader.line_num}: {e}") from None
+
+            if start is not None:
+                if row[0] <= start:
+                    previous = row
+                    continue
+                start = None
+                if previous is not None:
+                    yield previous
+
+            yield row
+
+        if start is not None and previous is not None:
+            yield previous
+
+
+def write_recipe(path, rows):
+    '''
+    Write (time, value) rows to a recipe file
+
+    The rows are streamed, so memory does not grow with their number.
+    A recipe file is read faster than a CSV file and read_recipe finds
+    the row of a start time without reading the rows before it.
+
+    Parameters
+    ----------
+    path : str
+        The recipe file, it is overwritten
+
+    rows : iterable
+        (time, value) rows in increasing time order
+
+    Returns
+    -------
+    int
+        The number of rows written
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when the times are not increasing
+    '''
+    count = 0
+    last = -math.inf
+    times = array.array('d')
+    values = array.array('d')
+
+    # the times are written in place and the values to a spool that is appended behind them
+    with open(path, 'wb') as outfile, tempfile.TemporaryFile() as spool:
+        outfile.write(_HEADER.pack(_MAGIC, 0))
+        for time_s, value in rows:
+            if time_s < last:
+                raise ValueError(f"Recipe times must be increasing, {time_s} follows {last}")
+            last = time_s
+            times.append(time_s)
+            values.append(value)
+            count += 1
+            if len(times) == _CHUNK_ROWS:
+                outfile.write(_little_endian(times))
+                spool.write(_little_endian(values))
+                times = array.array('d')
+                values = array.array('d')
+
+        outfile.write(_little_endian(times))
+        spool.write(_little_endian(values))
+
+        spool.seek(0)
+        while True:
+            data = spool.read(_CHUNK_ROWS * 8)
+            if not data:
+                break
+            outfile.write(data)
+
+        outfile.seek(0)
+        outfile.write(_HEADER.pack(_MAGIC, count))
+
+    return count
+
+
+def read_recipe(path, start=None):
+    '''
+    Stream the (time, value) rows of a recipe file written by write_recipe
+
+    Parameters
+    ----------
+    path : str
+        The recipe file
+
+    start : float, optional
+        Begin at the last row at or before this time, found by a binary
+        search of the time column
+
+    Returns
+    -------
+    generator
+        (time, value) tuples of floats
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when the file is not a recipe file
+    '''
+    with open(path, 'rb') as infile:
+        magic, count = _HEADER.unpack(infile.read(_HEADER.size).ljust(_HEADER.size, b'\0'))
+        infile.seek(0, 2)
+        if magic != _MAGIC or infile.tell() != _HEADER.size + 16 * count:
+            raise ValueError(f"{path} is not a recipe file")
+
+        index = 0
+        if start is not None:
+            index = max(bisect.bisect_right(_TimeColumn(infile, count), start) - 1, 0)
+
+        while index < count:
+            rows = min(_CHUNK_ROWS, count - index)
+            infile.seek(_HEADER.size + 8 * index)
+            times = _read_column(infile, rows)
+            infile.seek(_HEADER.size + 8 * (count + index))
+            values = _read_column(infile, rows)
+            yield from zip(times, values)
+            index += rows
+
+
+def resample(rows, interval):
+    '''
+    Linearly interpolate rows onto a grid of every multiple of interval
+
+    The first row is kept as it is, followed by every grid time up to the
+    last row. The grid does not depend on the first row, so a recipe resumed
+    from a later start time steps at the same times.
+
+    Parameters
+    ----------
+    rows : iterable
+        (time, value) rows in increasing time order
+
+    interval : float
+        The grid spacing in seconds
+
+    Returns
+    -------
+    generator
+        (time, value) tuples
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when interval is not greater than zero or the times are not increasing
+    '''
+    if interval <= 0:
+        raise ValueError("Interval must be greater than zero.")
+
+    rows = iter(rows)
+    previous = next(rows, None)
+    if previous is None:
+        return
+    yield previous
+
+    step = math.floor(previous[0] / interval) + 1
+    for row in rows:
+        if row[0] < previous[0]:
+            raise ValueError(f"Recipe times must be increasing, {row[0]} follows {previous[0]}")
+
+        grid_time = step * interval
+        while grid_time <= row[0]:
+            fraction = (grid_time - previous[0]) / (row[0] - previous[0])
+            yield (grid_time, previous[1] + fraction * (row[1] - previous[1]))
+            step += 1
+            grid_time = step * interval
+        previous = row
+
+
+def quantize(rows, resolution=0.1, minimum=None, maximum=None):
+    '''
+    Clamp values to a range and round them to a multiple of resolution
+
+    Parameters
+    ----------
+    rows : iterable
+        (time, value) rows
+
+    resolution : float
+        The values are rounded to a multiple of this value, 0 disables rounding
+
+    minimum : float, optional
+        Values below are raised to minimum
+
+    maximum : float, optional
+        Values above are lowered to maximum
+
+    Returns
+    -------
+    generator
+        (time, value) tuples
+    '''
+    for time_s, value in rows:
+        if minimum is not None and value < minimum:
+            value = minimum
+        if maximum is not None and value > maximum:
+            value = maximum
+        yield (time_s, quantize_values(value, resolution))
+
+
+def dedupe(rows):
+    '''
+    Drop the rows that hold the same value as the row before
+
+    Parameters
+    ----------
+    rows : iterable
+        (time, value) rows
+
+    Returns
+    -------
+    generator
+        The (time, value) rows where the value changes
+    '''
+    last = None
+    for row in rows:
+        if row[1] != last:
+            last = row[1]
+            yield row
+
+
+class RecipePlayer():
+    '''
+    Plays a stream of (time, value) rows on a Pico.
+
+    Rows are read from the stream as they are played, so a recipe of a year
+    of samples uses no more memory than a recipe of a minute. Each row is
+    sent at its absolute deadline on the monotonic clock using the Scheduler,
+    so time spent reading the stream and sending commands does not add up
+    over the run.
+
+    The recipe time of the last row sent is kept in position. After a
+    restart the same recipe can be resumed by opening its rows with a start
+    time and passing the start time to play, which sends the value in effect
+    at that time and continues from there.
+
+    Example
+    -------
+    rows = read_csv('irradiance.csv', 'timestamp', 'ghi', start=resume_time)
+    rows = ((time_s, ghi / 10) for time_s, ghi in resample(rows, 60))
+    player = RecipePlayer(pico, dedupe(quantize(rows, 0.1, 0, 100)))
+    player.play(start=resume_time)
+    '''
+
+    def __init__(self, pico, rows, channel=None, speed=1.0, spin=0.0):
+        '''
+        Parameters
+        ----------
+        pico : G2VPico
+            The Pico to play the recipe on
+
+        rows : iterable
+            (time, value) rows in increasing time order, usually a generator pipeline
+
+        channel : int, optional
+            Play the recipe on the value of a channel instead of the global intensity
+
+        speed : float
+            Recipe seconds played per second, 60 plays an hour in a minute
+
+        spin : float
+            Passed to the Scheduler, the final part of each wait spent polling the clock
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when speed is not greater than zero
+        '''
+        if speed <= 0:
+            raise ValueError("Speed must be greater than zero.")
+
+        self._pico = pico
+        self._rows = rows
+        self._channel = channel
+        self._speed = speed
+        self._spin = spin
+        self._stats = None
+        self._position = None
+        self._sent = 0
+        self._stop = threading.Event()
+
+    def __repr__(self):
+        target = "global intensity" if self._channel is None else f"channel {self._channel}"
+        return f"Recipe player on {target} at {self._position}"
+
+    @property
+    def position(self):
+        '''
+        The recipe time of the last row sent, None before the first
+        '''
+        return self._position
+
+    @property
+    def sent(self):
+        '''
+        The number of rows sent
+        '''
+        return self._sent
+
+    @property
+    def stats(self):
+        '''
+        The LatenessStats of the last play, None before the first
+        '''
+        return self._stats
+
+    def stop(self):
+        '''
+        Make play return before the next row, may be called from another thread
+        '''
+        self._stop.set()
+
+    def play(self, start=None):
+        '''
+        Play the rows and return once the last one has been sent or stop was called
+
+        Parameters
+        ----------
+        start : float, optional
+            The recipe time to begin at. Rows before it are skipped and the
+            value of the last skipped row is sent first, as the value in
+            effect at the start. By default the recipe begins at its first row.
+
+        Returns
+        -------
+        LatenessStats
+            How late each row was sent
+        '''
+        if self._channel is None:
+            send = self._pico.set_global_intensity
+        else:
+            channel = self._channel
+            send = lambda value: self._pico.set_channel_value(channel, int(value))
+
+        self._stop.clear()
+        scheduler = Scheduler(spin=self._spin)
+        self._stats = scheduler.stats
+        spin_ns = int(round(self._spin * 1e9))
+
+        origin = start
+        held = None
+        for time_s, value in self._rows:
+            if self._stop.is_set():
+                break
+
+            if origin is None:
+                origin = time_s
+            elif time_s < origin:
+                held = value
+                continue
+
+            # a row at the start replaces the value held from before it
+            if held is not None and time_s > origin:
+                self.__send(send, origin, held)
+            held = None
+
+            # sleep on the stop event so stop() does not wait for a whole step
+            offset = (time_s - origin) / self._speed
+            remaining_ns = scheduler.deadline(0) + int(round(offset * 1e9)) - time.monotonic_ns()
+            if remaining_ns > spin_ns and self._stop.wait((remaining_ns - spin_ns) / 1e9):
+                break
+
+            scheduler.wait_at(offset)
+            self.__send(send, time_s, value)
+
+        if held is not None and not self._stop.is_set():
+            self.__send(send, origin, held)
+
+        return self._stats
+
+    ### Private Internal Methods
+
+    def __send(self, send, time_s, value):
+        '''Internal method sending the value of a row'''
+        send(value)
+        self._position = time_s
+        self._sent += 1
+
+
+class _TimeColumn():
+    '''The time column of a recipe file as a sequence for bisect'''
+
+    def __init__(self, infile, count):
+        self._file = infile
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        self._file.seek(_HEADER.size + 8 * index)
+        return struct.unpack('<d', self._file.read(8))[0]
+
+
+def _column_index(header, column, path):
+    '''Internal function for the index of a column given by index or header name'''
+    if not isinstance(column, str):
+        return column
+    try:
+        return header.index(column)
+    except ValueError:
+        raise ValueError(f"{path} has no column {column}") from None
+
+
+def _time_parser(text):
+    '''Internal function for the function parsing times in the format of text'''
+    try:
+        float(text)
+        return float
+    except ValueError:
+        _parse_timestamp(text)
+        return _parse_timestamp
+
+
+def _parse_timestamp(text):
+    '''Internal function for the seconds since the epoch of an ISO 8601 timestamp, UTC without a time zone'''
+    timestamp = dt.datetime.fromisoformat(text.strip().replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        return timestamp.timestamp()
+    return (timestamp - _EPOCH).total_seconds()
+
+
+def _little_endian(column):
+    '''Internal function for the little endian bytes of a float64 array'''
+    if sys.byteorder != 'little':
+        column = array.array('d', column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_column(infile, rows):
+    '''Internal function reading rows float64 values from the file position'''
+    column = array.array('d')
+    column.frombytes(infile.read(8 * rows))
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
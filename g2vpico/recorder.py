@@ -0,0 +1,523 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import argparse
+import collections
+import json
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+
+from .protocol import MessageDecoder
+from .scheduler import LatenessStats, Scheduler
+
+# A log starts with the magic bytes and is followed by records of a 5 byte header
+# holding the length of the body and the record type.
+MAGIC = b'G2VPLOG\x01'
+
+_HEADER = struct.Struct('<IB')
+_SESSION = struct.Struct('<q')
+_NAME = struct.Struct('<H')
+_MESSAGES = struct.Struct('<QHH')
+
+_SESSION_RECORD = 0
+_NAME_RECORD = 1
+_COMMANDS_RECORD = 2
+_RESPONSES_RECORD = 3
+
+_KINDS = {_COMMANDS_RECORD: 'command', _RESPONSES_RECORD: 'response'}
+
+# A response that was never received is stored as an empty JSON array, which
+# the Pico never sends, so that every response stays paired with its command
+_MISSING = b'[]'
+
+# The writer thread wakes at most this often in seconds so that it rarely
+# competes with the sending thread for the interpreter
+_WRITE_INTERVAL = 0.01
+
+LogRecord = collections.namedtuple('LogRecord', ['session', 'time', 'kind', 'pico_id', 'command', 'message'])
+LogRecord.__doc__ = '''
+A command or response read from a session log.
+
+session is the index of the recording session in the file, time is the
+monotonic time in seconds since the session started, kind is 'command' or
+'response' and message is the decoded JSON message, or None for a response
+that was never received.
+'''
+
+ReplayResult = collections.namedtuple('ReplayResult', ['commands', 'mismatches', 'lateness'])
+ReplayResult.__doc__ = '''
+The outcome of replaying a session.
+
+commands is the number of commands sent, mismatches the number of responses
+that differ from the recorded responses and lateness the LatenessStats of how
+late each group of commands was sent.
+'''
+
+class Recorder():
+    '''
+    Records every command sent to a Pico and its response in an append-only binary log.
+
+    The sending thread only takes a timestamp and queues the bytes it sent or
+    the responses it received; a background thread encodes the records and
+    writes them to the file. Each record is length prefixed, holds the commands
+    written together or the responses read together, and refers to command
+    names and Pico IDs by a small number that is defined the first time the
+    name is written. Commands are stored as the exact bytes sent to the Pico.
+    Opening an existing log appends a new session to it, after dropping a
+    record at its end that was cut short.
+
+    Example
+    -------
+    with Recorder('session.g2vlog') as recorder:
+        pico = G2VPico('192.168.1.70', '00000000c2ca735f', recorder=recorder)
+        pico.set_global_intensity(50.0)
+        pico.close()
+    '''
+
+    def __init__(self, path):
+        '''
+        Parameters
+        ----------
+        path : str
+            The log file, created if it does not exist
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the file exists and is not a session log
+        '''
+        self._path = str(path)
+        self._file = open(self._path, 'ab+')
+        try:
+            self._file.seek(0)
+            magic = self._file.read(len(MAGIC))
+            if magic != MAGIC[:len(magic)]:
+                raise ValueError(f"{self._path} is not a session log")
+            if magic == MAGIC:
+                # a record cut short by an earlier recording that was killed is
+                # dropped, or the new session would be appended behind it
+                self._file.truncate(_records_end(self._file))
+            else:
+                self._file.truncate(0)
+                self._file.write(MAGIC)
+            self._file.write(_record(_SESSION_RECORD, _SESSION.pack(time.time_ns())))
+        except Exception:
+            self._file.close()
+            raise
+
+        self._start_ns = time.monotonic_ns()
+        self._names = {}
+        self._error = None
+        self._closed = False
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self.__write_loop, name="g2vpico-recorder", daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return f"Recorder writing to {self._path}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    @property
+    def path(self):
+        '''
+        The path of the log file
+        '''
+        return self._path
+
+    def record_commands(self, pico_id, requests, payload):
+        '''
+        Record commands that are about to be sent, they share one timestamp
+
+        Parameters
+        ----------
+        pico_id : str
+            The ID of the Pico
+
+        requests : list
+            The protocol.Request of every command
+
+        payload : bytes
+            The encoded commands as they are written to the Pico
+        '''
+        self._queue.put((_COMMANDS_RECORD, time.monotonic_ns(), pico_id, requests, payload))
+
+    def record_responses(self, pico_id, requests, responses):
+        '''
+        Record the responses received for commands, they share one timestamp
+
+        Parameters
+        ----------
+        pico_id : str
+            The ID of the Pico
+
+        requests : list
+            The protocol.Request of every command
+
+        responses : list
+            The decoded response to each request, None when none was received
+        '''
+        self._queue.put((_RESPONSES_RECORD, time.monotonic_ns(), pico_id, requests, responses))
+
+    def flush(self):
+        '''
+        Wait until everything recorded so far has been written to the file
+
+        Exceptions
+        ----------
+        Exception
+            The error the writer thread failed with, such as an OSError when
+            the log could not be written
+        '''
+        if not self._closed:
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait()
+
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        '''
+        Write everything recorded so far and close the file
+
+        Exceptions
+        ----------
+        Exception
+            The error the writer thread failed with, such as an OSError when
+            the log could not be written
+        '''
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+
+        if self._error is not None:
+            raise self._error
+
+    ### Private Internal Methods
+
+    def __write_loop(self):
+        '''Internal method run by the writer thread'''
+        while True:
+            items = [self._queue.get()]
+            if items[0] is not None:
+                time.sleep(_WRITE_INTERVAL)
+            try:
+                while True:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            chunks = []
+            stop = False
+            for item in items:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    self.__write(chunks)
+                    chunks = []
+                    item.set()
+                elif self._error is None:
+                    try:
+                        self.__encode(item, chunks)
+                    except Exception as exc:
+                        # keep serving flush() and close(), which raise the error
+                        self._error = exc
+
+            self.__write(chunks)
+            if stop:
+                return
+
+    def __write(self, chunks):
+        '''Internal method for writing encoded records, later records are dropped after a failure'''
+        if self._error is not None:
+            return
+        try:
+            if chunks:
+                self._file.write(b''.join(chunks))
+            self._file.flush()
+        except Exception as exc:
+            self._error = exc
+
+    def __encode(self, item, chunks):
+        '''Internal method for encoding the record of a queued item'''
+        record_type, timestamp_ns, pico_id, requests, data = item
+        if record_type == _COMMANDS_RECORD:
+            payload = data
+        else:
+            # responses are only missing when the commands could not be sent
+            payload = b''.join(_MISSING if response is None else json.dumps(response).encode('utf-8')
+                               for response in data)
+
+        refs = [self.__intern(request.name, chunks) for request in requests]
+        header = _MESSAGES.pack(max(timestamp_ns - self._start_ns, 0), self.__intern(pico_id, chunks), len(refs))
+        chunks.append(_record(record_type, header + struct.pack(f'<{len(refs)}H', *refs) + payload))
+
+    def __intern(self, name, chunks):
+        '''Internal method for the number of a name, its definition is written on first use'''
+        ref = self._names.get(name, None)
+        if ref is None:
+            ref = self._names[name] = len(self._names)
+            chunks.append(_record(_NAME_RECORD, _NAME.pack(ref) + str(name).encode('utf-8')))
+        return ref
+
+
+def _record(record_type, body):
+    '''The bytes of a record with its header'''
+    return _HEADER.pack(len(body), record_type) + body
+
+
+def _records_end(infile):
+    '''The offset behind the last complete record of a log, read from behind the magic bytes'''
+    end = infile.tell()
+    size = infile.seek(0, 2)
+    while end + _HEADER.size <= size:
+        infile.seek(end)
+        length, _ = _HEADER.unpack(infile.read(_HEADER.size))
+        if end + _HEADER.size + length > size:
+            break
+        end += _HEADER.size + length
+    return end
+
+
+def read_log(path):
+    '''
+    A generator yielding the commands and responses in a session log
+
+    A record that was cut short at the end of the file, for example when the
+    recording process was killed, ends the log.
+
+    Parameters
+    ----------
+    path : str
+        The log file
+
+    Returns
+    -------
+    generator
+        A LogRecord for every command and response in the order they were recorded
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when the file is not a session log
+    '''
+    with open(path, 'rb') as infile:
+        if infile.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a session log")
+
+        session = -1
+        names = {}
+        decoder = MessageDecoder()
+        while True:
+            header = infile.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            length, record_type = _HEADER.unpack(header)
+            body = infile.read(length)
+            if len(body) < length:
+                return
+
+            if record_type == _SESSION_RECORD:
+                session += 1
+                names = {}
+            elif record_type == _NAME_RECORD:
+                names[_NAME.unpack_from(body)[0]] = body[_NAME.size:].decode('utf-8')
+            elif record_type in _KINDS:
+                offset_ns, pico_ref, count = _MESSAGES.unpack_from(body)
+                refs = struct.unpack_from(f'<{count}H', body, _MESSAGES.size)
+                decoder.feed(body[_MESSAGES.size + 2 * count:])
+                for ref in refs:
+                    message = decoder.pop()
+                    if message == []:
+                        message = None
+                    yield LogRecord(session, offset_ns / 1e9, _KINDS[record_type], names[pico_ref],
+                                    names[ref], message)
+
+
+def session_count(path):
+    '''
+    Returns the number of recording sessions in a log
+
+    Parameters
+    ----------
+    path : str
+        The log file
+    '''
+    with open(path, 'rb') as infile:
+        if infile.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a session log")
+
+        count = 0
+        while True:
+            header = infile.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return count
+            length, record_type = _HEADER.unpack(header)
+            if record_type == _SESSION_RECORD:
+                count += 1
+            infile.seek(length, 1)
+
+
+def replay(path, ip_address, port=None, pico_id=None, speed=1.0, session=-1, spin=0.0):
+    '''
+    Send the commands of a recorded session to a Pico again with their original timing
+
+    Commands recorded together, such as the commands of a batch, are sent
+    back-to-back and their responses are read before the next group is sent.
+    Each group is sent at its recorded time after the start of the replay,
+    divided by speed.
+
+    Parameters
+    ----------
+    path : str
+        The log file
+
+    ip_address : str
+        The IP address of the Pico or simulator
+
+    port : int, optional
+        The TCP port of the Pico API, defaults to 50000
+
+    pico_id : str, optional
+        Replaces the Pico ID of every recorded command, needed to replay a
+        session on a different Pico
+
+    speed : float
+        How many times faster than recorded the session is replayed
+
+    session : int
+        The index of the session in the log, negative values count from the end
+
+    spin : float
+        The final part of each wait in seconds that is spent polling the clock
+
+    Returns
+    -------
+    ReplayResult
+        The number of commands sent, the responses that differ from the
+        recording and the lateness of every group
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when speed is not greater than zero or the session does not exist
+    '''
+    if speed <= 0:
+        raise ValueError("Speed must be greater than zero.")
+
+    count = session_count(path)
+    index = session + count if session < 0 else session
+    if not 0 <= index < count:
+        raise ValueError(f"Session {session} is not in {path}, it holds {count} sessions")
+
+    groups = []
+    recorded = collections.deque()
+    for record in read_log(path):
+        if record.session != index:
+            continue
+        if record.kind == 'response':
+            recorded.append(record.message)
+            continue
+
+        command = record.message
+        if pico_id is not None:
+            command = dict(command, pico_id=str(pico_id))
+        if groups and groups[-1][0] == record.time:
+            groups[-1][1].append(command)
+        else:
+            groups.append((record.time, [command]))
+
+    sock = socket.create_connection((ip_address, 50000 if port is None else int(port)))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    decoder = MessageDecoder()
+    scheduler = Scheduler(spin=spin)
+    stats = LatenessStats()
+    commands = 0
+    mismatches = 0
+    try:
+        for offset, group in groups:
+            lateness_ns = scheduler.wait_until(scheduler.deadline(0) + int(round(offset / speed * 1e9)))
+            stats.add(lateness_ns / 1e9)
+
+            sock.sendall(b''.join(json.dumps(command).encode('utf-8') for command in group))
+            commands += len(group)
+            while len(decoder) < len(group):
+                decoder.recv_into(sock)
+
+            for _ in group:
+                response = decoder.pop()
+                if not recorded or recorded.popleft() != response:
+                    mismatches += 1
+    finally:
+        sock.close()
+
+    return ReplayResult(commands, mismatches, stats)
+
+
+def main(argv=None):
+    '''
+    Command line entry point, run with python -m g2vpico.recorder --help
+    '''
+    parser = argparse.ArgumentParser(description="Show or replay a recorded Pico session log")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    dump = subparsers.add_parser('dump', help="Print the commands and responses in a log")
+    dump.add_argument('log', help="The session log")
+
+    play = subparsers.add_parser('replay', help="Send the commands of a session to a Pico again")
+    play.add_argument('log', help="The session log")
+    play.add_argument('ip_address', help="The IP address of the Pico or simulator")
+    play.add_argument('--port', type=int, default=None, help="The TCP port of the Pico API")
+    play.add_argument('--pico-id', default=None, help="Send the commands to this Pico ID instead")
+    play.add_argument('--speed', type=float, default=1.0, help="Replay this many times faster")
+    play.add_argument('--session', type=int, default=-1, help="The session to replay, the last by default")
+    args = parser.parse_args(argv)
+
+    if args.action == 'dump':
+        for record in read_log(args.log):
+            print(f"{record.session:3d} {record.time:12.6f} {record.pico_id} {record.kind:<8} "
+                  f"{json.dumps(record.message)}")
+        return 0
+
+    result = replay(args.log, args.ip_address, port=args.port, pico_id=args.pico_id,
+                    speed=args.speed, session=args.session)
+    print(f"Replayed {result.commands} commands, {result.mismatches} responses differ from the recording")
+    print(f"Lateness: {result.lateness}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
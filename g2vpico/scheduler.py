@@ -0,0 +1,296 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import math
+import time
+
+class LatenessStats():
+    '''
+    Running statistics of how late each scheduled step started, in seconds.
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    def __repr__(self):
+        return (f"{self._count} steps, lateness mean {self.mean * 1000:.3f} ms, "
+                f"stdev {self.stdev * 1000:.3f} ms, max {self._max * 1000:.3f} ms")
+
+    @property
+    def count(self):
+        '''
+        The number of steps recorded
+        '''
+        return self._count
+
+    @property
+    def mean(self):
+        '''
+        The mean lateness
+        '''
+        return self._mean
+
+    @property
+    def stdev(self):
+        '''
+        The standard deviation of the lateness
+        '''
+        if self._count < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self._count - 1))
+
+    @property
+    def max(self):
+        '''
+        The largest lateness
+        '''
+        return self._max
+
+    @property
+    def missed(self):
+        '''
+        The number of steps that started a whole interval or more late
+        '''
+        return self._missed
+
+    def add(self, lateness, missed=False):
+        '''
+        Record the lateness of a step
+
+        Parameters
+        ----------
+        lateness : float
+            How late the step started in seconds
+
+        missed : bool
+            True if the step missed its deadline by a whole interval or more
+        '''
+        self._count += 1
+        delta = lateness - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (lateness - self._mean)
+        self._max = max(self._max, lateness)
+        if missed:
+            self._missed += 1
+
+    def reset(self):
+        '''
+        Forget every recorded step
+        '''
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._max = 0.0
+        self._missed = 0
+
+
+class Scheduler():
+    '''
+    Runs steps at a fixed interval on the monotonic clock.
+
+    Every step is aimed at an absolute deadline of start + step * interval,
+    so time spent sending commands is absorbed by the next sleep and errors
+    do not build up over a long run. The thread sleeps until shortly before
+    each deadline and can optionally spin for the last part of the wait to
+    reach sub-millisecond accuracy.
+
+    Example
+    -------
+    scheduler = Scheduler(0.5)
+    for step in range(10):
+        scheduler.wait()
+        pico.set_global_intensity(step * 10.0)
+    print(scheduler.stats)
+    '''
+
+    def __init__(self, interval=None, spin=0.0):
+        '''
+        Parameters
+        ----------
+        interval : float, optional
+            The time between steps in seconds, only wait_at can be used without it
+
+        spin : float
+            The final part of each wait, in seconds, that is spent polling
+            the clock instead of sleeping. 0 never spins.
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when interval is not greater than zero or spin is negative
+        '''
+        if interval is not None and interval <= 0:
+            raise ValueError("Interval must be greater than zero.")
+        if spin < 0:
+            raise ValueError("Spin must not be negative.")
+
+        self._interval_ns = None if interval is None else int(round(interval * 1e9))
+        self._spin_ns = int(round(spin * 1e9))
+        self._stats = LatenessStats()
+        self.start()
+
+    def __repr__(self):
+        if self._interval_ns is None:
+            return f"Scheduler at step {self._step}"
+        return f"Scheduler every {self.interval} s at step {self._step}"
+
+    @property
+    def interval(self):
+        '''
+        The time between steps in seconds, None if not set
+        '''
+        if self._interval_ns is None:
+            return None
+        return self._interval_ns / 1e9
+
+    @property
+    def step(self):
+        '''
+        The number of steps waited for since the start
+        '''
+        return self._step
+
+    @property
+    def stats(self):
+        '''
+        The LatenessStats of every step since the start
+        '''
+        return self._stats
+
+    def start(self):
+        '''
+        Restart the schedule from the current time and reset the statistics
+        '''
+        self._start_ns = time.monotonic_ns()
+        self._step = 0
+        self._stats.reset()
+
+    def elapsed(self):
+        '''
+        Returns the time since the start in seconds
+        '''
+        return (time.monotonic_ns() - self._start_ns) / 1e9
+
+    def deadline(self, step):
+        '''
+        Returns the monotonic_ns deadline of a step, the start if there is no interval
+
+        Parameters
+        ----------
+        step : int
+            The step number, step 0 is the start
+        '''
+        return self._start_ns + step * (self._interval_ns or 0)
+
+    def wait(self):
+        '''
+        Wait for the deadline of the next step
+
+        Returns
+        -------
+        float
+            How late the step started in seconds
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the scheduler has no interval
+        '''
+        if self._interval_ns is None:
+            raise ValueError("Scheduler has no interval, use wait_at.")
+
+        self._step += 1
+        lateness_ns = self.wait_until(self.deadline(self._step))
+        self._stats.add(lateness_ns / 1e9, lateness_ns >= self._interval_ns)
+        return lateness_ns / 1e9
+
+    def skip_missed(self):
+        '''
+        Skip the steps whose deadlines have already passed, so that after a
+        stall the next wait is for the next deadline in the future instead
+        of a burst of late steps. Skipped steps are not recorded in stats.
+
+        Returns
+        -------
+        int
+            The number of steps skipped
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the scheduler has no interval
+        '''
+        if self._interval_ns is None:
+            raise ValueError("Scheduler has no interval, use wait_at.")
+
+        skipped = (time.monotonic_ns() - self._start_ns) // self._interval_ns - self._step
+        if skipped <= 0:
+            return 0
+        self._step += skipped
+        return skipped
+
+    def wait_at(self, offset):
+        '''
+        Wait for a step at an offset from the start, for schedules without a fixed interval
+
+        Parameters
+        ----------
+        offset : float
+            The time of the step after the start in seconds
+
+        Returns
+        -------
+        float
+            How late the step started in seconds
+        '''
+        self._step += 1
+        lateness_ns = self.wait_until(self._start_ns + int(round(offset * 1e9)))
+        missed = self._interval_ns is not None and lateness_ns >= self._interval_ns
+        self._stats.add(lateness_ns / 1e9, missed)
+        return lateness_ns / 1e9
+
+    def wait_until(self, deadline_ns):
+        '''
+        Wait for an absolute deadline without recording it in the statistics
+
+        Parameters
+        ----------
+        deadline_ns : int
+            The deadline on the time.monotonic_ns clock
+
+        Returns
+        -------
+        int
+            How late the wait ended in nanoseconds
+        '''
+        remaining_ns = deadline_ns - time.monotonic_ns()
+        if remaining_ns > self._spin_ns:
+            time.sleep((remaining_ns - self._spin_ns) / 1e9)
+
+        now_ns = time.monotonic_ns()
+        while now_ns < deadline_ns:
+            now_ns = time.monotonic_ns()
+
+        return now_ns - deadline_ns
@@ -0,0 +1,121 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+class ShadowState():
+    '''
+    A client side copy of the state of a Pico.
+
+    The state is updated from every acknowledged command, so it holds the
+    values the Pico last confirmed. Values that have never been read or
+    written, or whose write was not acknowledged, are unknown.
+    '''
+
+    def __init__(self):
+        self._channel_values = {}
+        self._global_intensity = None
+        self._fixture_on = None
+
+    def __repr__(self):
+        return (f"ShadowState(channels={self._channel_values}, global_intensity={self._global_intensity}, "
+                f"fixture_on={self._fixture_on})")
+
+    @property
+    def global_intensity(self):
+        '''
+        The last known global intensity, None if unknown
+        '''
+        return self._global_intensity
+
+    @property
+    def fixture_on(self):
+        '''
+        The last known on state of the fixture, None if unknown
+        '''
+        return self._fixture_on
+
+    def channel_value(self, channel):
+        '''
+        Returns the last known value of a channel, None if unknown
+
+        Parameters
+        ----------
+        channel : int
+            The channel number
+        '''
+        return self._channel_values.get(channel, None)
+
+    def snapshot(self):
+        '''
+        Returns every known value as a dict keyed by channel number,
+        'global_intensity' and 'fixture_on'
+        '''
+        state = dict(self._channel_values)
+        if self._global_intensity is not None:
+            state['global_intensity'] = self._global_intensity
+        if self._fixture_on is not None:
+            state['fixture_on'] = self._fixture_on
+        return state
+
+    def clear(self):
+        '''
+        Forget every known value
+        '''
+        self._channel_values.clear()
+        self._global_intensity = None
+        self._fixture_on = None
+
+    def update(self, request, result):
+        '''
+        Update the state from a command and the result returned by the Pico
+
+        Parameters
+        ----------
+        request : protocol.Request
+            The command that was sent
+
+        result : object
+            The result of the command, None when no valid response was received
+        '''
+        name = request.name
+        cmd = dict(zip(request.keys, request.values))
+
+        if name == 'set_channel_value':
+            if result:
+                self._channel_values[cmd['channel']] = cmd['value']
+            else:
+                self._channel_values.pop(cmd['channel'], None)
+        elif name == 'get_channel_value':
+            if result is not None:
+                self._channel_values[cmd['channel']] = result
+            else:
+                self._channel_values.pop(cmd['channel'], None)
+        elif name == 'set_global_intensity':
+            self._global_intensity = cmd['global_intensity'] if result else None
+        elif name == 'get_global_intensity':
+            self._global_intensity = result
+        elif name == 'set_fixture_on':
+            self._fixture_on = cmd['fixture_on'] if result else None
+        elif name == 'get_fixture_on':
+            self._fixture_on = result
@@ -0,0 +1,534 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import argparse
+import collections
+import functools
+import json
+import queue
+import random
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+from .protocol import MessageDecoder
+
+DEFAULT_PICO_ID = "00000000c2ca735f"
+
+### Latency distributions, each returns a function of a random.Random giving seconds
+
+def constant(seconds):
+    '''
+    A latency that is always the same
+    '''
+    return lambda rng: seconds
+
+
+def uniform(low, high):
+    '''
+    A latency spread evenly between low and high seconds
+    '''
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median, sigma):
+    '''
+    A latency with a long tail, median seconds and the sigma of its logarithm
+    '''
+    return lambda rng: median * rng.lognormvariate(0.0, sigma)
+
+
+def spikes(base, spike, probability):
+    '''
+    A latency of base seconds that is spike seconds with the given probability
+    '''
+    return lambda rng: spike if rng.random() < probability else base
+
+
+class Faults():
+    '''
+    The network and fixture faults a PicoSimulator injects into each connection.
+
+    Each connection draws from its own random generator seeded with seed, so
+    a scenario with a seed produces the same faults on every run.
+    '''
+
+    def __init__(self, latency=None, segment_size=None, segment_delay=0.0, coalesce=1,
+                 reset_after=None, reset_probability=0.0, read_size=4096, read_delay=0.0, seed=None):
+        '''
+        Parameters
+        ----------
+        latency : float, callable, dict, optional
+            Extra time to answer each command, in seconds or as a distribution
+            such as lognormal(0.002, 0.5). A dict keyed by command name sets the
+            latency of each command, commands that are not in it have none.
+
+        segment_size : int, optional
+            Send each response in pieces of at most this many bytes
+
+        segment_delay : float
+            The time in seconds between the pieces of a response
+
+        coalesce : int
+            Hold responses back and send up to this many in a single write
+
+        reset_after : int, optional
+            Reset the connection instead of answering this command number
+
+        reset_probability : float
+            The chance of resetting the connection instead of answering each command
+
+        read_size : int
+            The most bytes read from the client at once
+
+        read_delay : float
+            The time in seconds the server waits before each read, to act as a slow reader
+        '''
+        if coalesce < 1:
+            raise ValueError("Coalesce must be at least 1.")
+        if segment_size is not None and segment_size < 1:
+            raise ValueError("Segment size must be at least 1.")
+
+        self.latency = latency
+        self.segment_size = segment_size
+        self.segment_delay = segment_delay
+        self.coalesce = coalesce
+        self.reset_after = reset_after
+        self.reset_probability = reset_probability
+        self.read_size = read_size
+        self.read_delay = read_delay
+        self.seed = seed
+
+    def __repr__(self):
+        faults = {key: value for key, value in vars(self).items() if value not in (None, 0, 0.0, 1, 4096)}
+        return f"Faults({faults})"
+
+    def random(self):
+        '''
+        Returns a new random generator for a connection
+        '''
+        return random.Random(self.seed)
+
+    def command_latency(self, name, rng):
+        '''
+        Returns the extra time in seconds to answer a command
+
+        Parameters
+        ----------
+        name : str
+            The command name
+
+        rng : random.Random
+            The random generator of the connection
+        '''
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(name, None)
+
+        if latency is None:
+            return 0.0
+        if callable(latency):
+            return max(latency(rng), 0.0)
+        return latency
+
+    def reset(self, command_number, rng):
+        '''
+        Returns True if the connection should be reset instead of answering a command
+
+        Parameters
+        ----------
+        command_number : int
+            The number of the command on the connection, starting at 1
+
+        rng : random.Random
+            The random generator of the connection
+        '''
+        if self.reset_after is not None and command_number >= self.reset_after:
+            return True
+        return self.reset_probability > 0 and rng.random() < self.reset_probability
+
+
+# Each scenario builds new Faults, so a simulator can change its faults
+# without affecting the other simulators using the same scenario
+SCENARIOS = {
+    'clean': Faults,
+    'lan': functools.partial(Faults, latency=lognormal(0.002, 0.5), seed=1),
+    'jitter': functools.partial(Faults, latency=spikes(0.001, 0.05, 0.02), seed=1),
+    'fragmented': functools.partial(Faults, segment_size=7, segment_delay=0.0005),
+    'coalesced': functools.partial(Faults, coalesce=8),
+    'flaky': functools.partial(Faults, reset_probability=0.01, seed=1),
+    'slow_reader': functools.partial(Faults, read_size=64, read_delay=0.002),
+}
+
+
+class _PicoRequestHandler(socketserver.BaseRequestHandler):
+    '''Internal handler that answers the pipelined commands of one client connection'''
+
+    def handle(self):
+        faults = self.server.faults
+        rng = faults.random()
+        decoder = MessageDecoder()
+
+        # responses are written as soon as each one is ready, without
+        # waiting for the client to acknowledge the previous one
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        # with a round trip time a writer thread delivers each response once
+        # it has crossed the network, while the next commands are answered
+        self._rtt = self.server.rtt
+        self._delayed = None
+        if self._rtt:
+            self._delayed = queue.SimpleQueue()
+            writer = threading.Thread(target=self.__write_delayed, args=(faults,), daemon=True)
+            writer.start()
+        try:
+            self.__serve(faults, rng, decoder)
+        finally:
+            if self._delayed is not None:
+                self._delayed.put(None)
+                writer.join()
+
+    def __serve(self, faults, rng, decoder):
+        '''Internal method answering commands until the connection ends'''
+        command_number = 0
+        while True:
+            if faults.read_delay:
+                time.sleep(faults.read_delay)
+            try:
+                data = self.request.recv(faults.read_size)
+                if not data:
+                    return
+                decoder.feed(data)
+            except OSError:
+                return
+            except ValueError:
+                # the stream can not be framed any more, drop the client like a real Pico would
+                return
+
+            pending = []
+            for cmd in decoder.messages():
+                command_number += 1
+                if faults.reset(command_number, rng):
+                    self.__reset()
+                    return
+
+                response = self.server.reply(cmd)
+                delay = self.server.latency + faults.command_latency(response['cmd'], rng)
+                if delay:
+                    time.sleep(delay)
+
+                pending.append(json.dumps(response).encode('utf-8'))
+                if len(pending) >= faults.coalesce:
+                    self.__deliver(b''.join(pending), faults)
+                    pending.clear()
+
+            if pending:
+                self.__deliver(b''.join(pending), faults)
+
+    def __deliver(self, data, faults):
+        '''Internal method for sending responses now, or after the round trip time'''
+        if self._delayed is None:
+            self.__send(data, faults)
+        else:
+            self._delayed.put((time.monotonic() + self._rtt, data))
+
+    def __write_delayed(self, faults):
+        '''Internal method run by the writer thread, responses are due in the order they were queued'''
+        while True:
+            item = self._delayed.get()
+            if item is None:
+                return
+            due, data = item
+            remaining = due - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            try:
+                self.__send(data, faults)
+            except OSError:
+                return
+
+    def __send(self, data, faults):
+        '''Internal method for writing responses, split into segments when asked to'''
+        if faults.segment_size is None:
+            self.request.sendall(data)
+            return
+
+        for start in range(0, len(data), faults.segment_size):
+            if start and faults.segment_delay:
+                time.sleep(faults.segment_delay)
+            self.request.sendall(data[start:start + faults.segment_size])
+
+    def __reset(self):
+        '''Internal method for dropping the connection with a TCP reset'''
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        self.request.close()
+
+
+class PicoSimulator(socketserver.ThreadingTCPServer):
+    '''
+    A TCP server that answers the Pico API like a G2V Pico.
+
+    The simulator keeps the channel values, global intensity and fixture
+    state in memory and answers every command of the Pico API, including the
+    error responses, so the client can be tested and benchmarked without a
+    fixture. The names of the most recent commands are kept in commands.
+    Commands from every connection are answered one at a time under a lock.
+
+    Example
+    -------
+    with PicoSimulator(channels=16, latency=0.002) as simulator:
+        pico = G2VPico('127.0.0.1', DEFAULT_PICO_ID, port=simulator.port)
+    '''
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, channels=8, pico_id=DEFAULT_PICO_ID, host='127.0.0.1', port=0, latency=0.0, faults=None,
+                 rtt=0.0, max_commands=10000):
+        '''
+        Parameters
+        ----------
+        channels : int, dict
+            int - The number of channels, numbered from 1 with a limit of 4000
+            dict - A dict keyed by channel number of dicts with 'limit' and
+            'range' ([x_low, x_high]) keys
+
+        pico_id : str
+            The 16 character ID the simulator answers to
+
+        host : str
+            The address to listen on
+
+        port : int
+            The TCP port to listen on, 0 picks a free port
+
+        latency : float
+            The service time in seconds the simulator spends on each command.
+            Commands are answered one after another, so a batch of N commands
+            takes N times the latency.
+
+        faults : Faults, str, optional
+            The faults to inject, or the name of one of the SCENARIOS. The
+            faults attribute can be changed at any time and applies to new
+            connections.
+
+        rtt : float
+            The network round trip time in seconds. Each response is delivered
+            rtt seconds after it is ready without holding back the commands
+            behind it, so a pipelined batch costs a single round trip. It
+            applies to new connections.
+
+        max_commands : int, optional
+            The number of command names kept in commands, older names are
+            dropped. 0 records none and None keeps every name.
+        '''
+        super().__init__((host, port), _PicoRequestHandler)
+
+        if isinstance(channels, int):
+            channels = {channel: {'limit': 4000, 'range': [350 + 20 * channel, 370 + 20 * channel]}
+                        for channel in range(1, channels + 1)}
+
+        self.pico_id = pico_id
+        self.latency = latency
+        self.rtt = rtt
+        self.faults = SCENARIOS[faults]() if isinstance(faults, str) else (faults or Faults())
+        self.api_enabled = True
+        self.variable = True
+        self.commands = collections.deque(maxlen=max_commands)
+        self.values = {int(channel): 0 for channel in channels}
+        self.limits = {int(channel): info['limit'] for channel, info in channels.items()}
+        self.ranges = {int(channel): list(info['range']) for channel, info in channels.items()}
+        self.global_intensity = 100.0
+        self.fixture_on = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Pico simulator {self.pico_id} on {self.server_address[0]}:{self.server_address[1]}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+        return False
+
+    @property
+    def port(self):
+        '''
+        The TCP port the simulator listens on
+        '''
+        return self.server_address[1]
+
+    def start(self):
+        '''
+        Serve clients from a background thread
+
+        Returns
+        -------
+        int
+            The TCP port the simulator listens on
+        '''
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name="PicoSimulator", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        '''
+        Stop serving and close the listening socket
+        '''
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def reply(self, cmd):
+        '''
+        Returns the response of the Pico to a single command
+
+        Parameters
+        ----------
+        cmd : dict
+            The decoded command
+        '''
+        with self._lock:
+            return self.__reply(cmd)
+
+    ### Private Internal Methods
+
+    def __reply(self, cmd):
+        '''Internal method for the response to a command, called with the lock held'''
+        name = cmd.get('cmd', None) if isinstance(cmd, dict) else None
+        self.commands.append(name)
+
+        response = {'cmd': name}
+        if name is None or cmd.get('command', None) != 'api':
+            response['error'] = "Command type invalid"
+        elif not self.api_enabled:
+            response['error'] = "Pico API not enabled"
+        elif cmd.get('pico_id', None) != self.pico_id:
+            response['error'] = "Pico ID invalid"
+        else:
+            handler = getattr(self, '_reply_' + name, None)
+            if handler is None:
+                response['error'] = "Command type invalid"
+            else:
+                try:
+                    handler(cmd, response)
+                except (KeyError, TypeError, ValueError):
+                    response['error'] = "Command data invalid"
+
+        return response
+
+    def __channel(self, cmd, response):
+        '''Internal method for the channel of a command, it is echoed in the response'''
+        channel = cmd['channel']
+        response['channel'] = channel
+        if channel not in self.values:
+            raise KeyError(channel)
+        return channel
+
+    def _reply_get_channel_count(self, cmd, response):
+        response['channel_count'] = len(self.values)
+
+    def _reply_get_channel_list(self, cmd, response):
+        response['channel_list'] = [str(channel) for channel in self.values]
+
+    def _reply_get_channel_value(self, cmd, response):
+        response['value'] = self.values[self.__channel(cmd, response)]
+
+    def _reply_set_channel_value(self, cmd, response):
+        channel = self.__channel(cmd, response)
+        value = cmd['value']
+        if not self.variable:
+            response['error'] = "Pico is not Variable"
+        elif not isinstance(value, int) or value < 0 or value > self.limits[channel]:
+            response['error'] = "Value out of range"
+        else:
+            self.values[channel] = value
+            response['result'] = True
+
+    def _reply_get_channel_limit(self, cmd, response):
+        response['limit'] = self.limits[self.__channel(cmd, response)]
+
+    def _reply_get_channel_range(self, cmd, response):
+        x_low, x_high = self.ranges[self.__channel(cmd, response)]
+        response['x_low'] = x_low
+        response['x_high'] = x_high
+
+    def _reply_get_global_intensity(self, cmd, response):
+        response['global_intensity'] = self.global_intensity
+
+    def _reply_set_global_intensity(self, cmd, response):
+        value = float(cmd['global_intensity'])
+        if value < 0.0 or value > 100.0:
+            response['error'] = "Value out of range"
+        else:
+            self.global_intensity = value
+            response['result'] = True
+
+    def _reply_get_fixture_on(self, cmd, response):
+        response['fixture_on'] = self.fixture_on
+
+    def _reply_set_fixture_on(self, cmd, response):
+        self.fixture_on = bool(cmd['fixture_on'])
+        response['result'] = True
+
+
+def main(argv=None):
+    '''
+    Command line entry point, run with python -m g2vpico.simulator --help
+    '''
+    parser = argparse.ArgumentParser(description="Run a simulated Pico API server")
+    parser.add_argument('--host', default='127.0.0.1', help="The address to listen on")
+    parser.add_argument('--port', type=int, default=50000, help="The TCP port to listen on")
+    parser.add_argument('--pico-id', default=DEFAULT_PICO_ID, help="The 16 character ID of the simulated Pico")
+    parser.add_argument('--channels', type=int, default=8, help="The number of channels")
+    parser.add_argument('--latency', type=float, default=0.0, help="The service time in seconds of each command")
+    parser.add_argument('--rtt', type=float, default=0.0, help="The network round trip time in seconds")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='clean', help="The faults to inject")
+    args = parser.parse_args(argv)
+
+    simulator = PicoSimulator(channels=args.channels, pico_id=args.pico_id, host=args.host,
+                              port=args.port, latency=args.latency, faults=args.scenario,
+                              rtt=args.rtt)
+    print(f"{simulator} running, press Ctrl+C to stop", file=sys.stderr)
+    try:
+        simulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import datetime as dt
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .waveform import Timeline, build_timeline
+
+# Bumped when a change to the model changes the profiles stored in a cache
+MODEL_VERSION = 1
+
+_DAY = 86400.0
+
+def solar_elevation(times, latitude, longitude):
+    '''
+    The elevation of the sun above the horizon, from the NOAA general solar
+    position equations
+
+    Parameters
+    ----------
+    times : array_like
+        The times in seconds since the epoch, UTC
+
+    latitude : float
+        The latitude in degrees, positive north
+
+    longitude : float
+        The longitude in degrees, positive east
+
+    Returns
+    -------
+    numpy.ndarray
+        The elevation in degrees, negative when the sun is below the horizon
+    '''
+    times = np.asarray(times, dtype=np.float64)
+
+    # fractional year in radians, the day of the year counts from the start of each UTC year
+    days = times / _DAY
+    years = np.floor(days).astype('datetime64[D]').astype('datetime64[Y]')
+    year_start = years.astype('datetime64[D]').astype(np.float64)
+    year_length = (years + 1).astype('datetime64[D]').astype(np.float64) - year_start
+    gamma = (2 * np.pi) * (days - year_start - 0.5) / year_length
+
+    # the harmonics come from multiple angle identities, trigonometric functions dominate the cost
+    cos1, sin1 = np.cos(gamma), np.sin(gamma)
+    cos2, sin2 = 2 * cos1 * cos1 - 1, 2 * sin1 * cos1
+    cos3, sin3 = cos1 * (2 * cos2 - 1), sin1 * (2 * cos2 + 1)
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * cos1 - 0.032077 * sin1
+                                 - 0.014615 * cos2 - 0.040849 * sin2)
+    declination = (0.006918 - 0.399912 * cos1 + 0.070257 * sin1 - 0.006758 * cos2 + 0.000907 * sin2
+                   - 0.002697 * cos3 + 0.00148 * sin3)
+
+    # true solar time in minutes, then the hour angle
+    solar_minutes = (times % _DAY) / 60 + equation_of_time + 4 * longitude
+    hour_angle = np.radians(solar_minutes / 4 - 180)
+
+    latitude = np.radians(latitude)
+    cos_zenith = (np.sin(latitude) * np.sin(declination)
+                  + np.cos(latitude) * np.cos(declination) * np.cos(hour_angle))
+    return np.degrees(np.arcsin(np.clip(cos_zenith, -1.0, 1.0)))
+
+
+def clear_sky_irradiance(elevation):
+    '''
+    The global horizontal irradiance of a clear sky, from the Haurwitz model
+
+    Parameters
+    ----------
+    elevation : array_like
+        The elevation of the sun in degrees
+
+    Returns
+    -------
+    numpy.ndarray
+        The irradiance in W/m2, 0 when the sun is below the horizon
+    '''
+    cos_zenith = np.sin(np.radians(np.asarray(elevation, dtype=np.float64)))
+    irradiance = np.zeros_like(cos_zenith)
+    day = cos_zenith > 0
+    irradiance[day] = 1098.0 * cos_zenith[day] * np.exp(-0.057 / cos_zenith[day])
+    return irradiance
+
+
+def solar_timeline(latitude, longitude, start, end, interval=60.0, compression=1.0,
+                   full_sun=1000.0, peak=100.0, resolution=0.1, cache_dir=None):
+    '''
+    The clear-sky solar day as a Timeline of global intensity setpoints
+
+    The irradiance is sampled every interval seconds from start to end and
+    mapped linearly onto the global intensity, so full_sun is played as
+    peak. Irradiance above full_sun is held at peak. The Timeline can be
+    played with a WaveformPlayer. A year of per-minute samples is computed
+    in a fraction of a second and most of it is dropped as unchanged,
+    because nights collapse into a single step.
+
+    Parameters
+    ----------
+    latitude : float
+        The latitude in degrees, positive north
+
+    longitude : float
+        The longitude in degrees, positive east
+
+    start : datetime, date, str, float
+        The first sample, a date or datetime, an ISO 8601 string or seconds
+        since the epoch. UTC when it has no time zone.
+
+    end : datetime, date, str, float
+        The end of the profile, in the same formats as start
+
+    interval : float
+        The time between samples in seconds of the solar day
+
+    compression : float
+        Solar seconds played per second, 1440 plays a day in a minute
+
+    full_sun : float
+        The irradiance in W/m2 played as peak
+
+    peak : float
+        The global intensity of full_sun
+
+    resolution : float
+        The global intensity is rounded to a multiple of this value
+
+    cache_dir : str, optional
+        A directory where computed timelines are stored by their parameters
+        and read again instead of computed
+
+    Returns
+    -------
+    Timeline
+        Setpoints with times in seconds from the start, divided by compression
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when end is not after start, or interval, compression or full_sun
+        is not greater than zero
+    '''
+    start = _seconds(start)
+    end = _seconds(end)
+    if end <= start:
+        raise ValueError("End must be after start.")
+    if interval <= 0 or compression <= 0 or full_sun <= 0:
+        raise ValueError("Interval, compression and full_sun must be greater than zero.")
+
+    parameters = {
+        'version': MODEL_VERSION,
+        'latitude': float(latitude),
+        'longitude': float(longitude),
+        'start': start,
+        'end': end,
+        'interval': float(interval),
+        'compression': float(compression),
+        'full_sun': float(full_sun),
+        'peak': float(peak),
+        'resolution': float(resolution),
+    }
+
+    path = None
+    if cache_dir is not None:
+        key = hashlib.sha256(json.dumps(parameters, sort_keys=True).encode('utf-8')).hexdigest()[:24]
+        path = os.path.join(cache_dir, f"solar-{key}.npz")
+        timeline = _load_timeline(path)
+        if timeline is not None:
+            return timeline
+
+    offsets = np.arange(0.0, end - start, interval)
+    irradiance = clear_sky_irradiance(solar_elevation(start + offsets, latitude, longitude))
+    intensity = np.minimum(irradiance / full_sun, 1.0) * peak
+    timeline = build_timeline(offsets / compression, intensity, (end - start) / compression, resolution)
+
+    if path is not None:
+        _store_timeline(path, timeline)
+    return timeline
+
+
+def _seconds(value):
+    '''Internal function for the seconds since the epoch of a date, datetime, ISO 8601 string or number'''
+    if isinstance(value, str):
+        value = dt.datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if isinstance(value, dt.date) and not isinstance(value, dt.datetime):
+        value = dt.datetime(value.year, value.month, value.day)
+    if isinstance(value, dt.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=dt.timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def _load_timeline(path):
+    '''Internal function for a cached Timeline, None when it is missing or unreadable'''
+    try:
+        with np.load(path) as data:
+            return Timeline(data['times'], data['values'], float(data['duration']))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _store_timeline(path, timeline):
+    '''Internal function writing a Timeline to the cache, replacing the file only once it is complete'''
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as outfile:
+            np.savez(outfile, times=timeline.times, values=timeline.values, duration=timeline.duration)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
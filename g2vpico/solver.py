@@ -0,0 +1,358 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import functools
+import hashlib
+import json
+
+import numpy as np
+
+from .spectrum import Spectrum
+
+def load_profiles(path):
+    '''
+    Load per-channel emission profiles from a JSON file
+
+    The file holds a wavelength grid and the relative emission of each
+    channel at full output sampled on that grid:
+
+        {"wavelengths": [350, 355, ...], "profiles": {"1": [0.0, 0.1, ...], ...}}
+
+    Parameters
+    ----------
+    path : str
+        The profile file
+
+    Returns
+    -------
+    tuple
+        The wavelength grid as an array and a dict of profile arrays keyed by channel number
+
+    Exceptions
+    ----------
+    ValueError
+        Raised when the file is not a valid profile file
+    '''
+    try:
+        with open(path, 'r') as infile:
+            data = json.load(infile)
+        wavelengths = np.asarray(data['wavelengths'], dtype=np.float64)
+        profiles = {int(channel): np.asarray(profile, dtype=np.float64)
+                    for channel, profile in data['profiles'].items()}
+    except (KeyError, TypeError, AttributeError, ValueError) as exc:
+        raise ValueError(f"Emission profile file {path} is invalid") from exc
+
+    for channel, profile in profiles.items():
+        if profile.shape != wavelengths.shape:
+            raise ValueError(f"Emission profile of channel {channel} does not match the wavelength grid")
+
+    return wavelengths, profiles
+
+
+@functools.lru_cache(maxsize=32)
+def _design_matrix(wavelengths, wavelength_ranges):
+    '''Internal function for the box profile design matrix, cached because the inputs rarely change'''
+    grid = np.asarray(wavelengths, dtype=np.float64)[:, np.newaxis]
+    ranges = np.asarray(wavelength_ranges, dtype=np.float64)
+
+    matrix = ((grid >= ranges[:, 0]) & (grid <= ranges[:, 1])).astype(np.float64)
+    matrix.setflags(write=False)
+    return matrix
+
+
+def design_matrix(wavelengths, wavelength_ranges, profiles=None, channel_list=None):
+    '''
+    Build the matrix that maps the output of each channel onto a wavelength grid
+
+    Column j holds the emission of channel j at full output. Without profiles
+    each channel emits evenly over its wavelength range.
+
+    Parameters
+    ----------
+    wavelengths : array_like
+        The wavelength grid in nm
+
+    wavelength_ranges : list
+        The [x_low, x_high] range of each channel
+
+    profiles : tuple, optional
+        A (wavelengths, {channel: profile}) pair as returned by load_profiles,
+        channels with a profile use it in place of their wavelength range
+
+    channel_list : list, optional
+        The channel number of each column, required with profiles
+
+    Returns
+    -------
+    numpy.ndarray
+        A (wavelengths, channels) read-only array
+    '''
+    wavelengths = tuple(float(wavelength) for wavelength in np.ravel(wavelengths))
+    wavelength_ranges = tuple((float(low), float(high)) for low, high in wavelength_ranges)
+    matrix = _design_matrix(wavelengths, wavelength_ranges)
+
+    if profiles is None:
+        return matrix
+
+    profile_grid, channel_profiles = profiles
+    matrix = matrix.copy()
+    for column, channel in enumerate(channel_list):
+        if channel in channel_profiles:
+            matrix[:, column] = np.interp(wavelengths, profile_grid, channel_profiles[channel], left=0.0, right=0.0)
+
+    matrix.setflags(write=False)
+    return matrix
+
+
+class SpectrumSolver():
+    '''
+    Fits the channel values of a Pico to a target irradiance curve.
+
+    The fit is a least-squares match of the modelled output to the target,
+    with every channel bounded to [0, channel_limit]. It is solved with an
+    accelerated projected gradient method on the precomputed normal
+    equations, so each fit only costs a few small matrix products.
+
+    Example
+    -------
+    solver = SpectrumSolver.from_pico(pico, wavelengths)
+    pico.set_spectrum_array(solver.fit(target))
+    '''
+
+    def __init__(self, channel_list, wavelength_ranges, channel_limits, wavelengths, profiles=None,
+                 max_iterations=500, tolerance=1e-6):
+        '''
+        Parameters
+        ----------
+        channel_list : list
+            The channel numbers of the Pico
+
+        wavelength_ranges : list
+            The [x_low, x_high] range of each channel in the order of channel_list
+
+        channel_limits : list
+            The limit of each channel in the order of channel_list
+
+        wavelengths : array_like
+            The wavelength grid the targets are sampled on
+
+        profiles : str, tuple, optional
+            An emission profile file, or a pair returned by load_profiles
+
+        max_iterations : int
+            The maximum number of solver iterations for a fit
+
+        tolerance : float
+            The fit stops once no channel moves by more than this fraction of its limit
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel metadata lists do not have the same length
+        '''
+        if not len(channel_list) == len(wavelength_ranges) == len(channel_limits):
+            raise ValueError("Channel list, wavelength ranges and channel limits must have the same length")
+
+        if isinstance(profiles, str):
+            profiles = load_profiles(profiles)
+
+        self._channel_list = [int(channel) for channel in channel_list]
+        self._limits = np.asarray(channel_limits, dtype=np.float64)
+        self._wavelengths = np.asarray(wavelengths, dtype=np.float64).ravel()
+        self._max_iterations = max_iterations
+        self._tolerance = tolerance
+
+        # The fit is solved for the fraction of full output of each channel,
+        # which keeps every bound at [0, 1] and the problem well scaled
+        self._matrix = design_matrix(self._wavelengths, wavelength_ranges, profiles, self._channel_list)
+        self._gram = self._matrix.T @ self._matrix
+
+        largest = np.linalg.eigvalsh(self._gram)[-1] if self._gram.size else 0.0
+        self._step = 1.0 / largest if largest > 0 else 0.0
+
+    @classmethod
+    def from_pico(cls, pico, wavelengths, profiles=None, **kwargs):
+        '''
+        Create a solver from the channel metadata of a Pico
+
+        The channel limits and wavelength ranges are read in a single batch.
+
+        Parameters
+        ----------
+        pico : G2VPico
+            A connected Pico
+
+        wavelengths : array_like
+            The wavelength grid the targets are sampled on
+
+        profiles : str, tuple, optional
+            An emission profile file, or a pair returned by load_profiles
+
+        kwargs
+            Passed to SpectrumSolver
+        '''
+        channel_list = pico.channel_list
+
+        batch = pico.batch()
+        for channel in channel_list:
+            batch.get_channel_limit(channel)
+            batch.get_channel_wavelength_range(channel)
+        results = batch.send()
+
+        return cls(channel_list, results[1::2], results[0::2], wavelengths, profiles, **kwargs)
+
+    def __repr__(self):
+        return f"Spectrum solver for {len(self._channel_list)} channels over {self._wavelengths.size} wavelengths"
+
+    @property
+    def channel_list(self):
+        '''
+        The channel numbers in the order of the fitted values
+        '''
+        return list(self._channel_list)
+
+    @property
+    def wavelengths(self):
+        '''
+        The wavelength grid the targets are sampled on
+        '''
+        return self._wavelengths
+
+    @property
+    def matrix(self):
+        '''
+        The (wavelengths, channels) design matrix, column j is channel j at full output
+        '''
+        return self._matrix
+
+    def digest(self):
+        '''
+        Returns a SHA-256 hex digest of everything that decides the fitted values
+
+        It covers the channel list, channel limits, wavelengths, the design
+        matrix built from the wavelength ranges and profiles, and the
+        iteration settings, so two solvers with the same digest fit the same
+        target to the same values.
+        '''
+        digest = hashlib.sha256()
+        settings = [self._channel_list, self._max_iterations, self._tolerance, self._matrix.shape]
+        digest.update(json.dumps(settings).encode('utf-8'))
+        for array in (self._limits, self._wavelengths, self._matrix):
+            digest.update(np.ascontiguousarray(array, dtype='<f8').tobytes())
+        return digest.hexdigest()
+
+    def fit(self, target):
+        '''
+        Fit the channel values to a single target curve
+
+        Parameters
+        ----------
+        target : array_like
+            The target irradiance sampled on the wavelength grid, in units of
+            a single channel at full output
+
+        Returns
+        -------
+        Spectrum
+            The channel values, ready for G2VPico.set_spectrum_array or
+            G2VPico.set_spectrum through Spectrum.to_list()
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the target does not match the wavelength grid
+        '''
+        target = np.asarray(target, dtype=np.float64)
+        if target.shape != self._wavelengths.shape:
+            raise ValueError(f"Target must hold {self._wavelengths.size} values")
+
+        return Spectrum(self._channel_list, self.fit_many(target[np.newaxis, :])[0])
+
+    def fit_many(self, targets):
+        '''
+        Fit the channel values to many target curves at once
+
+        Parameters
+        ----------
+        targets : array_like
+            An (N, wavelengths) array of target curves
+
+        Returns
+        -------
+        numpy.ndarray
+            An (N, channels) uint16 array of channel values in the order of channel_list
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the targets do not match the wavelength grid
+        '''
+        targets = np.asarray(targets, dtype=np.float64)
+        if targets.ndim != 2 or targets.shape[1] != self._wavelengths.size:
+            raise ValueError(f"Targets must be an (N, {self._wavelengths.size}) array")
+
+        fractions = self.__solve(targets @ self._matrix)
+        return np.rint(fractions * self._limits).astype(np.uint16)
+
+    def predict(self, values):
+        '''
+        Returns the modelled irradiance of channel values on the wavelength grid
+
+        Parameters
+        ----------
+        values : array_like, Spectrum
+            Channel values in the order of channel_list, or an (N, channels) array
+        '''
+        if isinstance(values, Spectrum):
+            values = values.aligned(self._channel_list)
+
+        fractions = np.divide(np.asarray(values, dtype=np.float64), self._limits,
+                              out=np.zeros(np.shape(values)), where=self._limits > 0)
+        return fractions @ self._matrix.T
+
+    ### Private Internal Methods
+
+    def __solve(self, projections):
+        '''Internal method for the bounded least-squares fit of every row in projections'''
+        upper = (self._limits > 0).astype(np.float64)
+        solution = np.zeros_like(projections)
+        if self._step == 0.0:
+            return solution
+
+        momentum = solution
+        scale = 1.0
+        for _ in range(self._max_iterations):
+            gradient = momentum @ self._gram - projections
+            previous = solution
+            solution = np.clip(momentum - self._step * gradient, 0.0, upper)
+
+            next_scale = (1.0 + np.sqrt(1.0 + 4.0 * scale * scale)) / 2.0
+            momentum = solution + ((scale - 1.0) / next_scale) * (solution - previous)
+            scale = next_scale
+
+            if np.max(np.abs(solution - previous), initial=0.0) <= self._tolerance:
+                break
+
+        return solution
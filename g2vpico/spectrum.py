@@ -0,0 +1,201 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import json
+
+import numpy as np
+
+from . import protocol
+
+def clip_values(values, limits):
+    '''
+    Round channel values to integers and clip them to [0, limit] in one step
+
+    Parameters
+    ----------
+    values : array_like
+        The channel values
+
+    limits : array_like
+        The limit of each channel, None or NaN for channels without a known
+        limit, which are clipped to the uint16 maximum of 65535
+
+    Returns
+    -------
+    numpy.ndarray
+        The clipped values as uint16
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    limits = np.array([np.nan if limit is None else limit for limit in limits], dtype=np.float64)
+
+    clipped = np.fmin(np.fmin(np.fmax(np.rint(values), 0.0), limits), 65535.0)
+    return np.nan_to_num(clipped, nan=0.0).astype(np.uint16)
+
+
+class Spectrum():
+    '''
+    A spectrum held as an array of channel numbers and an array of channel values.
+
+    Both arrays are read-only so a Spectrum can be shared and reused in recipe
+    loops without copying. Values are stored as uint16.
+    '''
+    __slots__ = ('_channels', '_values')
+
+    def __init__(self, channels, values):
+        '''
+        Parameters
+        ----------
+        channels : array_like
+            The channel numbers
+
+        values : array_like
+            The value of each channel in the range [0, 65535]
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when channels and values do not have the same length or
+            a value is out of range
+        '''
+        channels = np.array(channels, dtype=np.int32).ravel()
+        values = np.array(values).ravel()
+
+        if channels.shape != values.shape:
+            raise ValueError(f"Spectrum has {channels.size} channels but {values.size} values")
+
+        if values.dtype != np.uint16:
+            if values.size and (not np.all(np.isfinite(values)) or values.min() < 0 or values.max() > 65535):
+                raise ValueError("Spectrum values must be in the range [0, 65535]")
+            values = np.rint(values).astype(np.uint16)
+
+        channels.setflags(write=False)
+        values.setflags(write=False)
+        self._channels = channels
+        self._values = values
+
+    @classmethod
+    def from_list(cls, channel_list):
+        '''
+        Create a Spectrum from the list or JSON format used by G2VPico.set_spectrum
+
+        Parameters
+        ----------
+        channel_list : str, list
+            str - A JSON formatted string contain channels and their corresponding values
+            list - A list of dict objects containing 'channel' and 'value' keys
+        '''
+        items = protocol.spectrum_items(channel_list)
+
+        try:
+            channels = [int(channel) for channel, _ in items]
+        except Exception as exc:
+            raise ValueError("Spectrum data holds an invalid channel") from exc
+
+        values = [protocol.check_value(value) for _, value in items]
+        return cls(channels, values)
+
+    def __repr__(self):
+        return f"Spectrum({dict(zip(self._channels.tolist(), self._values.tolist()))})"
+
+    def __len__(self):
+        return self._values.size
+
+    def __iter__(self):
+        return zip(self._channels.tolist(), self._values.tolist())
+
+    def __eq__(self, other):
+        if not isinstance(other, Spectrum):
+            return NotImplemented
+        return np.array_equal(self._channels, other._channels) and np.array_equal(self._values, other._values)
+
+    @property
+    def channels(self):
+        '''
+        The channel numbers as a read-only int32 array
+        '''
+        return self._channels
+
+    @property
+    def values(self):
+        '''
+        The channel values as a read-only uint16 array
+        '''
+        return self._values
+
+    def aligned(self, channel_list):
+        '''
+        Returns the values ordered by channel_list
+
+        Parameters
+        ----------
+        channel_list : list
+            The channel numbers of a Pico
+
+        Returns
+        -------
+        numpy.ndarray
+            The value of every channel in channel_list, channels missing from
+            the spectrum are 0
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the spectrum holds a channel that is not in channel_list
+        '''
+        channel_list = np.asarray(channel_list, dtype=np.int32)
+        order = np.argsort(channel_list)
+        positions = np.searchsorted(channel_list, self._channels, sorter=order)
+        positions = np.minimum(positions, channel_list.size - 1)
+        index = order[positions]
+
+        if not np.all(channel_list[index] == self._channels):
+            raise ValueError("Spectrum holds channels that are not available in the Pico")
+
+        aligned = np.zeros(channel_list.size, dtype=np.uint16)
+        aligned[index] = self._values
+        return aligned
+
+    def clip(self, limits):
+        '''
+        Returns a new Spectrum with every value clipped to its channel limit
+
+        Parameters
+        ----------
+        limits : array_like
+            The limit of each channel in the order of the spectrum channels
+        '''
+        return Spectrum(self._channels, clip_values(self._values, limits))
+
+    def to_list(self):
+        '''
+        Returns the spectrum in the list format of G2VPico.get_spectrum
+        '''
+        return [{'channel': str(channel), 'value': value} for channel, value in self]
+
+    def to_json(self):
+        '''
+        Returns the spectrum as a JSON formatted string accepted by G2VPico.set_spectrum
+        '''
+        return json.dumps(self.to_list())
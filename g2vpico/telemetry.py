@@ -0,0 +1,340 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import collections
+import threading
+import time
+
+import numpy as np
+
+from .scheduler import Scheduler
+
+TelemetrySample = collections.namedtuple('TelemetrySample', ['index', 'time', 'values', 'intensity', 'fixture_on'])
+TelemetrySample.__doc__ = '''
+One sample of a Pico.
+
+index is the number of the sample since the poller started, time is the
+wall clock time in seconds since the epoch and values is a read-only view of
+the channel values in the ring buffer, valid until the buffer wraps around.
+'''
+
+class TelemetryPoller():
+    '''
+    Samples the channel values, global intensity and fixture state of a Pico
+    at a fixed rate on its own thread.
+
+    Every sample is read with a single batch and written into preallocated
+    ring buffers of the last capacity samples, so memory stays constant no
+    matter how long the poller runs. The buffers are exposed as read-only
+    views without copying, and new samples can be consumed with the
+    samples() generator. While the poller runs it owns the Pico, a G2VPico
+    must not be used by other threads at the same time.
+
+    Example
+    -------
+    with TelemetryPoller(pico, interval=1.0, capacity=7 * 86400) as poller:
+        for sample in poller.samples():
+            print(sample.time, sample.intensity, sample.values.max())
+    '''
+
+    def __init__(self, pico, interval=1.0, capacity=3600, spin=0.0):
+        '''
+        Parameters
+        ----------
+        pico : G2VPico, ThreadSafeG2VPico
+            The Pico to sample
+
+        interval : float
+            The time between samples in seconds
+
+        capacity : int
+            The number of samples kept
+
+        spin : float
+            Passed to the Scheduler, the final part of each wait spent polling the clock
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when interval or capacity is not greater than zero
+        '''
+        if capacity <= 0:
+            raise ValueError("Capacity must be greater than zero.")
+
+        self._pico = pico
+        self._channel_list = list(pico.channel_list)
+        self._scheduler = Scheduler(interval, spin=spin)
+        self._spin = spin
+        self._capacity = int(capacity)
+
+        self._times = np.zeros(self._capacity, dtype=np.float64)
+        self._values = np.zeros((self._capacity, len(self._channel_list)), dtype=np.uint16)
+        self._intensity = np.zeros(self._capacity, dtype=np.float64)
+        self._fixture_on = np.zeros(self._capacity, dtype=bool)
+
+        self._count = 0
+        self._errors = 0
+        self._skipped = 0
+        self._last_error = None
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return f"Telemetry of {self._pico} every {self._scheduler.interval} s, {len(self)} samples"
+
+    def __len__(self):
+        return min(self._count, self._capacity)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+        return False
+
+    @property
+    def channel_list(self):
+        '''
+        The channels in the order of the columns of the values buffer
+        '''
+        return self._channel_list
+
+    @property
+    def capacity(self):
+        '''
+        The number of samples kept
+        '''
+        return self._capacity
+
+    @property
+    def count(self):
+        '''
+        The number of samples taken since the poller was created
+        '''
+        return self._count
+
+    @property
+    def errors(self):
+        '''
+        The number of samples that failed
+        '''
+        return self._errors
+
+    @property
+    def last_error(self):
+        '''
+        The exception of the last failed sample, None if none failed
+        '''
+        return self._last_error
+
+    @property
+    def skipped(self):
+        '''
+        The number of polls the polling thread skipped because their time had passed during a stall
+        '''
+        return self._skipped
+
+    @property
+    def running(self):
+        '''
+        True while the polling thread runs
+        '''
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def lateness(self):
+        '''
+        The LatenessStats of the samples taken by the polling thread
+        '''
+        return self._scheduler.stats
+
+    def start(self):
+        '''
+        Start sampling on a background thread
+        '''
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.__run, name=f"g2vpico-telemetry-{self._pico.id}",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''
+        Stop the background thread after the sample in progress
+        '''
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def sample(self):
+        '''
+        Read the Pico once and store the sample, used by the polling thread
+        and available for polling from your own loop
+
+        Returns
+        -------
+        bool
+            True if the sample was stored, False if reading the Pico failed
+        '''
+        batch = self._pico.batch()
+        for channel in self._channel_list:
+            batch.get_channel_value(channel)
+        batch.get_global_intensity()
+        batch.is_fixture_on()
+
+        try:
+            results = batch.send()
+            if any(result is None for result in results):
+                raise RuntimeError("Pico did not answer every telemetry command")
+        except Exception as exc:
+            with self._condition:
+                self._errors += 1
+                self._last_error = exc
+            return False
+
+        row = self._count % self._capacity
+        self._times[row] = time.time()
+        self._values[row] = results[:-2]
+        self._intensity[row] = results[-2]
+        self._fixture_on[row] = results[-1]
+
+        with self._condition:
+            self._count += 1
+            self._condition.notify_all()
+        return True
+
+    def views(self):
+        '''
+        Returns the stored samples in time order without copying
+
+        The ring buffer holds the samples in at most two parts, so a list of one
+        or two (times, values, intensity, fixture_on) tuples of read-only views
+        is returned, oldest first. The rows of a view are overwritten once the
+        buffer wraps around, copy them to keep them longer.
+
+        Returns
+        -------
+        list
+            The parts of the buffer holding samples
+        '''
+        count = self._count
+        end = count % self._capacity
+        if count <= self._capacity:
+            parts = [(0, count)]
+        elif end == 0:
+            parts = [(0, self._capacity)]
+        else:
+            parts = [(end, self._capacity), (0, end)]
+
+        return [tuple(_read_only(array[start:stop])
+                      for array in (self._times, self._values, self._intensity, self._fixture_on))
+                for start, stop in parts if stop > start]
+
+    def history(self):
+        '''
+        Returns a copy of the stored samples in time order
+
+        Returns
+        -------
+        tuple
+            The times, values, intensity and fixture_on arrays
+        '''
+        parts = self.views()
+        if not parts:
+            return (np.zeros(0), np.zeros((0, len(self._channel_list)), dtype=np.uint16),
+                    np.zeros(0), np.zeros(0, dtype=bool))
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def latest(self):
+        '''
+        Returns the newest TelemetrySample, None before the first
+        '''
+        if self._count == 0:
+            return None
+        return self.__sample(self._count - 1)
+
+    def samples(self, timeout=None):
+        '''
+        A generator yielding every new sample as it is stored
+
+        When the consumer falls more than capacity samples behind it continues
+        with the oldest sample still stored. The generator ends when the
+        poller is stopped, or when no sample arrives within timeout.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The longest time in seconds to wait for the next sample
+        '''
+        index = self._count
+        while True:
+            with self._condition:
+                arrived = self._condition.wait_for(lambda: self._count > index or self._stop.is_set(), timeout)
+                if not arrived or self._count <= index:
+                    return
+                index = max(index, self._count - self._capacity)
+
+            yield self.__sample(index)
+            index += 1
+
+    ### Private Internal Methods
+
+    def __sample(self, index):
+        '''Internal method for the TelemetrySample stored for a sample number'''
+        row = index % self._capacity
+        return TelemetrySample(index, float(self._times[row]), _read_only(self._values[row]),
+                               float(self._intensity[row]), bool(self._fixture_on[row]))
+
+    def __run(self):
+        '''Internal method run by the polling thread'''
+        self._scheduler.start()
+        while not self._stop.is_set():
+            self.sample()
+
+            # after a stall the poller continues at the next future deadline, catching
+            # up on the missed ones would only fill the buffer with duplicate samples
+            skipped = self._scheduler.skip_missed()
+            if skipped:
+                with self._condition:
+                    self._skipped += skipped
+
+            # sleep on the stop event so stop() does not wait for a whole interval
+            remaining = (self._scheduler.deadline(self._scheduler.step + 1) - time.monotonic_ns()) / 1e9
+            if self._stop.wait(max(remaining - self._spin, 0.0)):
+                break
+            self._scheduler.wait()
+
+
+def _read_only(array):
+    '''A read-only view of an array'''
+    view = array.view()
+    view.flags.writeable = False
+    return view
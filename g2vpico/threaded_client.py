@@ -0,0 +1,616 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import collections
+import concurrent.futures
+import selectors
+import socket
+import threading
+
+from . import protocol
+from .MainClass import PicoBatch
+from .protocol import MessageDecoder
+
+class _Pending():
+    '''
+    The commands of one submission waiting for their responses, completed
+    as a single Future once every response has arrived.
+    '''
+    __slots__ = ('future', 'requests', 'combine', 'results', 'remaining', 'error')
+
+    def __init__(self, requests, combine):
+        self.future = concurrent.futures.Future()
+        self.requests = requests
+        self.combine = combine
+        self.results = [None] * len(requests)
+        self.remaining = len(requests)
+        self.error = None
+
+    def resolve(self, index, response):
+        '''Read the response to one of the commands, completing the future after the last one'''
+        try:
+            self.results[index] = self.requests[index].parse(response)
+        except Exception as exc:
+            if self.error is None:
+                self.error = exc
+
+        self.remaining -= 1
+        if self.remaining == 0:
+            if self.error is not None:
+                self.future.set_exception(self.error)
+            else:
+                try:
+                    self.future.set_result(self.combine(self.results))
+                except Exception as exc:
+                    self.future.set_exception(exc)
+
+
+class ThreadSafeG2VPico():
+    '''
+    A G2V Pico client that can be shared by any number of threads.
+
+    A single I/O thread owns the socket. Commands from every thread are put
+    on a queue, written by the I/O thread in the order they were submitted,
+    and their responses are matched to them in the same order. The submit_*
+    methods return a concurrent.futures.Future without waiting, and the
+    other methods are the blocking equivalents of the G2VPico methods.
+    Threads never hold a lock for a whole round trip, so commands from
+    several threads are in flight on the connection together.
+
+    Example
+    -------
+    pico = ThreadSafeG2VPico('192.168.1.70', '00000000c2ca735f')
+    future = pico.submit_is_fixture_on()
+    pico.set_global_intensity(50.0)
+    print(future.result())
+    '''
+    __DEFAULT_PORT_NUMBER = 50000
+
+    def __init__(self, ip_address, pico_id, port=None):
+        '''
+        Parameters
+        ----------
+        ip_addres : str
+            The IP address of the Pico on the network
+
+        pico_id : str
+            The 16 character ID of the Pico
+
+        port : int, optional
+            The TCP port of the Pico API, defaults to 50000
+        '''
+        self._ip_address = ip_address
+        self._port = ThreadSafeG2VPico.__DEFAULT_PORT_NUMBER if port is None else int(port)
+        self._id = str(pico_id)
+        self._channel_count = None
+        self._channel_list = None
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self._socket.connect((self._ip_address, self._port))
+        except ConnectionRefusedError as exc:
+            self._socket.close()
+            raise ConnectionRefusedError(f"Connection to PICO at {ip_address} refused") from exc
+
+        # the I/O thread writes everything queued at once, so small writes do not need to be delayed
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.setblocking(False)
+
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._error = None
+        self._closed = False
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._wakeup_send.setblocking(False)
+
+        self._thread = threading.Thread(target=self.__run, name=f"g2vpico-{self._id}", daemon=True)
+        self._thread.start()
+
+        try:
+            self._channel_count, self._channel_list = self.__submit(
+                [protocol.get_channel_count(self._id), protocol.get_channel_list(self._id)]).result()
+        except Exception:
+            self.close()
+            raise
+
+        if self._channel_count is None or self._channel_list is None:
+            self.close()
+            raise Exception("Instance can not be initialized")
+
+    def __repr__(self):
+        return f"PICO {self._id} at {self._ip_address}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+    @property
+    def id(self):
+        '''
+        The ID of the Pico used to intialize the object
+        '''
+        return self._id
+
+    @property
+    def channel_count(self):
+        '''
+        The number of channels available in the Pico
+        '''
+        return self._channel_count
+
+    @property
+    def channel_list(self):
+        '''
+        A list of the available channels in the Pico
+        '''
+        return self._channel_list
+
+    def close(self):
+        '''
+        Stop the I/O thread and close the connection to the Pico. Commands
+        still waiting for a response fail with ConnectionError.
+        '''
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        self.__wakeup()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    ### Private Internal Methods
+
+    def __submit(self, requests, combine=None):
+        '''
+        Internal method for queueing requests that are written together.
+
+        Returns a Future of the list of results, or of combine applied to it.
+        '''
+        pending = _Pending(requests, list if combine is None else combine)
+        if not requests:
+            pending.future.set_result(pending.combine([]))
+            return pending.future
+
+        with self._lock:
+            if self._closed or self._error is not None:
+                pending.future.set_exception(self._error or
+                                             ConnectionError(f"Connection to PICO at {self._ip_address} closed"))
+                return pending.future
+            wake = not self._queue
+            self._queue.append(pending)
+
+        # the I/O thread is only woken for the first command queued since it last looked
+        if wake:
+            self.__wakeup()
+        return pending.future
+
+    def __submit_one(self, request):
+        '''Internal method for queueing a single request, the Future holds its result'''
+        return self.__submit([request], combine=lambda results: results[0])
+
+    def __wakeup(self):
+        '''Internal method for waking the I/O thread'''
+        try:
+            self._wakeup_send.send(b'\0')
+        except (BlockingIOError, OSError):
+            # the wakeup socket is already full or closed, the I/O thread will see the queue
+            pass
+
+    def __run(self):
+        '''Internal method run by the I/O thread'''
+        decoder = MessageDecoder()
+        waiting = collections.deque()
+        outgoing = bytearray()
+        # bytes are only sent while the kernel send buffer has room, once it
+        # is full the selector reports when the Pico has read enough of it
+        writable = True
+        selector = selectors.DefaultSelector()
+        selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        selector.register(self._socket, selectors.EVENT_READ)
+        error = None
+
+        try:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        break
+                    submitted = list(self._queue)
+                    self._queue.clear()
+
+                for pending in submitted:
+                    for index, request in enumerate(pending.requests):
+                        outgoing += request.encode()
+                        waiting.append((pending, index))
+
+                if outgoing and writable:
+                    try:
+                        sent = self._socket.send(outgoing)
+                    except (BlockingIOError, InterruptedError):
+                        sent = 0
+                    del outgoing[:sent]
+                    writable = not outgoing
+
+                selector.modify(self._socket, selectors.EVENT_READ |
+                                (selectors.EVENT_WRITE if outgoing else 0))
+
+                for key, events in selector.select():
+                    if key.fileobj is self._wakeup_recv:
+                        try:
+                            while self._wakeup_recv.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        writable = True
+                    if events & selectors.EVENT_READ:
+                        try:
+                            decoder.recv_into(self._socket)
+                        except (BlockingIOError, InterruptedError):
+                            continue
+                        for response in decoder.messages():
+                            if waiting:
+                                pending, index = waiting.popleft()
+                                pending.resolve(index, response)
+        except Exception as exc:
+            error = exc
+        finally:
+            selector.close()
+            if error is None:
+                error = ConnectionError(f"Connection to PICO at {self._ip_address} closed")
+            elif not isinstance(error, ConnectionError):
+                error = ConnectionError(f"Connection to PICO at {self._ip_address} failed: {error}")
+
+            with self._lock:
+                self._error = error
+                self._closed = True
+                submitted = list(self._queue)
+                self._queue.clear()
+
+            failed = {id(pending): pending for pending, _ in waiting}
+            failed.update((id(pending), pending) for pending in submitted)
+            for pending in failed.values():
+                if not pending.future.done():
+                    pending.future.set_exception(error)
+
+            self._socket.close()
+            self._wakeup_recv.close()
+            self._wakeup_send.close()
+
+    def __get_channel_check(self, channel):
+        '''Internal method for verifying that a channel is valid and converting to int'''
+        return protocol.check_channel(channel, self._channel_list)
+
+    def __execute_batch(self, requests):
+        '''Internal method for sending the requests queued in a PicoBatch and waiting for their results'''
+        return self.__submit(requests).result()
+
+    @staticmethod
+    def __spectrum(channel_list):
+        '''Internal method returning a function that pairs channel values with their channels'''
+        def combine(values):
+            return [{'channel': str(channel), 'value': value} for channel, value in zip(channel_list, values)]
+        return combine
+
+    ### Methods returning a Future
+
+    def submit_get_channel_value(self, channel):
+        '''
+        Queue a read of the current PWM value of a channel
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Returns
+        -------
+        Future
+            Resolves to the current value of the channel
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self.__get_channel_check(channel)
+        return self.__submit_one(protocol.get_channel_value(self._id, channel))
+
+    def submit_set_channel_value(self, channel, value):
+        '''
+        Queue setting a channel to a value
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        value : str, int, float
+            The value to set the chosen channel to in the range [0, channel_limit]
+
+        Returns
+        -------
+        Future
+            Resolves to True if the channel has been set to the new value
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel or value parameter is an invalid type
+        '''
+        channel = self.__get_channel_check(channel)
+        value = protocol.check_value(value)
+        return self.__submit_one(protocol.set_channel_value(self._id, channel, value))
+
+    def submit_clear_channels(self):
+        '''
+        Queue setting every channel to a value of 0
+
+        Returns
+        -------
+        Future
+            Resolves to True when all channels have been set to 0
+        '''
+        return self.__submit([protocol.set_channel_value(self._id, channel, 0) for channel in self._channel_list],
+                             combine=lambda results: True)
+
+    def submit_get_channel_limit(self, channel):
+        '''
+        Queue a read of the maximum limit of a channel
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Returns
+        -------
+        Future
+            Resolves to the maximum limit of the channel
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self.__get_channel_check(channel)
+        return self.__submit_one(protocol.get_channel_limit(self._id, channel))
+
+    def submit_get_spectrum(self):
+        '''
+        Queue a read of the current spectrum
+
+        Returns
+        -------
+        Future
+            Resolves to a list of dict items with channel and value keys
+        '''
+        channel_list = list(self._channel_list)
+        return self.__submit([protocol.get_channel_value(self._id, channel) for channel in channel_list],
+                             combine=ThreadSafeG2VPico.__spectrum(channel_list))
+
+    def submit_set_spectrum(self, channel_list):
+        '''
+        Queue loading a spectrum, its commands are written together
+
+        Parameters
+        ----------
+        channel_list : str, list
+            str - A JSON formatted string contain channels and their corresponding values
+            list - A list of dict objects containing 'channel' and 'value' keys
+
+        Returns
+        -------
+        Future
+            Resolves to True if the new spectrum has been loaded
+
+        Exceptions
+        ----------
+        ValueError
+            If the spectrum data in channel_list is invalid or of an invalid type
+
+        ValueError
+            Raised when a channel or channel value is invalid
+        '''
+        requests = []
+        for channel, value in protocol.spectrum_items(channel_list):
+            channel = self.__get_channel_check(channel)
+            value = protocol.check_value(value)
+            requests.append(protocol.set_channel_value(self._id, channel, value))
+
+        return self.__submit(requests, combine=lambda results: True)
+
+    def submit_get_channel_wavelength_range(self, channel):
+        '''
+        Queue a read of the minimum and maximum wavelength of a channel in nm
+
+        Parameters
+        ----------
+        channel : str, int
+            The channel number in the range [1, channel_count]
+
+        Returns
+        -------
+        Future
+            Resolves to a list of the minimum and maximum wavelength
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when the channel parameter is an invalid type
+        '''
+        channel = self.__get_channel_check(channel)
+        return self.__submit_one(protocol.get_channel_range(self._id, channel))
+
+    def submit_get_global_intensity(self):
+        '''
+        Queue a read of the global intensity
+
+        Returns
+        -------
+        Future
+            Resolves to a value between 0.0 and 100.0
+        '''
+        return self.__submit_one(protocol.get_global_intensity(self._id))
+
+    def submit_set_global_intensity(self, value):
+        '''
+        Queue setting the global intensity
+
+        Parameters
+        ----------
+        value : float
+            The value of the new global intensity in the range [0.0, 100.0]
+
+        Returns
+        -------
+        Future
+            Resolves to True if the global intensity has been set successfully
+        '''
+        return self.__submit_one(protocol.set_global_intensity(self._id, value))
+
+    def submit_turn_off(self):
+        '''
+        Queue turning the fixture off while preserving channel values
+
+        Returns
+        -------
+        Future
+            Resolves to True if the fixture was turned off
+        '''
+        return self.__submit_one(protocol.set_fixture_on(self._id, False))
+
+    def submit_turn_on(self):
+        '''
+        Queue turning the fixture on with the previously stored spectrum
+
+        Returns
+        -------
+        Future
+            Resolves to True if the fixture was turned on
+        '''
+        return self.__submit_one(protocol.set_fixture_on(self._id, True))
+
+    def submit_is_fixture_on(self):
+        '''
+        Queue a read of whether the fixture is on
+
+        Returns
+        -------
+        Future
+            Resolves to True if the fixture is on
+        '''
+        return self.__submit_one(protocol.get_fixture_on(self._id))
+
+    ### Blocking methods matching G2VPico
+
+    def get_channel_value(self, channel):
+        '''
+        Returns the current PWM value of the channel, see submit_get_channel_value
+        '''
+        return self.submit_get_channel_value(channel).result()
+
+    def set_channel_value(self, channel, value):
+        '''
+        Sets the chosen channel to the specified value, see submit_set_channel_value
+        '''
+        return self.submit_set_channel_value(channel, value).result()
+
+    def clear_channels(self):
+        '''
+        Set all channels in the Pico to a value of 0
+        '''
+        return self.submit_clear_channels().result()
+
+    def get_channel_limit(self, channel):
+        '''
+        Returns the maximum limit of the channel, see submit_get_channel_limit
+        '''
+        return self.submit_get_channel_limit(channel).result()
+
+    def get_spectrum(self):
+        '''
+        Get the current spectrum as a list of dict items
+        '''
+        return self.submit_get_spectrum().result()
+
+    def set_spectrum(self, channel_list):
+        '''
+        Load in a spectrum either as a json string or a dictionary, see submit_set_spectrum
+        '''
+        return self.submit_set_spectrum(channel_list).result()
+
+    def get_channel_wavelength_range(self, channel):
+        '''
+        Returns the minimum and maximum wavelength values for a channel in nm
+        '''
+        return self.submit_get_channel_wavelength_range(channel).result()
+
+    def get_global_intensity(self):
+        '''
+        Returns the global intensity that is applied to all channels
+        '''
+        return self.submit_get_global_intensity().result()
+
+    def set_global_intensity(self, value):
+        '''
+        Sets the global intensity that is applied to all channels
+        '''
+        return self.submit_set_global_intensity(value).result()
+
+    def turn_off(self):
+        '''
+        Turns the fixture off while preserving channel values
+        '''
+        return self.submit_turn_off().result()
+
+    def turn_on(self):
+        '''
+        Turns the fixture on with previously stored spectrum
+        '''
+        return self.submit_turn_on().result()
+
+    def is_fixture_on(self):
+        '''
+        Returns whether the fixture is on or off
+        '''
+        return self.submit_is_fixture_on().result()
+
+    def batch(self):
+        '''
+        Create a batch of commands that are written to the Pico together,
+        sending it waits for every result
+
+        Returns
+        -------
+        PicoBatch
+            An empty batch bound to this Pico
+        '''
+        return PicoBatch(self._id, self.__get_channel_check, self.__execute_batch)
@@ -0,0 +1,407 @@
+'''
+Copyright 2021 - 2023 G2V Optics
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+'''
+
+import numpy as np
+
+from .quantization import quantize_values
+from .scheduler import Scheduler
+
+# Channel values are whole numbers
+_CHANNEL_RESOLUTION = 1
+
+class Timeline():
+    '''
+    A precomputed waveform as arrays of step times and output values.
+
+    Consecutive steps always hold different values, so playing a timeline
+    sends exactly one command per change in output. The output is held at
+    the last value until the end of the timeline at duration.
+    '''
+    __slots__ = ('_times', '_values', '_duration')
+
+    def __init__(self, times, values, duration):
+        '''
+        Parameters
+        ----------
+        times : array_like
+            The time of each step in seconds from the start, in increasing order
+
+        values : array_like
+            The output value of each step
+
+        duration : float
+            The length of the timeline in seconds
+        '''
+        times = np.array(times, dtype=np.float64).ravel()
+        values = np.array(values, dtype=np.float64).ravel()
+
+        if times.shape != values.shape:
+            raise ValueError(f"Timeline has {times.size} times but {values.size} values")
+        if times.size and (np.any(np.diff(times) < 0) or times[-1] > duration):
+            raise ValueError("Timeline times must be increasing and within the duration")
+
+        times.setflags(write=False)
+        values.setflags(write=False)
+        self._times = times
+        self._values = values
+        self._duration = float(duration)
+
+    def __repr__(self):
+        return f"Timeline of {self._times.size} steps over {self._duration} s"
+
+    def __len__(self):
+        return self._times.size
+
+    def __iter__(self):
+        return zip(self._times.tolist(), self._values.tolist())
+
+    @property
+    def times(self):
+        '''
+        The time of each step in seconds as a read-only array
+        '''
+        return self._times
+
+    @property
+    def values(self):
+        '''
+        The output value of each step as a read-only array
+        '''
+        return self._values
+
+    @property
+    def duration(self):
+        '''
+        The length of the timeline in seconds
+        '''
+        return self._duration
+
+
+class Waveform():
+    '''
+    Base class of periodic waveforms between a trough and a peak.
+
+    Subclasses define shape(phase), which maps the phase of each sample in
+    [0, 1) to an output fraction in [0, 1].
+    '''
+
+    def __init__(self, period, steps, trough=0.0, peak=100.0):
+        '''
+        Parameters
+        ----------
+        period : float
+            The length of one cycle in seconds
+
+        steps : int
+            The number of samples in one cycle
+
+        trough : float
+            The output at the bottom of the waveform
+
+        peak : float
+            The output at the top of the waveform
+
+        Exceptions
+        ----------
+        ValueError
+            Raised when period or steps are not greater than zero
+        '''
+        if period <= 0:
+            raise ValueError("Period must be greater than zero.")
+        if int(steps) != steps or steps <= 0:
+            raise ValueError("Steps must be an integer greater than zero.")
+
+        self._period = float(period)
+        self._steps = int(steps)
+        self._trough = float(trough)
+        self._peak = float(peak)
+
+    def __repr__(self):
+        return (f"{type(self).__name__} of {self._period} s in {self._steps} steps "
+                f"from {self._trough} to {self._peak}")
+
+    @property
+    def period(self):
+        '''
+        The length of one cycle in seconds
+        '''
+        return self._period
+
+    @property
+    def steps(self):
+        '''
+        The number of samples in one cycle
+        '''
+        return self._steps
+
+    def shape(self, phase):
+        '''
+        Returns the output fraction in [0, 1] for an array of phases in [0, 1)
+        '''
+        raise NotImplementedError()
+
+    def sample(self, times):
+        '''
+        Returns the output of the waveform at an array of times in seconds
+        '''
+        phase = np.mod(times, self._period) / self._period
+        return self._trough + (self._peak - self._trough) * self.shape(phase)
+
+    def timeline(self, cycles=1, resolution=0.1):
+        '''
+        Precompute the waveform into a Timeline
+
+        Parameters
+        ----------
+        cycles : int
+            The number of cycles
+
+        resolution : float
+            The output is rounded to a multiple of this value, 0.1 suits the
+            global intensity and 1 suits channel values
+
+        Returns
+        -------
+        Timeline
+            The steps where the quantized output changes
+        '''
+        times = np.arange(self._steps * cycles) * (self._period / self._steps)
+        return build_timeline(times, self.sample(times), self._period * cycles, resolution)
+
+
+class Sine(Waveform):
+    '''
+    A sine wave that starts at the trough.
+    '''
+
+    def shape(self, phase):
+        return 0.5 - 0.5 * np.cos(2.0 * np.pi * phase)
+
+
+class Triangle(Waveform):
+    '''
+    A triangle wave that rises from the trough to the peak and back in each cycle.
+    '''
+
+    def shape(self, phase):
+        return 1.0 - np.abs(2.0 * phase - 1.0)
+
+
+class Square(Waveform):
+    '''
+    A square wave that is at the peak for the first duty fraction of each cycle.
+    '''
+
+    def __init__(self, period, steps, trough=0.0, peak=100.0, duty=0.5):
+        '''
+        Parameters
+        ----------
+        duty : float
+            The fraction of each cycle spent at the peak in [0, 1]
+
+        See Waveform for the other parameters.
+        '''
+        super().__init__(period, steps, trough, peak)
+        if duty < 0 or duty > 1:
+            raise ValueError("Duty must be between 0 and 1.")
+        self._duty = float(duty)
+
+    def shape(self, phase):
+        return (phase < self._duty).astype(np.float64)
+
+
+class Sawtooth(Waveform):
+    '''
+    A sawtooth wave that rises from the trough towards the peak and drops back at the end of each cycle.
+    '''
+
+    def shape(self, phase):
+        return phase
+
+
+class PiecewiseLinear(Waveform):
+    '''
+    A waveform through (time, output) points that is linear between them.
+
+    The period is the time of the last point and the output wraps back to
+    the first point at the start of every cycle.
+    '''
+
+    def __init__(self, points, steps):
+        '''
+        Parameters
+        ----------
+        points : list
+            (time, output) pairs in increasing time order, the first at time 0
+
+        steps : int
+            The number of samples in one cycle
+        '''
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[0] < 2 or points.shape[1] != 2:
+            raise ValueError("Points must be a list of at least two (time, output) pairs.")
+        if points[0, 0] != 0 or np.any(np.diff(points[:, 0]) <= 0):
+            raise ValueError("Point times must start at 0 and be increasing.")
+
+        super().__init__(points[-1, 0], steps, points[:, 1].min(), points[:, 1].max())
+        self._points = points
+
+    def sample(self, times):
+        return np.interp(np.mod(times, self._period), self._points[:, 0], self._points[:, 1])
+
+
+class Samples(Waveform):
+    '''
+    A waveform from an array of output samples taken at a fixed interval.
+    '''
+
+    def __init__(self, values, interval):
+        '''
+        Parameters
+        ----------
+        values : array_like
+            The output of each sample in one cycle
+
+        interval : float
+            The time between samples in seconds
+        '''
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            raise ValueError("Samples must hold at least one value.")
+
+        super().__init__(values.size * interval, values.size, values.min(), values.max())
+        self._values = values
+
+    def sample(self, times):
+        index = np.rint(np.mod(times, self._period) / self._period * self._steps).astype(np.int64)
+        return self._values[index % self._steps]
+
+
+def build_timeline(times, values, duration, resolution=0.1):
+    '''
+    Quantize samples and drop the ones that do not change the output
+
+    Parameters
+    ----------
+    times : array_like
+        The time of each sample in seconds
+
+    values : array_like
+        The output of each sample
+
+    duration : float
+        The length of the timeline in seconds
+
+    resolution : float
+        The output is rounded to a multiple of this value, 0 disables rounding
+
+    Returns
+    -------
+    Timeline
+        The samples where the quantized output changes
+    '''
+    times = np.asarray(times, dtype=np.float64).ravel()
+    values = np.asarray(values, dtype=np.float64).ravel()
+    if times.shape != values.shape:
+        raise ValueError(f"Timeline has {times.size} times but {values.size} values")
+
+    values = quantize_values(values, resolution)
+
+    keep = np.ones(values.size, dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return Timeline(times[keep], values[keep], duration)
+
+
+class WaveformPlayer():
+    '''
+    Plays a Timeline on a Pico.
+
+    Each step is sent at its absolute deadline on the monotonic clock and
+    only the steps where the output changes are sent. On a channel the
+    values are rounded to whole numbers first, so steps smaller than one
+    are rounded instead of truncated and steps that round to the same
+    value are sent once.
+    '''
+
+    def __init__(self, pico, timeline, channel=None, spin=0.0):
+        '''
+        Parameters
+        ----------
+        pico : G2VPico
+            The Pico to play the waveform on
+
+        timeline : Timeline
+            The precomputed waveform
+
+        channel : int, optional
+            Play the waveform on the value of a channel instead of the global intensity
+
+        spin : float
+            Passed to the Scheduler, the final part of each wait spent polling the clock
+        '''
+        if channel is not None:
+            timeline = build_timeline(timeline.times, timeline.values, timeline.duration, _CHANNEL_RESOLUTION)
+
+        self._pico = pico
+        self._timeline = timeline
+        self._channel = channel
+        self._spin = spin
+        self._stats = None
+
+    def __repr__(self):
+        target = "global intensity" if self._channel is None else f"channel {self._channel}"
+        return f"Player of {self._timeline} on {target}"
+
+    @property
+    def stats(self):
+        '''
+        The LatenessStats of the last play, None before the first
+        '''
+        return self._stats
+
+    def play(self):
+        '''
+        Play the timeline and return once its duration has passed
+
+        Returns
+        -------
+        LatenessStats
+            How late each step was sent
+        '''
+        if self._channel is None:
+            send = self._pico.set_global_intensity
+        else:
+            channel = self._channel
+            send = lambda value: self._pico.set_channel_value(channel, int(value))
+
+        scheduler = Scheduler(spin=self._spin)
+        self._stats = scheduler.stats
+
+        for offset, value in self._timeline:
+            scheduler.wait_at(offset)
+            send(value)
+
+        scheduler.wait_until(scheduler.deadline(0) + int(round(self._timeline.duration * 1e9)))
+        return self._stats
@@ -36,4 +36,8 @@ setuptools.setup(
     url="https://github.com/g2v-optics/G2VPico",
     python_requires=">3.6",
     packages=setuptools.find_packages(),
+    extras_require={
+        "numpy": ["numpy"],
+        "fast": ["orjson"],
+    },
 )
\ No newline at end of file
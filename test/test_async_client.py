@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+
+from g2vpico import AsyncG2VPico
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestAsyncG2VPico(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = PicoSimulator()
+        self.pico = AsyncG2VPico('127.0.0.1', PICO_ID, port=self.server.start())
+        await self.pico.connect()
+
+    async def asyncTearDown(self):
+        await self.pico.close()
+        self.server.stop()
+
+    async def test_connect(self):
+        self.assertEqual(self.pico.channel_count, 8)
+        self.assertEqual(self.pico.channel_list, list(range(1, 9)))
+
+    async def test_invalid_pico_id(self):
+        pico = AsyncG2VPico('127.0.0.1', "0000000000000000", port=self.server.server_address[1])
+        with self.assertRaises(RuntimeError):
+            await pico.connect()
+        self.assertIsNone(pico._writer)
+        self.assertIsNone(pico._read_task)
+
+    async def test_connect_timeout_leaves_nothing_open(self):
+        self.server.latency = 0.5
+        pico = AsyncG2VPico('127.0.0.1', PICO_ID, port=self.server.server_address[1])
+        tasks = asyncio.all_tasks()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(pico.connect(), 0.1)
+        self.assertIsNone(pico._writer)
+        self.assertIsNone(pico._read_task)
+        self.assertEqual(asyncio.all_tasks() - tasks, set())
+
+    async def test_channel_commands(self):
+        self.assertTrue(await self.pico.set_channel_value(2, 20))
+        self.assertEqual(await self.pico.get_channel_value('2'), 20)
+        self.assertEqual(await self.pico.get_channel_limit(2), 4000)
+        self.assertEqual(await self.pico.get_channel_wavelength_range(2), [390, 410])
+
+        with self.assertRaises(ValueError):
+            await self.pico.set_channel_value(9, 20)
+
+    async def test_fixture_commands(self):
+        self.assertTrue(await self.pico.set_global_intensity(12.5))
+        self.assertEqual(await self.pico.get_global_intensity(), 12.5)
+        self.assertTrue(await self.pico.turn_on())
+        self.assertTrue(await self.pico.is_fixture_on())
+        self.assertTrue(await self.pico.turn_off())
+        self.assertFalse(await self.pico.is_fixture_on())
+
+    async def test_spectrum(self):
+        spectrum = [{'channel': str(channel), 'value': channel * 3} for channel in range(1, 9)]
+        self.assertTrue(await self.pico.set_spectrum(spectrum))
+        self.assertEqual(await self.pico.get_spectrum(), spectrum)
+
+        self.assertTrue(await self.pico.clear_channels())
+        self.assertEqual(set(self.server.values.values()), {0})
+
+    async def test_many_in_flight(self):
+        results = await asyncio.gather(*(self.pico.get_channel_value(channel % 8 + 1) for channel in range(500)))
+        self.assertEqual(results, [0] * 500)
+
+    async def test_error_keeps_connection_in_step(self):
+        with self.assertRaises(Exception):
+            await self.pico.set_spectrum([{'channel': '1', 'value': -1}, {'channel': '2', 'value': 2}])
+        self.assertEqual(await self.pico.get_channel_value(2), 2)
+
+    async def test_closed_connection(self):
+        await self.pico.close()
+        with self.assertRaises(ConnectionError):
+            await self.pico.get_global_intensity()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from g2vpico import SpectrumSolver
+from g2vpico.batch_fit import fit_library
+
+CHANNEL_LIST = list(range(1, 5))
+RANGES = [[340 + 20 * channel, 360 + 20 * channel] for channel in CHANNEL_LIST]
+WAVELENGTHS = np.arange(360.5, 440.0, 1.0)
+
+class TestBatchFit(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, 'job')
+        self.solver = SpectrumSolver(CHANNEL_LIST, RANGES, [1000] * 4, WAVELENGTHS)
+
+        self.expected = np.arange(50 * 4, dtype=np.uint16).reshape(50, 4) * 5
+        self.targets = self.solver.predict(self.expected)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_fit_library(self):
+        progress = []
+        path = fit_library(self.solver, self.targets, self.output, chunk_size=16, max_workers=2,
+                           progress=lambda completed, total: progress.append((completed, total)))
+
+        np.testing.assert_array_equal(np.load(path), self.expected)
+        self.assertEqual(progress[0], (0, 50))
+        self.assertEqual(progress[-1], (50, 50))
+
+    def test_resume_skips_written_chunks(self):
+        targets_path = os.path.join(self.directory.name, 'targets.npy')
+        np.save(targets_path, self.targets)
+        fit_library(self.solver, targets_path, self.output, chunk_size=16, max_workers=1)
+
+        os.remove(os.path.join(self.output, 'chunk-000002.npy'))
+        progress = []
+        path = fit_library(self.solver, targets_path, self.output, chunk_size=16, max_workers=1,
+                           progress=lambda completed, total: progress.append(completed))
+
+        self.assertEqual(progress, [34, 50])
+        np.testing.assert_array_equal(np.load(path), self.expected)
+
+    def test_different_job_is_refused(self):
+        fit_library(self.solver, self.targets, self.output, chunk_size=16, max_workers=1)
+        with self.assertRaises(ValueError):
+            fit_library(self.solver, self.targets, self.output, chunk_size=8, max_workers=1)
+
+        # the same shape with other targets, limits or profiles would mix old and new results
+        with self.assertRaises(ValueError):
+            fit_library(self.solver, self.targets[::-1], self.output, chunk_size=16, max_workers=1)
+        solver = SpectrumSolver(CHANNEL_LIST, RANGES, [2000] * 4, WAVELENGTHS)
+        with self.assertRaises(ValueError):
+            fit_library(solver, self.targets, self.output, chunk_size=16, max_workers=1)
+        profiles = (np.array([380.0, 400.0, 420.0]), {channel: np.array([0.5, 1.0, 0.5]) for channel in CHANNEL_LIST})
+        solver = SpectrumSolver(CHANNEL_LIST, RANGES, [1000] * 4, WAVELENGTHS, profiles=profiles)
+        with self.assertRaises(ValueError):
+            fit_library(solver, self.targets, self.output, chunk_size=16, max_workers=1)
+
+        same = SpectrumSolver(CHANNEL_LIST, RANGES, [1000] * 4, WAVELENGTHS)
+        self.assertEqual(same.digest(), self.solver.digest())
+        fit_library(same, self.targets.copy(), self.output, chunk_size=16, max_workers=1)
+
+if __name__ == '__main__':
+    unittest.main()
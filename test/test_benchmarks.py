@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from benchmarks.bench_client import compare, run
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_run(self):
+        results = run([4], [0.0], iterations=10)
+        self.assertEqual(results['latency/get_channel_value/ch=4/rtt=0.0']['samples'], 10)
+        self.assertGreater(results['throughput/set_spectrum/ch=4/rtt=0.0']['ops_per_sec'], 0)
+        self.assertIn('throughput/waveform_playback/ch=4/rtt=0.0', results)
+
+    def test_compare(self):
+        baseline = {'latency/a': {'p50_ms': 1.0, 'p99_ms': 2.0},
+                    'throughput/b': {'ops_per_sec': 100.0}}
+        results = {'latency/a': {'p50_ms': 1.05, 'p99_ms': 3.0},
+                   'throughput/b': {'ops_per_sec': 80.0},
+                   'throughput/c': {'ops_per_sec': 1.0}}
+
+        regressions = compare(results, baseline, threshold=0.1)
+        self.assertEqual([(key, metric) for key, metric, _, _, _ in regressions],
+                         [('latency/a', 'p99_ms'), ('throughput/b', 'ops_per_sec')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import time
+import unittest
+
+from g2vpico import CoalescingSender, G2VPico
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestCoalescingSender(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port)
+        self.addCleanup(self.pico.close)
+        self.server.commands.clear()
+
+    def test_newest_value_wins(self):
+        self.server.latency = 0.01
+        with CoalescingSender(self.pico) as sender:
+            for value in range(1, 301):
+                sender.set_global_intensity(value / 3)
+                sender.set_channel_value(2, value)
+            sender.flush()
+            self.assertEqual(self.server.global_intensity, 100.0)
+            self.assertEqual(self.server.values[2], 300)
+            self.assertLess(sender.sent, 100)
+            self.assertEqual(sender.sent + sender.coalesced, 600)
+
+    def test_latency_is_bounded(self):
+        self.server.latency = 0.01
+        with CoalescingSender(self.pico) as sender:
+            end = time.monotonic() + 0.3
+            value = 0
+            while time.monotonic() < end:
+                value += 1
+                sender.set_channel_value(1, value % 4000)
+
+            start = time.monotonic()
+            sender.flush()
+            # at most the batch in flight and the batch holding the newest value
+            self.assertLess(time.monotonic() - start, 0.1)
+            self.assertEqual(self.server.values[1], value % 4000)
+
+    def test_order_with_on_off(self):
+        with CoalescingSender(self.pico) as sender:
+            self.server.latency = 0.05
+            sender.set_channel_value(1, 1)
+            time.sleep(0.01)
+            sender.set_channel_value(3, 10)
+            sender.set_channel_value(3, 11)
+            sender.turn_off()
+            sender.set_channel_value(3, 12)
+            sender.set_channel_value(3, 13)
+            sender.turn_on()
+            self.assertEqual(sender.pending, 4)
+            sender.flush()
+
+        self.assertEqual(list(self.server.commands), ['set_channel_value', 'set_channel_value', 'set_fixture_on',
+                                                      'set_channel_value', 'set_fixture_on'])
+        self.assertEqual(self.server.values[3], 13)
+        self.assertTrue(self.server.fixture_on)
+
+    def test_errors_are_raised_by_flush(self):
+        sender = CoalescingSender(self.pico)
+        with self.assertRaises(ValueError):
+            sender.set_channel_value(99, 1)
+
+        self.server.api_enabled = False
+        sender.set_channel_value(1, 5)
+        with self.assertRaises(RuntimeError):
+            sender.flush()
+
+        self.server.api_enabled = True
+        sender.set_channel_value(1, 6)
+        self.assertTrue(sender.flush())
+        sender.close()
+        self.assertEqual(self.server.values[1], 6)
+
+        with self.assertRaises(RuntimeError):
+            sender.turn_on()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import time
+import unittest
+
+from g2vpico import PicoFleet
+from g2vpico.simulator import PicoSimulator
+
+class TestPicoFleet(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = [PicoSimulator(pico_id=f"{index:016x}") for index in range(4)]
+        addresses = [('127.0.0.1', server.pico_id, server.start()) for server in self.servers]
+        self.fleet = PicoFleet.connect(addresses)
+
+    def tearDown(self):
+        self.fleet.close()
+        for server in self.servers:
+            server.stop()
+
+    def test_connect_failures(self):
+        self.assertEqual(len(self.fleet), 4)
+        self.assertEqual(self.fleet.failed, {})
+
+        with PicoFleet.connect([('127.0.0.1', "0000000000000bad", self.servers[0].server_address[1])]) as fleet:
+            self.assertEqual(len(fleet), 0)
+            self.assertIsInstance(fleet.failed["0000000000000bad"], RuntimeError)
+
+    def test_set_global_intensity(self):
+        results = self.fleet.set_global_intensity(42.0)
+        self.assertEqual(list(results), [server.pico_id for server in self.servers])
+        self.assertTrue(all(result.ok and result.value for result in results.values()))
+        self.assertEqual([server.global_intensity for server in self.servers], [42.0] * 4)
+
+    def test_spectrum(self):
+        spectrum = [{'channel': '1', 'value': 10}, {'channel': '8', 'value': 80}]
+        self.fleet.set_spectrum(spectrum)
+
+        for result in self.fleet.get_spectrum().values():
+            self.assertEqual(result.value[0], {'channel': '1', 'value': 10})
+            self.assertEqual(result.value[7], {'channel': '8', 'value': 80})
+
+    def test_errors_are_per_fixture(self):
+        failing_id = self.servers[2].pico_id
+        self.servers[2].pico_id = "0000000000000bad"
+        results = self.fleet.get_channel_value(8)
+
+        self.assertFalse(results[failing_id].ok)
+        self.assertIsInstance(results[failing_id].error, RuntimeError)
+        self.assertTrue(results[self.servers[0].pico_id].ok)
+        self.assertEqual(results[self.servers[0].pico_id].value, 0)
+
+    def test_parallel(self):
+        for server in self.servers:
+            server.latency = 0.2
+
+        start = time.monotonic()
+        self.fleet.turn_on()
+        self.assertLess(time.monotonic() - start, 0.6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from g2vpico import G2VPico
+from g2vpico.latency import LatencyProfile, forget_latency, measure_latency
+from examples.example_sawtooth import SawtoothWaveform
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestLatency(unittest.TestCase):
+
+    def setUp(self):
+        forget_latency()
+        self.server = PicoSimulator(latency=0.002)
+        self.pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.start())
+        self.server.commands.clear()
+
+    def tearDown(self):
+        forget_latency()
+        self.pico.close()
+        self.server.stop()
+
+    def test_measure_latency(self):
+        profile = measure_latency(self.pico, samples=10)
+        self.assertEqual(profile.samples, 10)
+        self.assertGreaterEqual(profile.p50, 0.002)
+        self.assertLessEqual(profile.p50, profile.p90)
+        self.assertLessEqual(profile.p99, profile.max)
+        self.assertEqual(list(self.server.commands), ['get_global_intensity'] + ['set_global_intensity'] * 10)
+        self.assertEqual(self.server.global_intensity, 100.0)
+
+    def test_unknown_intensity_is_not_written(self):
+        class UnknownIntensity():
+            id = PICO_ID
+
+            def __init__(self):
+                self.commands = []
+
+            def get_global_intensity(self):
+                self.commands.append('get_global_intensity')
+                return None
+
+            def set_global_intensity(self, value):
+                self.commands.append('set_global_intensity')
+                return True
+
+        pico = UnknownIntensity()
+        profile = measure_latency(pico, samples=5)
+        self.assertEqual(profile.samples, 5)
+        self.assertEqual(pico.commands, ['get_global_intensity'] * 6)
+
+    def test_profile_is_cached_per_pico(self):
+        profile = measure_latency(self.pico, samples=5)
+        self.server.commands.clear()
+        self.assertIs(measure_latency(self.pico), profile)
+        self.assertEqual(list(self.server.commands), [])
+
+        self.assertIsNot(measure_latency(self.pico, samples=5, refresh=True), profile)
+
+    def test_minimum_step(self):
+        self.assertEqual(LatencyProfile(10, 0.01, 0.02, 0.0301, 0.04).minimum_step, 0.046)
+        self.assertEqual(LatencyProfile(10, 0.0001, 0.0001, 0.0001, 0.0001).minimum_step, 0.005)
+
+    def test_sawtooth_calibration(self):
+        generator = SawtoothWaveform(self.pico)
+        self.assertEqual(generator.minimum_step, measure_latency(self.pico).minimum_step)
+        self.assertLess(generator.minimum_step, 0.25)
+        self.assertEqual(SawtoothWaveform(self.pico, calibrate=False).minimum_step, 0.25)
+        self.assertEqual(SawtoothWaveform(object()).minimum_step, 0.25)
+
+        profile = generator.calibrate(samples=5)
+        self.assertEqual(generator.minimum_step, profile.minimum_step)
+
+        generator.period = 1
+        generator.steps = 10
+        generator.calculate_timestep()
+        self.assertEqual(generator.timestep, 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from g2vpico import G2VPico, Spectrum, SpectrumLibrary
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestSpectrumLibrary(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'spectra.g2vlib')
+
+    def test_add_and_get(self):
+        with SpectrumLibrary.create(self.path, [1, 2, 3, 4]) as library:
+            self.assertEqual(library.add('a', [1, 2, 3, 4], tags=['solar']), 0)
+            self.assertEqual(library.add('b', Spectrum([4, 2], [40, 20])), 1)
+            self.assertEqual(library.add('c', [{'channel': '3', 'value': 30}]), 2)
+
+        library = SpectrumLibrary(self.path)
+        self.addCleanup(library.close)
+        self.assertEqual(len(library), 3)
+        self.assertEqual(library.names, ['a', 'b', 'c'])
+        self.assertEqual(library.channel_list, [1, 2, 3, 4])
+        self.assertEqual(library.get('b').tolist(), [0, 20, 0, 40])
+        self.assertEqual(library.to_list('c')[2], {'channel': '3', 'value': 30})
+        self.assertEqual(library.spectrum('a'), Spectrum([1, 2, 3, 4], [1, 2, 3, 4]))
+        self.assertEqual(library.tags('a'), ['solar'])
+        self.assertEqual(library.find('solar'), ['a'])
+        self.assertIn('c', library)
+        with self.assertRaises(KeyError):
+            library.get('d')
+        with self.assertRaises(ValueError):
+            library.get('a')[0] = 5
+        with self.assertRaises(ValueError):
+            library.add('d', [0, 0, 0, 0])
+
+    def test_growth_and_replace(self):
+        library = SpectrumLibrary.create(self.path, range(1, 9), capacity=2)
+        values = np.arange(100 * 8).reshape(100, 8) % 4000
+        library.add_many([f"s{index}" for index in range(50)], values[:50])
+        for index in range(50, 100):
+            library.add(f"s{index}", values[index], tags=['late'])
+
+        with self.assertRaises(ValueError):
+            library.add('s3', values[0])
+        library.add('s3', values[99], tags=['replaced'], replace=True)
+        library.close()
+
+        library = SpectrumLibrary(self.path, writable=True)
+        self.addCleanup(library.close)
+        self.assertEqual(len(library), 100)
+        self.assertEqual(library.values[[0, 3, 99]].tolist(), values[[0, 99, 99]].tolist())
+        self.assertEqual(library.tags('s3'), ['replaced'])
+        self.assertEqual(len(library.find('late')), 50)
+
+        library.add('extra', values[1])
+        library.flush()
+        with SpectrumLibrary(self.path) as reader:
+            self.assertEqual(reader.get('extra').tolist(), values[1].tolist())
+
+    def test_unflushed_spectra_are_not_visible(self):
+        library = SpectrumLibrary.create(self.path, [1, 2])
+        library.add('kept', [1, 2])
+        library.flush()
+        library.add('lost', [3, 4])
+
+        reader = SpectrumLibrary(self.path)
+        self.assertEqual(reader.names, ['kept'])
+        reader.close()
+        library.close()
+        with SpectrumLibrary(self.path) as reader:
+            self.assertEqual(reader.names, ['kept', 'lost'])
+
+    def test_invalid(self):
+        with SpectrumLibrary.create(self.path, [1, 2]) as library:
+            with self.assertRaises(ValueError):
+                library.add('a', [1, 2, 3])
+            with self.assertRaises(ValueError):
+                library.add('a', [-1, 2])
+            with self.assertRaises(ValueError):
+                library.add_many(['a', 'a'], [[1, 2], [3, 4]])
+            with self.assertRaises(ValueError):
+                library.add('a\nb', [1, 2])
+            with self.assertRaises(ValueError):
+                library.add('a', [1, 2], tags=['x\ty'])
+            self.assertEqual(len(library), 0)
+
+        with self.assertRaises(FileExistsError):
+            SpectrumLibrary.create(self.path, [1, 2])
+        with SpectrumLibrary(self.path) as library:
+            with self.assertRaises(ValueError):
+                library.add('b', [1, 2])
+
+        with open(self.path, 'wb') as outfile:
+            outfile.write(b'not a library')
+        with self.assertRaises(ValueError):
+            SpectrumLibrary(self.path)
+
+    def test_collected_library_is_closed(self):
+        library = SpectrumLibrary.create(self.path, [1, 2])
+        library.add('a', [1, 2])
+        handle = library._file
+        del library
+        self.assertTrue(handle.closed)
+        with SpectrumLibrary(self.path) as reader:
+            self.assertEqual(reader.names, ['a'])
+
+    def test_set_spectrum_from_library(self):
+        with PicoSimulator() as server:
+            pico = G2VPico('127.0.0.1', PICO_ID, port=server.port)
+            self.addCleanup(pico.close)
+            with SpectrumLibrary.create(self.path, pico.channel_list) as library:
+                library.add('ramp', range(10, 90, 10))
+                pico.set_spectrum_array(library.get('ramp'))
+                self.assertEqual(server.values[8], 80)
+                pico.set_spectrum(library.to_list('ramp')[:2])
+                self.assertEqual(server.values[2], 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from g2vpico import G2VPico
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestG2VPico(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator()
+        self.pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.start())
+
+    def tearDown(self):
+        self.pico.close()
+        self.server.stop()
+
+    def test_init(self):
+        self.assertEqual(self.pico.channel_count, 8)
+        self.assertEqual(self.pico.channel_list, list(range(1, 9)))
+
+    def test_invalid_pico_id(self):
+        with self.assertRaises(RuntimeError):
+            G2VPico('127.0.0.1', "0000000000000000", port=self.server.server_address[1])
+
+    def test_channel_commands(self):
+        self.assertTrue(self.pico.set_channel_value('4', 123.7))
+        self.assertEqual(self.pico.get_channel_value(4), 123)
+        self.assertEqual(self.pico.get_channel_limit(4), 4000)
+        self.assertEqual(self.pico.get_channel_wavelength_range(4), [430, 450])
+
+        with self.assertRaises(ValueError):
+            self.pico.get_channel_value(0)
+        with self.assertRaises(ValueError):
+            self.pico.set_channel_value(1, "high")
+
+    def test_fixture_commands(self):
+        self.assertTrue(self.pico.set_global_intensity(55.5))
+        self.assertEqual(self.pico.get_global_intensity(), 55.5)
+
+        self.assertTrue(self.pico.turn_on())
+        self.assertTrue(self.pico.is_fixture_on())
+        self.assertTrue(self.pico.turn_off())
+        self.assertFalse(self.pico.is_fixture_on())
+
+    def test_set_spectrum(self):
+        spectrum = [{'channel': str(channel), 'value': channel * 10} for channel in range(1, 9)]
+        self.assertTrue(self.pico.set_spectrum(spectrum))
+        self.assertEqual(self.server.values, {channel: channel * 10 for channel in range(1, 9)})
+
+    def test_set_spectrum_json(self):
+        self.assertTrue(self.pico.set_spectrum('[{"channel": "3", "value": 42}]'))
+        self.assertEqual(self.server.values[3], 42)
+
+        with self.assertRaises(ValueError):
+            self.pico.set_spectrum('not json')
+
+    def test_set_spectrum_invalid_channel_sends_nothing(self):
+        with self.assertRaises(ValueError):
+            self.pico.set_spectrum([{'channel': '1', 'value': 5}, {'channel': '99', 'value': 5}])
+        self.assertEqual(self.server.values[1], 0)
+
+    def test_get_spectrum(self):
+        self.server.values.update({2: 200, 7: 700})
+        spectrum = self.pico.get_spectrum()
+        self.assertEqual(len(spectrum), 8)
+        self.assertEqual(spectrum[1], {'channel': '2', 'value': 200})
+        self.assertEqual(spectrum[6], {'channel': '7', 'value': 700})
+
+    def test_clear_channels(self):
+        self.server.values.update({1: 10, 5: 50})
+        self.assertTrue(self.pico.clear_channels())
+        self.assertEqual(set(self.server.values.values()), {0})
+
+    def test_batch_results(self):
+        with self.pico.batch() as batch:
+            batch.set_channel_value(1, 11)
+            batch.get_channel_value(1)
+            self.assertEqual(len(batch), 2)
+        self.assertEqual(batch.results, [True, 11])
+
+    def test_batch_error_keeps_connection_in_step(self):
+        batch = self.pico.batch()
+        batch.set_channel_value(1, -1)
+        batch.set_channel_value(2, 22)
+        with self.assertRaises(Exception):
+            batch.send()
+
+        self.assertEqual(self.server.values[2], 22)
+        self.assertEqual(self.pico.get_channel_value(2), 22)
+
+    def test_batch_not_sent_on_exception(self):
+        with self.assertRaises(KeyError):
+            with self.pico.batch() as batch:
+                batch.set_channel_value(1, 11)
+                raise KeyError()
+        self.assertEqual(self.server.values[1], 0)
+
+class TestShadowState(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator()
+        self.pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.start(), shadow=True)
+        self.server.commands.clear()
+
+    def tearDown(self):
+        self.pico.close()
+        self.server.stop()
+
+    def test_reads_are_answered_from_shadow(self):
+        self.pico.set_channel_value(1, 10)
+        self.pico.set_global_intensity(75.0)
+        self.pico.turn_on()
+        self.server.commands.clear()
+
+        self.assertEqual(self.pico.get_channel_value(1), 10)
+        self.assertEqual(self.pico.get_global_intensity(), 75.0)
+        self.assertTrue(self.pico.is_fixture_on())
+        self.assertEqual(list(self.server.commands), [])
+
+        self.pico.get_spectrum()
+        self.assertEqual(list(self.server.commands), ['get_channel_value'] * 7)
+
+    def test_set_spectrum_sends_only_changes(self):
+        spectrum = [{'channel': str(channel), 'value': channel} for channel in range(1, 9)]
+        self.pico.set_spectrum(spectrum)
+        self.assertEqual(len(self.server.commands), 8)
+
+        spectrum[2]['value'] = 300
+        spectrum[5]['value'] = 600
+        self.server.commands.clear()
+        self.pico.set_spectrum(spectrum)
+        self.assertEqual(list(self.server.commands), ['set_channel_value'] * 2)
+        self.assertEqual(self.server.values[3], 300)
+        self.assertEqual(self.server.values[6], 600)
+
+    def test_clear_channels_skips_zero_channels(self):
+        self.pico.get_spectrum()
+        self.pico.set_channel_value(2, 5)
+        self.server.commands.clear()
+
+        self.pico.clear_channels()
+        self.assertEqual(list(self.server.commands), ['set_channel_value'])
+        self.assertEqual(self.server.values[2], 0)
+
+    def test_verify(self):
+        self.pico.set_channel_value(1, 10)
+        self.pico.set_global_intensity(50.0)
+        self.assertEqual(self.pico.verify(), {})
+
+        self.server.values[1] = 11
+        self.server.global_intensity = 40.0
+        self.assertEqual(self.pico.verify(), {1: (10, 11), 'global_intensity': (50.0, 40.0)})
+        self.assertEqual(self.pico.get_channel_value(1), 11)
+
+    def test_verify_without_shadow(self):
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.server_address[1])
+        self.addCleanup(pico.close)
+        with self.assertRaises(RuntimeError):
+            pico.verify()
+
+
+if __name__ == "__main__":
+    unittest.main()
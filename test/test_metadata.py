@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from g2vpico import G2VPico, MetadataCache
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache', 'metadata.json')
+        self.server = PicoSimulator()
+        self.port = self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def connect(self, **kwargs):
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.port, metadata_cache=MetadataCache(self.path), **kwargs)
+        self.addCleanup(pico.close)
+        return pico
+
+    def test_cache_miss_reads_and_stores_metadata(self):
+        pico = self.connect()
+        self.assertEqual(pico.channel_list, list(range(1, 9)))
+        self.assertTrue(os.path.isfile(self.path))
+
+        metadata = MetadataCache(self.path).get(PICO_ID)
+        self.assertEqual(metadata['channel_count'], 8)
+        self.assertEqual(metadata['channel_limits'], [4000] * 8)
+        self.assertEqual(metadata['wavelength_ranges'][0], [370, 390])
+
+    def test_cache_hit_with_validation(self):
+        self.connect()
+        self.server.commands.clear()
+
+        pico = self.connect()
+        self.assertEqual(list(self.server.commands), ['get_channel_count'])
+        self.assertEqual(pico.channel_list, list(range(1, 9)))
+        self.assertEqual(pico.get_channel_limit(3), 4000)
+        self.assertEqual(pico.get_channel_wavelength_range(3), [410, 430])
+        self.assertEqual(list(self.server.commands), ['get_channel_count'])
+
+    def test_cache_hit_without_validation(self):
+        self.connect()
+        self.server.commands.clear()
+
+        pico = self.connect(validate_metadata=False)
+        self.assertEqual(pico.channel_count, 8)
+        self.assertEqual(list(self.server.commands), [])
+
+    def test_stale_cache_is_refreshed(self):
+        self.connect()
+        del self.server.values[8]
+
+        pico = self.connect()
+        self.assertEqual(pico.channel_count, 7)
+        self.assertEqual(MetadataCache(self.path).get(PICO_ID)['channel_count'], 7)
+
+    def test_refresh_metadata(self):
+        pico = self.connect()
+        self.server.commands.clear()
+        self.assertTrue(pico.refresh_metadata())
+        self.assertEqual(self.server.commands.count('get_channel_limit'), 8)
+
+    def test_corrupt_cache_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as outfile:
+            outfile.write("{not json")
+
+        pico = self.connect()
+        self.assertEqual(pico.channel_count, 8)
+
+    def test_remove(self):
+        self.connect()
+        cache = MetadataCache(self.path)
+        cache.remove(PICO_ID)
+        self.assertIsNone(MetadataCache(self.path).get(PICO_ID))
+
+
+if __name__ == "__main__":
+    unittest.main()
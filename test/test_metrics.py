@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+
+from g2vpico import G2VPico, MetricsHook, PicoMetrics
+from g2vpico.metrics import LatencyHistogram
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, Faults, PicoSimulator
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator()
+        self.server.start()
+        self.metrics = PicoMetrics()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def connect(self):
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port, metrics=self.metrics)
+        self.addCleanup(pico.close)
+        return pico
+
+    def test_commands_and_bytes(self):
+        pico = self.connect()
+        pico.set_channel_value(1, 10)
+        pico.get_spectrum()
+
+        entry = self.metrics.snapshot()[PICO_ID]
+        self.assertEqual(entry['connects'], 1)
+        self.assertEqual(entry['reconnects'], 0)
+        self.assertEqual(entry['commands']['get_channel_value']['count'], 8)
+        self.assertEqual(entry['commands']['set_channel_value']['buckets'][-1], ["+Inf", 1])
+        self.assertGreater(entry['bytes_sent'], 0)
+        self.assertGreater(entry['bytes_received'], entry['bytes_sent'] // 4)
+        self.assertEqual(entry['errors'], {})
+
+    def test_errors_by_category(self):
+        pico = self.connect()
+        self.server.variable = False
+        with self.assertRaises(RuntimeError):
+            pico.set_channel_value(1, 10)
+        with self.assertRaises(Exception):
+            pico.set_channel_value(1, -1)
+
+        errors = self.metrics.snapshot()[PICO_ID]['errors']
+        self.assertEqual(errors, {'set_channel_value': {'not_variable': 2}})
+
+    def test_connection_errors_and_reconnects(self):
+        self.connect()
+        self.connect()
+        self.server.faults = Faults(reset_after=1)
+        with self.assertRaises(ConnectionError):
+            self.connect()
+
+        entry = self.metrics.snapshot()[PICO_ID]
+        self.assertEqual(entry['connects'], 3)
+        self.assertEqual(entry['reconnects'], 2)
+        self.assertEqual(entry['errors'], {'get_channel_count': {'connection': 1},
+                                           'get_channel_list': {'connection': 1}})
+
+    def test_prometheus_export(self):
+        pico = self.connect()
+        pico.get_global_intensity()
+
+        text = self.metrics.to_prometheus()
+        self.assertIn('# TYPE g2vpico_command_seconds histogram', text)
+        self.assertIn(f'g2vpico_command_seconds_count{{pico_id="{PICO_ID}",command="get_global_intensity"}} 1', text)
+        self.assertIn(f'g2vpico_connects_total{{pico_id="{PICO_ID}"}} 1', text)
+        self.assertEqual(json.loads(self.metrics.to_json()), self.metrics.snapshot())
+
+    def test_prometheus_escapes_labels(self):
+        self.metrics.on_command('pico "a"\\b\nc', 'get_spectrum', 0.01, None)
+
+        text = self.metrics.to_prometheus()
+        self.assertIn('g2vpico_command_seconds_count{pico_id="pico \\"a\\"\\\\b\\nc",command="get_spectrum"} 1',
+                      text)
+        self.assertNotIn('\nc"', text)
+
+    def test_custom_hook(self):
+        class Recorder(MetricsHook):
+            def __init__(self):
+                self.commands = []
+
+            def on_command(self, pico_id, command, seconds, error):
+                self.commands.append((command, error))
+
+        hook = Recorder()
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port, metrics=hook)
+        self.addCleanup(pico.close)
+        self.assertEqual(hook.commands, [('get_channel_count', None), ('get_channel_list', None)])
+
+    def test_histogram(self):
+        histogram = LatencyHistogram([0.01, 0.1])
+        for seconds in (0.005, 0.01, 0.05, 2.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.cumulative(), [(0.01, 2), (0.1, 3), (float('inf'), 4)])
+        self.assertAlmostEqual(histogram.sum, 2.065)
+
+if __name__ == '__main__':
+    unittest.main()
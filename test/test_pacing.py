@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import time
+import unittest
+
+from g2vpico import G2VPico, Pacer
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestPacer(unittest.TestCase):
+
+    def test_token_bucket(self):
+        pacer = Pacer(rate=100.0, max_rate=100.0)
+        start = time.monotonic()
+        for _ in range(21):
+            pacer.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_batch_borrows_tokens(self):
+        pacer = Pacer(rate=100.0, max_rate=100.0)
+        self.assertAlmostEqual(pacer.acquire(10), 0.09)
+        start = time.monotonic()
+        pacer.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.009)
+
+    def test_additive_increase(self):
+        pacer = Pacer(rate=100.0, increase=100.0)
+        for _ in range(20):
+            pacer.acquire()
+            pacer.observe(0.02)
+        self.assertGreater(pacer.rate, 110.0)
+        self.assertAlmostEqual(pacer.srtt, 0.02)
+        self.assertEqual(pacer.decreases, 0)
+
+    def test_rate_grows_to_the_throughput(self):
+        pacer = Pacer(rate=100.0)
+        pacer.acquire(2)
+        pacer.observe(0.001)
+        self.assertEqual(pacer.rate, 1000.0)
+
+    def test_no_increase_without_pacing(self):
+        pacer = Pacer(rate=100.0)
+        for _ in range(20):
+            time.sleep(0.02)
+            pacer.acquire()
+            pacer.observe(0.001)
+        self.assertEqual(pacer.rate, 100.0)
+
+    def test_multiplicative_decrease(self):
+        pacer = Pacer(rate=100.0, cut_interval=0.01)
+        for _ in range(10):
+            pacer.observe(0.001)
+        time.sleep(0.01)
+        for _ in range(20):
+            pacer.observe(0.02)
+        self.assertEqual(pacer.decreases, 1)
+        self.assertLess(pacer.rate, 100.0)
+
+        rate = pacer.rate
+        time.sleep(0.02)
+        pacer.observe(0.001, error=True)
+        self.assertAlmostEqual(pacer.rate, max(rate * 0.7, 1.0))
+
+    def test_jitter_does_not_cut(self):
+        pacer = Pacer(rate=100.0)
+        for index in range(200):
+            pacer.observe(0.004 if index % 5 == 0 else 0.0002)
+        self.assertEqual(pacer.decreases, 0)
+        self.assertGreaterEqual(pacer.rate, 100.0)
+
+    def test_lasting_change_becomes_min_rtt(self):
+        pacer = Pacer(rate=100.0, rebaseline=0.05)
+        for _ in range(20):
+            pacer.observe(0.0002)
+        for _ in range(30):
+            time.sleep(0.005)
+            pacer.observe(0.005)
+        self.assertEqual(pacer.rebaselines, 1)
+        self.assertAlmostEqual(pacer.min_rtt, 0.005)
+        self.assertGreaterEqual(pacer.rate, 100.0)
+
+    def test_batches_do_not_update_rtt(self):
+        pacer = Pacer()
+        pacer.observe(0.5, count=30)
+        self.assertIsNone(pacer.srtt)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Pacer(rate=0.0)
+        with self.assertRaises(ValueError):
+            Pacer(decrease=1.5)
+
+
+class TestPacedPico(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def test_rate_follows_the_pico(self):
+        pacer = Pacer(rate=50.0, increase=2000.0)
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port, pacer=pacer)
+        self.addCleanup(pico.close)
+        self.assertIs(pico.pacer, pacer)
+
+        for value in range(100):
+            pico.set_channel_value(1, value)
+        self.assertGreater(pacer.rate, 50.0)
+        self.assertIsNotNone(pacer.min_rtt)
+
+        # the control box slows down, commands now queue up behind each other
+        self.server.latency = 0.01
+        rate = pacer.rate
+        for value in range(10):
+            pico.set_channel_value(1, value)
+        self.assertLess(pacer.rate, rate)
+        self.assertGreater(pacer.decreases, 0)
+        self.assertEqual(self.server.values[1], 9)
+
+    def test_rate_is_the_throughput(self):
+        # one command in flight at a time can not build a backlog, the rate follows what the Pico delivers
+        self.server.latency = 0.005
+        pacer = Pacer()
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port, pacer=pacer)
+        self.addCleanup(pico.close)
+
+        start = time.monotonic()
+        for value in range(300):
+            pico.set_channel_value(1, value)
+        throughput = 300 / (time.monotonic() - start)
+        self.assertEqual(pacer.decreases, 0)
+        self.assertLess(pacer.rate, 1.5 * throughput)
+        self.assertGreater(pacer.rate, 0.8 * throughput)
+
+    def test_healthy_link_keeps_the_rate(self):
+        pacer = Pacer(rate=200.0, max_rate=200.0)
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port, pacer=pacer)
+        self.addCleanup(pico.close)
+
+        start = time.monotonic()
+        for value in range(200):
+            pico.set_channel_value(1, value)
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(pacer.decreases, 0)
+        self.assertEqual(pacer.rate, 200.0)
+
+    def test_slow_link_keeps_the_rate(self):
+        # a 5 ms round trip is a property of the link, a synchronous client cannot build a backlog
+        self.server.latency = 0.005
+        pacer = Pacer(rate=100.0, max_rate=100.0)
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port, pacer=pacer)
+        self.addCleanup(pico.close)
+
+        start = time.monotonic()
+        for value in range(100):
+            pico.set_channel_value(1, value)
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(pacer.rate, 100.0)
+
+if __name__ == '__main__':
+    unittest.main()
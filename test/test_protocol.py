@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+import json
+import socket
+import unittest
+
+from g2vpico import protocol
+from g2vpico.protocol import MessageDecoder
+
+class TestMessageDecoder(unittest.TestCase):
+
+    def setUp(self):
+        self.decoder = MessageDecoder(buffer_size=16)
+
+    def test_single_message(self):
+        self.decoder.feed(b'{"cmd": "get_channel_count", "channel_count": 30}')
+        self.assertEqual(len(self.decoder), 1)
+        self.assertEqual(self.decoder.pop(), {'cmd': 'get_channel_count', 'channel_count': 30})
+        self.assertEqual(self.decoder.buffered, 0)
+
+    def test_fragmented_message(self):
+        data = json.dumps({'cmd': 'get_channel_list', 'channel_list': [str(x) for x in range(1, 31)]}).encode('utf-8')
+        for index in range(len(data)):
+            self.assertEqual(len(self.decoder), 0)
+            self.decoder.feed(data[index:index + 1])
+
+        self.assertEqual(len(self.decoder), 1)
+        self.assertEqual(len(self.decoder.pop()['channel_list']), 30)
+
+    def test_coalesced_messages(self):
+        self.decoder.feed(b'{"value": 1}{"value": 2} \r\n{"value": 3}{"val')
+        self.assertEqual([message['value'] for message in self.decoder.messages()], [1, 2, 3])
+
+        self.decoder.feed(b'ue": 4}')
+        self.assertEqual(self.decoder.pop(), {'value': 4})
+
+    def test_split_multibyte_character(self):
+        data = '{"error": "µs timeout"}'.encode('utf-8')
+        split = data.index(b'\xc2') + 1
+        self.decoder.feed(data[:split])
+        self.assertEqual(len(self.decoder), 0)
+        self.decoder.feed(data[split:] + b'{"value": 5}')
+        self.assertEqual(self.decoder.pop(), {'error': 'µs timeout'})
+        self.assertEqual(self.decoder.pop(), {'value': 5})
+
+    def test_message_larger_than_buffer(self):
+        message = {'cmd': 'get_channel_list', 'channel_list': [str(x) for x in range(1000)]}
+        self.decoder.feed(json.dumps(message).encode('utf-8'))
+        self.assertEqual(self.decoder.pop(), message)
+
+    def test_message_too_large(self):
+        decoder = MessageDecoder(buffer_size=16, max_message_size=64)
+        with self.assertRaises(ValueError):
+            decoder.feed(b'{"channel_list": "' + b'x' * 100)
+        self.assertEqual(decoder.buffered, 0)
+
+    def test_corrupt_stream(self):
+        with self.assertRaises(ValueError):
+            self.decoder.feed(b'{"value": 1}garbage')
+        self.assertEqual(self.decoder.buffered, 0)
+
+    def test_invalid_message_is_rejected_early(self):
+        decoder = MessageDecoder(buffer_size=16, max_message_size=1 << 20)
+        with self.assertRaises(ValueError):
+            decoder.feed(b'{garbage')
+        self.assertEqual(decoder.buffered, 0)
+
+        # a partial message is checked again whenever it has doubled in size
+        decoder.feed(b'{"value": 1, "list": [1')
+        with self.assertRaises(ValueError):
+            decoder.feed(b', 2 3')
+            for _ in range(10):
+                decoder.feed(b', 4')
+        self.assertEqual(decoder.buffered, 0)
+
+        with self.assertRaises(ValueError):
+            decoder.feed(b'{"value": [1, 2}')
+
+    def test_partial_tokens_are_not_rejected(self):
+        for data in (b'{"value": tr', b'{"value": -', b'{"value": 1.', b'{"value": 2e+', b'{"err": "\\u00',
+                     b'{"err": "ab\\', b'{"value":'):
+            decoder = MessageDecoder()
+            decoder.feed(data)
+            self.assertEqual(decoder.buffered, len(data))
+
+    def test_escaped_brackets_split_everywhere(self):
+        message = {'error': 'a "quoted" } ] { [ \\ value', 'list': [{'a': 1}, [2, {}]]}
+        data = json.dumps(message).encode('utf-8') * 2
+        for split in range(1, len(data)):
+            decoder = MessageDecoder(buffer_size=16)
+            decoder.feed(data[:split])
+            decoder.feed(data[split:])
+            self.assertEqual(list(decoder.messages()), [message, message])
+
+    def test_unicode_split_everywhere(self):
+        message = {'error': 'é µs 😀 done', 'value': 5}
+        for data in (json.dumps(message).encode('utf-8'), json.dumps(message, ensure_ascii=False).encode('utf-8')):
+            for split in range(1, len(data)):
+                decoder = MessageDecoder(buffer_size=16)
+                decoder.feed(data[:split])
+                decoder.feed(data[split:])
+                self.assertEqual(decoder.pop(), message)
+
+    def test_recv_into(self):
+        left, right = socket.socketpair()
+        with left, right:
+            left.sendall(b'{"value": 1}{"value"')
+            self.decoder.recv_into(right)
+            self.assertEqual(len(self.decoder), 1)
+            left.sendall(b': 2}')
+            self.decoder.recv_into(right)
+            self.assertEqual([message['value'] for message in self.decoder.messages()], [1, 2])
+
+            left.close()
+            with self.assertRaises(ConnectionError):
+                self.decoder.recv_into(right)
+
+
+class TestMessageDecoderWithoutOrjson(TestMessageDecoder):
+
+    def setUp(self):
+        orjson = protocol._orjson
+        protocol._orjson = None
+        self.addCleanup(setattr, protocol, '_orjson', orjson)
+        super().setUp()
+
+
+class TestRequestEncoding(unittest.TestCase):
+
+    def assertEncodesLikeJson(self, request):
+        self.assertEqual(request.encode(), json.dumps(request.cmd).encode('utf-8'))
+
+    def test_matches_json_dumps(self):
+        pico_id = '00000000c2ca735f'
+        self.assertEncodesLikeJson(protocol.get_channel_count(pico_id))
+        self.assertEncodesLikeJson(protocol.get_channel_list(pico_id))
+        self.assertEncodesLikeJson(protocol.get_channel_value(pico_id, 12))
+        self.assertEncodesLikeJson(protocol.set_channel_value(pico_id, 3, 4000))
+        self.assertEncodesLikeJson(protocol.set_channel_value(pico_id, -1, 0))
+        self.assertEncodesLikeJson(protocol.get_channel_range(pico_id, 30))
+        self.assertEncodesLikeJson(protocol.set_global_intensity(pico_id, 55.5))
+        self.assertEncodesLikeJson(protocol.set_global_intensity(pico_id, 100))
+        self.assertEncodesLikeJson(protocol.set_global_intensity(pico_id, 1e-7))
+        self.assertEncodesLikeJson(protocol.set_fixture_on(pico_id, True))
+        self.assertEncodesLikeJson(protocol.set_fixture_on(pico_id, False))
+
+    def test_escaped_pico_id(self):
+        self.assertEncodesLikeJson(protocol.get_channel_value('pico "µ" \\ 1', 1))
+
+    def test_exact_bytes(self):
+        request = protocol.set_channel_value('00000000c2ca735f', 3, 4000)
+        self.assertEqual(request.encode(), b'{"command": "api", "pico_id": "00000000c2ca735f", '
+                                           b'"cmd": "set_channel_value", "channel": 3, "value": 4000}')
+        self.assertEqual(request.name, 'set_channel_value')
+        self.assertEqual(request.cmd['value'], 4000)
+
+    def test_unserializable_value(self):
+        with self.assertRaises(TypeError):
+            protocol.set_global_intensity('00000000c2ca735f', object()).encode()
+
+
+class TestErrors(unittest.TestCase):
+
+    def test_error_handler_matches_category(self):
+        cases = (
+            ("Pico ID invalid", RuntimeError, "pico_id_invalid"),
+            ("Command type invalid: foo", NotImplementedError, "command_invalid"),
+            ("Pico is not Variable", RuntimeError, "not_variable"),
+            ("Pico API not enabled", RuntimeError, "api_not_enabled"),
+            ("Something else", Exception, "unknown"),
+        )
+        for error, exception, category in cases:
+            self.assertEqual(protocol.error_category(error), category)
+            with self.assertRaises(exception):
+                protocol.error_handler(error, 'foo')
+
+        with self.assertRaisesRegex(NotImplementedError, "Command foo is not implemented"):
+            protocol.error_handler("Command type invalid", 'foo')
+
+
+if __name__ == "__main__":
+    unittest.main()
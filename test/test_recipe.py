@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from g2vpico import G2VPico
+from g2vpico.recipe import RecipePlayer, dedupe, quantize, read_csv, read_recipe, resample, write_recipe
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class FakePico():
+
+    def __init__(self):
+        self.sent = []
+
+    def set_global_intensity(self, value):
+        self.sent.append((time.monotonic(), value))
+        return True
+
+class TestRecipeFiles(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_csv(self, text):
+        path = os.path.join(self.directory, 'recipe.csv')
+        with open(path, 'w') as outfile:
+            outfile.write(text)
+        return path
+
+    def test_read_csv(self):
+        path = self.write_csv("site,timestamp,ghi\n"
+                              "a,2023-01-01T00:00:00,0\n"
+                              "a,2023-01-01T00:01:00Z,12.5\n"
+                              "\n"
+                              "a,2023-01-01T01:02:00+01:00,20\n")
+        rows = list(read_csv(path, 'timestamp', 'ghi'))
+        self.assertEqual(rows, [(1672531200.0, 0.0), (1672531260.0, 12.5), (1672531320.0, 20.0)])
+
+        self.assertEqual(list(read_csv(path, 1, 2)), rows)
+        self.assertEqual(list(read_csv(path, 'timestamp', 'ghi', start=1672531290)), rows[1:])
+        self.assertEqual(list(read_csv(path, 'timestamp', 'ghi', start=1672531260)), rows[1:])
+        self.assertEqual(list(read_csv(path, 'timestamp', 'ghi', start=1672531400)), rows[2:])
+        self.assertEqual(list(read_csv(path, 'timestamp', 'ghi', start=0)), rows)
+
+        with self.assertRaises(ValueError):
+            list(read_csv(path, 'time', 'ghi'))
+
+        path = self.write_csv("0,1\n60,2\nbad,3\n")
+        with self.assertRaises(ValueError):
+            list(read_csv(path))
+
+    def test_recipe_file_round_trip(self):
+        path = os.path.join(self.directory, 'recipe.g2vrcp')
+        rows = [(60.0 * index, index % 7 / 2) for index in range(10000)]
+        self.assertEqual(write_recipe(path, iter(rows)), 10000)
+
+        self.assertEqual(list(read_recipe(path)), rows)
+        self.assertEqual(list(read_recipe(path, start=60 * 5000 + 30)), rows[5000:])
+        self.assertEqual(list(read_recipe(path, start=60 * 5000)), rows[5000:])
+        self.assertEqual(list(read_recipe(path, start=-1)), rows)
+        self.assertEqual(list(read_recipe(path, start=1e9)), rows[-1:])
+
+        self.assertEqual(write_recipe(path, []), 0)
+        self.assertEqual(list(read_recipe(path, start=10)), [])
+
+        with self.assertRaises(ValueError):
+            write_recipe(path, [(1, 0), (0, 0)])
+        with self.assertRaises(ValueError):
+            list(read_recipe(self.write_csv("0,1\n")))
+
+    def test_pipeline(self):
+        rows = [(30.0, 0.0), (90.0, 60.0), (150.0, 60.0), (210.0, 120.0)]
+        self.assertEqual(list(resample(rows, 60)),
+                         [(30.0, 0.0), (60, 30.0), (120, 60.0), (180, 90.0)])
+        self.assertEqual(list(quantize([(0, 10.04), (1, 10.06), (2, -3), (3, 250)], 0.1, 0, 100)),
+                         [(0, 10.0), (1, 10.1), (2, 0), (3, 100)])
+        self.assertEqual(list(quantize([(0, 0.25), (1, 0.74), (2, 1.3), (3, 7.4)], 0.25)),
+                         [(0, 0.25), (1, 0.75), (2, 1.25), (3, 7.5)])
+        self.assertEqual(list(dedupe([(0, 1), (1, 1), (2, 2), (3, 1), (4, 1)])), [(0, 1), (2, 2), (3, 1)])
+
+        with self.assertRaises(ValueError):
+            list(resample([(1, 0), (0, 0)], 1))
+        with self.assertRaises(ValueError):
+            list(resample(rows, 0))
+
+class TestRecipePlayer(unittest.TestCase):
+
+    def test_play_at_speed(self):
+        pico = FakePico()
+        rows = ((index * 10.0, float(index)) for index in range(5))
+        player = RecipePlayer(pico, rows, speed=500)
+        stats = player.play()
+
+        self.assertEqual([value for _, value in pico.sent], [0, 1, 2, 3, 4])
+        self.assertGreaterEqual(pico.sent[-1][0] - pico.sent[0][0], 0.075)
+        self.assertEqual(player.position, 40.0)
+        self.assertEqual(player.sent, 5)
+        self.assertEqual(stats.count, 5)
+
+    def test_resume_sends_value_in_effect(self):
+        pico = FakePico()
+        rows = [(index * 10.0, float(index)) for index in range(5)]
+        RecipePlayer(pico, rows, speed=1000).play(start=25)
+        self.assertEqual([value for _, value in pico.sent], [2, 3, 4])
+
+        pico = FakePico()
+        RecipePlayer(pico, rows, speed=1000).play(start=20)
+        self.assertEqual([value for _, value in pico.sent], [2, 3, 4])
+
+        pico = FakePico()
+        RecipePlayer(pico, rows, speed=1000).play(start=100)
+        self.assertEqual([value for _, value in pico.sent], [4])
+
+    def test_stop(self):
+        pico = FakePico()
+        player = RecipePlayer(pico, [(0, 1), (3600, 2)])
+        thread = threading.Thread(target=player.play)
+        thread.start()
+        time.sleep(0.05)
+        player.stop()
+        thread.join(1)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(player.position, 0)
+        self.assertEqual([value for _, value in pico.sent], [1])
+
+    def test_play_on_simulator(self):
+        with PicoSimulator() as server:
+            pico = G2VPico('127.0.0.1', PICO_ID, port=server.port)
+            self.addCleanup(pico.close)
+            server.commands.clear()
+
+            rows = resample([(0, 0), (100, 400)], 25)
+            RecipePlayer(pico, dedupe(quantize(rows, 1)), channel=2, speed=2000).play()
+
+            self.assertEqual(list(server.commands), ['set_channel_value'] * 5)
+            self.assertEqual(server.values[2], 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import time
+import unittest
+
+from g2vpico import G2VPico, Recorder, protocol
+from g2vpico.recorder import MAGIC, read_log, replay, session_count
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestRecorder(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'session.g2vlog')
+
+        self.server = PicoSimulator()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def record(self, actions):
+        with Recorder(self.path) as recorder:
+            pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port, recorder=recorder)
+            try:
+                actions(pico)
+            finally:
+                pico.close()
+
+    def test_commands_and_responses_are_logged(self):
+        self.record(lambda pico: pico.set_channel_value(3, 30))
+
+        records = list(read_log(self.path))
+        self.assertEqual([record.kind for record in records], ['command', 'command', 'response', 'response',
+                                                               'command', 'response'])
+        command, response = records[4], records[5]
+        self.assertEqual(command.command, 'set_channel_value')
+        self.assertEqual(command.pico_id, PICO_ID)
+        self.assertEqual(command.message['value'], 30)
+        self.assertEqual(response.message['cmd'], 'set_channel_value')
+        self.assertLessEqual(command.time, response.time)
+
+        # the two metadata commands are sent as one batch and share a timestamp
+        self.assertEqual(records[0].time, records[1].time)
+
+    def test_names_are_interned(self):
+        self.record(lambda pico: [pico.get_channel_value(1) for _ in range(50)])
+        with open(self.path, 'rb') as infile:
+            data = infile.read()
+        self.assertTrue(data.startswith(MAGIC))
+        # each name is defined once, apart from that it only appears in the JSON messages
+        self.assertEqual(data.count(b'get_channel_value'), 1 + 50 + 50)
+        self.assertEqual(data.count(PICO_ID.encode()), 1 + 2 + 50)
+
+    def test_sessions_are_appended(self):
+        self.record(lambda pico: pico.turn_on())
+        self.record(lambda pico: pico.turn_off())
+        self.assertEqual(session_count(self.path), 2)
+
+        records = [record for record in read_log(self.path) if record.command == 'set_fixture_on']
+        self.assertEqual([record.session for record in records], [0, 0, 1, 1])
+        self.assertEqual([record.message.get('fixture_on') for record in records], [True, None, False, None])
+
+    def test_missing_responses_keep_their_place(self):
+        requests = [protocol.get_channel_value(PICO_ID, 1), protocol.get_global_intensity(PICO_ID),
+                    protocol.get_channel_value(PICO_ID, 2)]
+        with Recorder(self.path) as recorder:
+            recorder.record_commands(PICO_ID, requests, b''.join(request.encode() for request in requests))
+            recorder.record_responses(PICO_ID, requests, [{'value': 1}, None, {'value': 2}])
+
+        responses = [record for record in read_log(self.path) if record.kind == 'response']
+        self.assertEqual([(record.command, record.message) for record in responses],
+                         [('get_channel_value', {'value': 1}), ('get_global_intensity', None),
+                          ('get_channel_value', {'value': 2})])
+
+    def test_writer_error_is_raised(self):
+        recorder = Recorder(self.path)
+        request = protocol.get_global_intensity(PICO_ID)
+        recorder.record_responses(PICO_ID, [request], [{'value': object()}])
+        with self.assertRaises(TypeError):
+            recorder.flush()
+        with self.assertRaises(TypeError):
+            recorder.close()
+
+    def test_truncated_log(self):
+        self.record(lambda pico: pico.turn_on())
+        complete = list(read_log(self.path))
+        with open(self.path, 'r+b') as outfile:
+            outfile.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual(list(read_log(self.path)), complete[:-1])
+
+    def test_recording_after_a_truncated_log(self):
+        self.record(lambda pico: pico.set_channel_value(2, 20))
+        with open(self.path, 'r+b') as outfile:
+            outfile.truncate(os.path.getsize(self.path) - 3)
+        self.record(lambda pico: pico.set_channel_value(4, 40))
+
+        self.assertEqual(session_count(self.path), 2)
+        records = [record for record in read_log(self.path) if record.command == 'set_channel_value']
+        self.assertEqual([(record.session, record.kind) for record in records],
+                         [(0, 'command'), (1, 'command'), (1, 'response')])
+
+        with PicoSimulator() as other:
+            first = replay(self.path, '127.0.0.1', port=other.port, session=0, speed=10)
+            second = replay(self.path, '127.0.0.1', port=other.port, session=1, speed=10)
+            self.assertEqual(other.values[2], 20)
+            self.assertEqual(other.values[4], 40)
+        self.assertEqual(first.commands, 3)
+        self.assertEqual(second.commands, 3)
+
+    def test_not_a_log(self):
+        with open(self.path, 'wb') as outfile:
+            outfile.write(b'something else')
+        with self.assertRaises(ValueError):
+            Recorder(self.path)
+        with self.assertRaises(ValueError):
+            list(read_log(self.path))
+
+    def test_replay(self):
+        def actions(pico):
+            pico.set_channel_value(2, 20)
+            with pico.batch() as batch:
+                batch.set_channel_value(4, 40)
+                batch.set_global_intensity(30.0)
+
+        self.record(actions)
+        self.server.values.update({2: 0, 4: 0})
+
+        with PicoSimulator(pico_id='0000000000000001') as other:
+            result = replay(self.path, '127.0.0.1', port=other.port, pico_id='0000000000000001', speed=10)
+            self.assertEqual(other.values[2], 20)
+            self.assertEqual(other.values[4], 40)
+            self.assertEqual(other.global_intensity, 30.0)
+
+        self.assertEqual(result.commands, 5)
+        self.assertEqual(result.mismatches, 0)
+        self.assertEqual(result.lateness.count, 3)
+
+    def test_replay_timing(self):
+        def actions(pico):
+            pico.turn_on()
+            time.sleep(0.2)
+            pico.turn_off()
+
+        self.record(actions)
+        start = os.times().elapsed
+        replay(self.path, '127.0.0.1', port=self.server.port, speed=2)
+        self.assertGreaterEqual(os.times().elapsed - start, 0.09)
+
+        with self.assertRaises(ValueError):
+            replay(self.path, '127.0.0.1', port=self.server.port, speed=0)
+        with self.assertRaises(ValueError):
+            replay(self.path, '127.0.0.1', port=self.server.port, session=3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import time
+import unittest
+
+from g2vpico.scheduler import LatenessStats, Scheduler
+
+class TestScheduler(unittest.TestCase):
+
+    def test_steps_follow_absolute_deadlines(self):
+        scheduler = Scheduler(0.02)
+        for step in range(1, 11):
+            scheduler.wait()
+            time.sleep(0.005)
+            self.assertEqual(scheduler.step, step)
+
+        # time spent between steps is absorbed, so the run does not drift
+        self.assertGreaterEqual(scheduler.elapsed(), 0.2)
+        self.assertLess(scheduler.elapsed(), 0.24)
+        self.assertEqual(scheduler.stats.count, 10)
+        self.assertLess(scheduler.stats.mean, 0.01)
+        self.assertEqual(scheduler.stats.missed, 0)
+
+    def test_late_step_is_reported(self):
+        scheduler = Scheduler(0.01, spin=0.001)
+        time.sleep(0.035)
+        lateness = scheduler.wait()
+        self.assertGreaterEqual(lateness, 0.025)
+        self.assertEqual(scheduler.stats.missed, 1)
+
+        scheduler.wait()
+        self.assertEqual(scheduler.stats.count, 2)
+
+    def test_skip_missed(self):
+        scheduler = Scheduler(0.01)
+        self.assertEqual(scheduler.skip_missed(), 0)
+        time.sleep(0.055)
+        skipped = scheduler.skip_missed()
+        self.assertGreaterEqual(skipped, 5)
+        self.assertLess(scheduler.wait(), 0.005)
+        self.assertEqual(scheduler.step, skipped + 1)
+
+        with self.assertRaises(ValueError):
+            Scheduler().skip_missed()
+
+    def test_wait_at_offsets(self):
+        scheduler = Scheduler()
+        for offset in (0.01, 0.015, 0.04):
+            scheduler.wait_at(offset)
+        self.assertGreaterEqual(scheduler.elapsed(), 0.04)
+        self.assertEqual(scheduler.stats.count, 3)
+
+        with self.assertRaises(ValueError):
+            scheduler.wait()
+
+    def test_start_resets(self):
+        scheduler = Scheduler(0.01)
+        scheduler.wait()
+        scheduler.start()
+        self.assertEqual(scheduler.step, 0)
+        self.assertEqual(scheduler.stats.count, 0)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Scheduler(0)
+        with self.assertRaises(ValueError):
+            Scheduler(1, spin=-1)
+
+    def test_lateness_stats(self):
+        stats = LatenessStats()
+        for lateness in (0.001, 0.002, 0.003):
+            stats.add(lateness)
+        self.assertAlmostEqual(stats.mean, 0.002)
+        self.assertAlmostEqual(stats.stdev, 0.001)
+        self.assertAlmostEqual(stats.max, 0.003)
+
+if __name__ == '__main__':
+    unittest.main()
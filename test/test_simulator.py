@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import json
+import random
+import socket
+import time
+import unittest
+
+from g2vpico import G2VPico
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, SCENARIOS, Faults, PicoSimulator, lognormal, spikes
+
+class TestPicoSimulator(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator(channels={3: {'limit': 1000, 'range': [400, 420]},
+                                              9: {'limit': 2000, 'range': [600, 640]}})
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def exchange(self, *cmds):
+        with socket.create_connection(('127.0.0.1', self.server.port)) as sock:
+            sock.sendall(''.join(json.dumps(cmd) for cmd in cmds).encode('utf-8'))
+            decoder = json.JSONDecoder()
+            data = ''
+            responses = []
+            while len(responses) < len(cmds):
+                data += sock.recv(4096).decode('utf-8')
+                while data:
+                    try:
+                        response, index = decoder.raw_decode(data)
+                    except json.JSONDecodeError:
+                        break
+                    responses.append(response)
+                    data = data[index:]
+            return responses
+
+    def test_channel_table(self):
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port)
+        self.addCleanup(pico.close)
+
+        self.assertEqual(pico.channel_list, [3, 9])
+        self.assertEqual(pico.get_channel_limit(9), 2000)
+        self.assertEqual(pico.get_channel_wavelength_range(3), [400, 420])
+        self.assertTrue(pico.set_channel_value(9, 1500))
+        self.assertEqual(self.server.values, {3: 0, 9: 1500})
+
+    def test_error_responses(self):
+        api = {'command': 'api', 'pico_id': PICO_ID}
+        responses = self.exchange(dict(api, cmd='get_nothing'),
+                                  dict(api, cmd='get_channel_count', pico_id='0000000000000000'),
+                                  dict(api, cmd='set_channel_value', channel=3, value=1001),
+                                  dict(api, cmd='get_channel_value', channel=4))
+
+        self.assertEqual([response['error'] for response in responses],
+                         ["Command type invalid", "Pico ID invalid", "Value out of range", "Command data invalid"])
+        self.assertEqual(list(self.server.commands), ['get_nothing', 'get_channel_count', 'set_channel_value',
+                                                      'get_channel_value'])
+
+    def test_commands_are_bounded(self):
+        with PicoSimulator(max_commands=3) as server:
+            pico = G2VPico('127.0.0.1', PICO_ID, port=server.port)
+            self.addCleanup(pico.close)
+            for channel in range(1, 6):
+                pico.get_channel_value(channel)
+            self.assertEqual(list(server.commands), ['get_channel_value'] * 3)
+
+        with PicoSimulator(max_commands=0) as server:
+            pico = G2VPico('127.0.0.1', PICO_ID, port=server.port)
+            self.addCleanup(pico.close)
+            self.assertEqual(len(server.commands), 0)
+
+    def test_pico_modes(self):
+        pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port)
+        self.addCleanup(pico.close)
+
+        self.server.variable = False
+        with self.assertRaises(RuntimeError):
+            pico.set_channel_value(3, 10)
+
+        self.server.api_enabled = False
+        with self.assertRaises(RuntimeError):
+            pico.get_channel_value(3)
+
+class TestFaults(unittest.TestCase):
+
+    def connect(self, faults, channels=32):
+        server = PicoSimulator(channels=channels, faults=faults)
+        server.start()
+        self.addCleanup(server.stop)
+
+        pico = G2VPico('127.0.0.1', PICO_ID, port=server.port)
+        self.addCleanup(pico.close)
+        return server, pico
+
+    def exercise(self, pico):
+        spectrum = [{'channel': str(channel), 'value': channel * 10} for channel in pico.channel_list]
+        self.assertTrue(pico.set_spectrum(spectrum))
+        self.assertEqual(pico.get_spectrum(), spectrum)
+        self.assertTrue(pico.set_global_intensity(55.5))
+        self.assertEqual(pico.get_global_intensity(), 55.5)
+
+    def test_fragmented_responses(self):
+        _, pico = self.connect('fragmented')
+        self.exercise(pico)
+
+    def test_coalesced_responses(self):
+        _, pico = self.connect(Faults(coalesce=5))
+        self.exercise(pico)
+
+    def test_slow_reader(self):
+        server, pico = self.connect(Faults(read_size=16, read_delay=0.0005), channels=64)
+        self.exercise(pico)
+        self.assertEqual(server.values[64], 640)
+
+    def test_per_command_latency(self):
+        _, pico = self.connect(Faults(latency={'get_global_intensity': 0.05}))
+
+        start = time.perf_counter()
+        pico.get_channel_value(1)
+        self.assertLess(time.perf_counter() - start, 0.05)
+
+        start = time.perf_counter()
+        pico.get_global_intensity()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+    def test_round_trip_time(self):
+        server = PicoSimulator(channels=32, rtt=0.05)
+        server.start()
+        self.addCleanup(server.stop)
+        pico = G2VPico('127.0.0.1', PICO_ID, port=server.port)
+        self.addCleanup(pico.close)
+
+        start = time.perf_counter()
+        pico.get_channel_value(1)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+        # a pipelined batch pays the round trip once, not once per command
+        start = time.perf_counter()
+        self.exercise(pico)
+        self.assertLess(time.perf_counter() - start, 4 * 0.05 * 1.8)
+
+    def test_connection_reset(self):
+        server, pico = self.connect(Faults(reset_after=4))
+        pico.set_channel_value(1, 10)
+        with self.assertRaises(ConnectionError):
+            pico.set_channel_value(2, 20)
+        self.assertEqual(server.values[2], 0)
+
+    def test_scenarios_are_not_shared(self):
+        first = PicoSimulator(faults='coalesced')
+        second = PicoSimulator(faults='coalesced')
+        self.addCleanup(first.server_close)
+        self.addCleanup(second.server_close)
+
+        first.faults.coalesce = 2
+        self.assertEqual(second.faults.coalesce, 8)
+        self.assertEqual(SCENARIOS['coalesced']().coalesce, 8)
+
+    def test_distributions_are_reproducible(self):
+        faults = Faults(latency=lognormal(0.002, 0.5), seed=7)
+        runs = []
+        for _ in range(2):
+            rng = faults.random()
+            runs.append([faults.command_latency('get_channel_value', rng) for _ in range(5)])
+        self.assertEqual(runs[0], runs[1])
+
+        latency = spikes(0.001, 0.5, 0.5)
+        rng = random.Random(3)
+        self.assertEqual(set(latency(rng) for _ in range(100)), {0.001, 0.5})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import datetime as dt
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from g2vpico.solar import clear_sky_irradiance, solar_elevation, solar_timeline
+
+def timestamp(*args):
+    return dt.datetime(*args, tzinfo=dt.timezone.utc).timestamp()
+
+class TestSolar(unittest.TestCase):
+
+    def test_solar_elevation(self):
+        # the sun is overhead at the equator at noon on the equinox and below it at midnight
+        elevation = solar_elevation([timestamp(2023, 3, 20, 12, 7), timestamp(2023, 3, 21, 0, 7)], 0, 0)
+        self.assertGreater(elevation[0], 89)
+        self.assertLess(elevation[1], -89)
+
+        # Ottawa at solar noon on the summer and winter solstices
+        self.assertAlmostEqual(solar_elevation(timestamp(2023, 6, 21, 17, 7), 45.42, -75.7), 68.0, delta=0.2)
+        self.assertAlmostEqual(solar_elevation(timestamp(2023, 12, 21, 16, 55), 45.42, -75.7), 21.1, delta=0.2)
+
+    def test_clear_sky_irradiance(self):
+        irradiance = clear_sky_irradiance([-10, 0, 30, 90])
+        self.assertEqual(irradiance[:2].tolist(), [0, 0])
+        self.assertAlmostEqual(irradiance[2], 1098 * 0.5 * np.exp(-0.114))
+        self.assertAlmostEqual(irradiance[3], 1098 * np.exp(-0.057))
+
+    def test_solar_timeline(self):
+        # a day in Ottawa from local midnight, played in a minute
+        timeline = solar_timeline(45.42, -75.7, '2023-06-21T05:00', dt.datetime(2023, 6, 22, 5), interval=60,
+                                  compression=1440)
+        self.assertEqual(timeline.duration, 60.0)
+        self.assertEqual(timeline.times[0], 0.0)
+        self.assertEqual(timeline.values[0], 0.0)
+        self.assertAlmostEqual(timeline.values.max(), 95.8, delta=0.2)
+        self.assertTrue(np.all(np.diff(timeline.values) != 0))
+
+        # sunrise in Ottawa is about 09:15 UTC, the output rises above 0.1% shortly after
+        sunrise = timeline.times[np.argmax(timeline.values > 0)]
+        self.assertAlmostEqual(sunrise, 4.25 * 60 / 24, delta=0.5)
+
+        half = solar_timeline(45.42, -75.7, dt.date(2023, 6, 21), '2023-06-22', compression=1440, full_sun=2000)
+        self.assertAlmostEqual(half.values.max(), 47.9, delta=0.2)
+
+        with self.assertRaises(ValueError):
+            solar_timeline(0, 0, '2023-06-22', '2023-06-21')
+        with self.assertRaises(ValueError):
+            solar_timeline(0, 0, '2023-06-21', '2023-06-22', compression=0)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache_dir = os.path.join(directory, 'solar')
+            timeline = solar_timeline(10, 20, 0, 7 * 86400, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            modified = os.stat(path).st_mtime_ns
+            cached = solar_timeline(10, 20, 0, 7 * 86400, cache_dir=cache_dir)
+            self.assertEqual(os.stat(path).st_mtime_ns, modified)
+            self.assertEqual(cached.times.tolist(), timeline.times.tolist())
+            self.assertEqual(cached.values.tolist(), timeline.values.tolist())
+            self.assertEqual(cached.duration, timeline.duration)
+
+            solar_timeline(10, 21, 0, 7 * 86400, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            with open(path, 'wb') as outfile:
+                outfile.write(b'not a cache')
+            self.assertEqual(solar_timeline(10, 20, 0, 7 * 86400, cache_dir=cache_dir).values.tolist(),
+                             timeline.values.tolist())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from g2vpico import G2VPico, Spectrum, SpectrumSolver
+from g2vpico.solver import design_matrix, load_profiles
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+CHANNEL_LIST = list(range(1, 9))
+RANGES = [[335 + 15 * channel, 375 + 15 * channel] for channel in CHANNEL_LIST]
+WAVELENGTHS = np.arange(350.0, 500.0, 1.0)
+
+class TestSpectrumSolver(unittest.TestCase):
+
+    def setUp(self):
+        self.solver = SpectrumSolver(CHANNEL_LIST, RANGES, [4000] * 8, WAVELENGTHS)
+
+    def test_design_matrix(self):
+        matrix = design_matrix([360, 380, 400], [[350, 370], [370, 390]])
+        self.assertEqual(matrix.tolist(), [[1, 0], [0, 1], [0, 0]])
+        self.assertIs(design_matrix([360, 380, 400], [[350, 370], [370, 390]]), matrix)
+
+    def test_fit_recovers_reachable_target(self):
+        values = np.array([0, 1000, 2000, 3000, 4000, 500, 0, 100])
+        spectrum = self.solver.fit(self.solver.predict(values))
+        self.assertIsInstance(spectrum, Spectrum)
+        np.testing.assert_allclose(spectrum.values, values, atol=2)
+
+    def test_fit_respects_limits(self):
+        solver = SpectrumSolver(CHANNEL_LIST, RANGES, [100, 200, 300, 400, 500, 600, 700, 0], WAVELENGTHS)
+        spectrum = solver.fit(np.full(WAVELENGTHS.size, 10.0))
+        self.assertEqual(spectrum.values.tolist(), [100, 200, 300, 400, 500, 600, 700, 0])
+
+        spectrum = solver.fit(np.full(WAVELENGTHS.size, -1.0))
+        self.assertEqual(spectrum.values.tolist(), [0] * 8)
+
+    def test_fit_many(self):
+        targets = np.stack([self.solver.predict(np.full(8, value)) for value in (0, 1000, 2000)])
+        values = self.solver.fit_many(targets)
+        self.assertEqual(values.shape, (3, 8))
+        np.testing.assert_allclose(values[:, 0], [0, 1000, 2000], atol=2)
+
+        with self.assertRaises(ValueError):
+            self.solver.fit_many(targets[:, :-1])
+
+    def test_profiles_replace_ranges(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'profiles.json')
+            with open(path, 'w') as outfile:
+                json.dump({'wavelengths': [350, 500], 'profiles': {'1': [1.0, 0.0]}}, outfile)
+
+            solver = SpectrumSolver(CHANNEL_LIST, RANGES, [4000] * 8, WAVELENGTHS, profiles=path)
+            self.assertAlmostEqual(solver.matrix[0, 0], 1.0)
+            self.assertAlmostEqual(solver.matrix[75, 0], 0.5)
+            self.assertEqual(solver.matrix[:, 1].tolist(), self.solver.matrix[:, 1].tolist())
+
+            with open(path, 'w') as outfile:
+                json.dump({'wavelengths': [350, 500], 'profiles': {'1': [1.0]}}, outfile)
+            with self.assertRaises(ValueError):
+                load_profiles(path)
+
+    def test_from_pico(self):
+        server = PicoSimulator()
+        pico = G2VPico('127.0.0.1', PICO_ID, port=server.start())
+        try:
+            wavelengths = np.arange(370.5, 530.0, 1.0)
+            solver = SpectrumSolver.from_pico(pico, wavelengths)
+            self.assertEqual(solver.channel_list, CHANNEL_LIST)
+            self.assertTrue(pico.set_spectrum_array(solver.fit(np.full(wavelengths.size, 0.5))))
+            self.assertEqual(server.values[2], 2000)
+        finally:
+            pico.close()
+            server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+
+import numpy as np
+
+from g2vpico import G2VPico, Spectrum
+from g2vpico.spectrum import clip_values
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestSpectrum(unittest.TestCase):
+
+    def test_values_are_read_only_uint16(self):
+        spectrum = Spectrum([1, 2, 3], [10, 20.4, 30])
+        self.assertEqual(spectrum.values.dtype, np.uint16)
+        self.assertEqual(spectrum.values.tolist(), [10, 20, 30])
+        with self.assertRaises(ValueError):
+            spectrum.values[0] = 5
+
+    def test_invalid_values(self):
+        with self.assertRaises(ValueError):
+            Spectrum([1, 2], [10])
+        with self.assertRaises(ValueError):
+            Spectrum([1], [-1])
+        with self.assertRaises(ValueError):
+            Spectrum([1], [70000])
+
+    def test_list_round_trip(self):
+        data = [{'channel': '1', 'value': 10}, {'channel': '4', 'value': 40}]
+        spectrum = Spectrum.from_list(json.dumps(data))
+        self.assertEqual(spectrum.to_list(), data)
+        self.assertEqual(Spectrum.from_list(spectrum.to_json()), spectrum)
+        self.assertEqual(list(spectrum), [(1, 10), (4, 40)])
+
+    def test_aligned(self):
+        spectrum = Spectrum([5, 2], [50, 20])
+        self.assertEqual(spectrum.aligned([1, 2, 3, 4, 5]).tolist(), [0, 20, 0, 0, 50])
+        with self.assertRaises(ValueError):
+            spectrum.aligned([1, 2, 3])
+
+    def test_clip_values(self):
+        clipped = clip_values([-5, 10.6, 5000, 7], [100, 100, 4000, None])
+        self.assertEqual(clipped.dtype, np.uint16)
+        self.assertEqual(clipped.tolist(), [0, 11, 4000, 7])
+        self.assertEqual(clip_values([70000, 65535.4], [None, np.nan]).tolist(), [65535, 65535])
+
+class TestSpectrumArray(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator()
+        self.pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.start())
+        self.server.commands.clear()
+
+    def tearDown(self):
+        self.pico.close()
+        self.server.stop()
+
+    def test_get_spectrum_array(self):
+        self.server.values.update({2: 200, 7: 700})
+        values = self.pico.get_spectrum_array()
+        self.assertEqual(values.dtype, np.uint16)
+        self.assertEqual(values.tolist(), [0, 200, 0, 0, 0, 0, 700, 0])
+
+    def test_set_spectrum_array_clips_to_limits(self):
+        self.assertTrue(self.pico.set_spectrum_array(np.array([-3, 1.4, 2, 3, 4, 5, 6, 9000])))
+        self.assertEqual([self.server.values[channel] for channel in range(1, 9)], [0, 1, 2, 3, 4, 5, 6, 4000])
+
+        self.server.commands.clear()
+        self.pico.set_spectrum_array(np.zeros(8))
+        self.assertEqual(list(self.server.commands), ['set_channel_value'] * 8)
+
+    def test_set_spectrum_array_without_clip(self):
+        with self.assertRaises(ValueError):
+            self.pico.set_spectrum_array(np.full(8, 5000), clip=False)
+        with self.assertRaisesRegex(ValueError, "whole numbers"):
+            self.pico.set_spectrum_array(np.full(8, 10.5), clip=False)
+        self.assertEqual(set(self.server.values.values()), {0})
+
+    def test_set_spectrum_array_shape(self):
+        with self.assertRaises(ValueError):
+            self.pico.set_spectrum_array(np.zeros(7))
+
+    def test_set_spectrum_from_spectrum(self):
+        self.pico.set_spectrum_array(Spectrum([3, 8], [30, 80]))
+        self.assertEqual(self.server.values[3], 30)
+        self.assertEqual(self.server.values[8], 80)
+        self.assertEqual(self.server.values[1], 0)
+
+    def test_set_spectrum_from_spectrum_keeps_other_channels(self):
+        self.pico.set_spectrum_array(np.full(8, 5))
+        self.server.commands.clear()
+        self.pico.set_spectrum_array(Spectrum([3, 8], [30, 80]))
+        self.assertEqual(list(self.server.commands), ['set_channel_value'] * 2)
+        self.assertEqual([self.server.values[channel] for channel in range(1, 9)], [5, 5, 30, 5, 5, 5, 5, 80])
+
+        with self.assertRaises(ValueError):
+            self.pico.set_spectrum_array(Spectrum([9], [1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import time
+import unittest
+
+import numpy as np
+
+from g2vpico import G2VPico, TelemetryPoller
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestTelemetryPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator(channels=4)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.port)
+        self.addCleanup(self.pico.close)
+
+    def test_sample(self):
+        poller = TelemetryPoller(self.pico, capacity=4)
+        self.assertIsNone(poller.latest())
+        self.server.values[2] = 200
+        self.server.global_intensity = 40.0
+        self.server.fixture_on = True
+        self.assertTrue(poller.sample())
+
+        sample = poller.latest()
+        self.assertEqual(sample.index, 0)
+        self.assertEqual(sample.values.tolist(), [0, 200, 0, 0])
+        self.assertEqual(sample.intensity, 40.0)
+        self.assertTrue(sample.fixture_on)
+        self.assertAlmostEqual(sample.time, time.time(), delta=1.0)
+        with self.assertRaises(ValueError):
+            sample.values[0] = 1
+
+    def test_ring_buffer_wraps(self):
+        poller = TelemetryPoller(self.pico, capacity=4)
+        buffers = [poller._values.ctypes.data, poller._times.ctypes.data]
+        for value in range(10):
+            self.server.values[1] = value
+            poller.sample()
+
+        self.assertEqual(len(poller), 4)
+        self.assertEqual(poller.count, 10)
+        parts = poller.views()
+        self.assertEqual(len(parts), 2)
+        self.assertTrue(all(np.shares_memory(part[1], poller._values) for part in parts))
+        self.assertEqual(np.concatenate([part[1][:, 0] for part in parts]).tolist(), [6, 7, 8, 9])
+
+        times, values, intensity, fixture_on = poller.history()
+        self.assertEqual(values[:, 0].tolist(), [6, 7, 8, 9])
+        self.assertTrue(np.all(np.diff(times) >= 0))
+        self.assertEqual(buffers, [poller._values.ctypes.data, poller._times.ctypes.data])
+
+    def test_views_before_wrapping(self):
+        poller = TelemetryPoller(self.pico, capacity=4)
+        self.assertEqual(poller.views(), [])
+        self.assertEqual(poller.history()[1].shape, (0, 4))
+        poller.sample()
+        poller.sample()
+        self.assertEqual(len(poller.views()), 1)
+        self.assertEqual(len(poller.views()[0][0]), 2)
+
+    def test_polling_thread(self):
+        with TelemetryPoller(self.pico, interval=0.01, capacity=100) as poller:
+            samples = []
+            for sample in poller.samples(timeout=1.0):
+                samples.append(sample.index)
+                if len(samples) == 5:
+                    break
+            self.assertTrue(poller.running)
+
+        self.assertFalse(poller.running)
+        self.assertEqual(samples, list(range(samples[0], samples[0] + 5)))
+        self.assertGreaterEqual(poller.lateness.count, 4)
+        self.assertEqual(poller.errors, 0)
+
+    def test_stall_does_not_burst(self):
+        poller = TelemetryPoller(self.pico, interval=0.02, capacity=100)
+        sample = poller.sample
+        def stall_once():
+            if poller.count == 3:
+                time.sleep(0.3)
+            return sample()
+        poller.sample = stall_once
+
+        with poller:
+            for polled in poller.samples(timeout=1.0):
+                if polled.index == 12:
+                    break
+
+        self.assertGreaterEqual(poller.skipped, 10)
+        gaps = np.diff(poller.history()[0][3:13])
+        # only the poll right after the stall may come early, at the next deadline
+        self.assertLessEqual(np.count_nonzero(gaps < 0.01), 1)
+
+    def test_stop_is_prompt(self):
+        poller = TelemetryPoller(self.pico, interval=10.0)
+        poller.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        poller.stop()
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(poller.count, 1)
+
+    def test_errors_are_counted(self):
+        poller = TelemetryPoller(self.pico)
+        self.server.api_enabled = False
+        self.assertFalse(poller.sample())
+        self.assertEqual(poller.errors, 1)
+        self.assertIsInstance(poller.last_error, RuntimeError)
+        self.assertEqual(poller.count, 0)
+
+if __name__ == '__main__':
+    unittest.main()
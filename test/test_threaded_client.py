@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import json
+import socket
+import threading
+import time
+import unittest
+
+from g2vpico import ThreadSafeG2VPico
+from g2vpico.protocol import MessageDecoder
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, Faults, PicoSimulator
+
+class TestThreadSafeG2VPico(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.pico = ThreadSafeG2VPico('127.0.0.1', PICO_ID, port=self.server.port)
+        self.addCleanup(self.pico.close)
+
+    def test_metadata(self):
+        self.assertEqual(self.pico.channel_count, 8)
+        self.assertEqual(self.pico.channel_list, list(range(1, 9)))
+
+    def test_blocking_methods(self):
+        self.assertTrue(self.pico.set_channel_value(2, 200))
+        self.assertEqual(self.pico.get_channel_value(2), 200)
+        self.assertEqual(self.pico.get_channel_limit(2), 4000)
+        self.assertTrue(self.pico.set_spectrum([{'channel': '3', 'value': 30}]))
+        self.assertEqual(self.pico.get_spectrum()[2], {'channel': '3', 'value': 30})
+        self.assertTrue(self.pico.clear_channels())
+        self.assertEqual(set(self.server.values.values()), {0})
+        self.assertTrue(self.pico.turn_off())
+        self.assertFalse(self.pico.is_fixture_on())
+        self.assertTrue(self.pico.set_global_intensity(40.0))
+        self.assertEqual(self.pico.get_global_intensity(), 40.0)
+
+    def test_futures_are_matched_in_order(self):
+        futures = [self.pico.submit_set_channel_value(1 + index % 8, index) for index in range(100)]
+        reads = [self.pico.submit_get_channel_value(channel) for channel in range(1, 9)]
+        self.assertTrue(all(future.result() for future in futures))
+        self.assertEqual([future.result() for future in reads], [96, 97, 98, 99, 92, 93, 94, 95])
+
+    def test_many_threads_share_the_connection(self):
+        errors = []
+        def worker(channel):
+            try:
+                for value in range(50):
+                    self.pico.set_channel_value(channel, value)
+                    if self.pico.get_channel_value(channel) != value:
+                        errors.append((channel, value))
+                    self.pico.is_fixture_on()
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(channel,)) for channel in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.server.values[5], 49)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.pico.submit_get_channel_value(99)
+
+        self.server.api_enabled = False
+        with self.assertRaises(RuntimeError):
+            self.pico.get_channel_value(1)
+        self.server.api_enabled = True
+        self.assertEqual(self.pico.get_channel_value(1), 0)
+
+    def test_batch(self):
+        with self.pico.batch() as batch:
+            batch.set_channel_value(4, 40)
+            batch.get_channel_value(4)
+        self.assertEqual(batch.results, [True, 40])
+
+    def test_close_fails_pending_commands(self):
+        self.server.latency = 0.2
+        future = self.pico.submit_get_channel_value(1)
+        self.pico.close()
+        with self.assertRaises(ConnectionError):
+            future.result(timeout=1)
+        with self.assertRaises(ConnectionError):
+            self.pico.submit_turn_on().result(timeout=1)
+
+    def test_connection_reset(self):
+        # the connection is reset at the first command after reading the channel list
+        self.server.faults = Faults(reset_after=3)
+        pico = ThreadSafeG2VPico('127.0.0.1', PICO_ID, port=self.server.port)
+        self.addCleanup(pico.close)
+
+        futures = [pico.submit_get_global_intensity() for _ in range(3)]
+        for future in futures:
+            with self.assertRaises(ConnectionError):
+                future.result(timeout=2)
+        with self.assertRaises(ConnectionError):
+            pico.is_fixture_on()
+    def test_slow_reader(self):
+        # a peer that stops reading after the metadata, until the client has filled its send buffer
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        self.addCleanup(listener.close)
+
+        def serve():
+            connection, _ = listener.accept()
+            with connection:
+                decoder = MessageDecoder()
+                answered = 0
+                while True:
+                    data = connection.recv(65536)
+                    if not data:
+                        return
+                    decoder.feed(data)
+                    for cmd in decoder.messages():
+                        connection.sendall(json.dumps(self.server.reply(cmd)).encode('utf-8'))
+                        answered += 1
+                        if answered == 2:
+                            time.sleep(0.5)
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        pico = ThreadSafeG2VPico('127.0.0.1', PICO_ID, port=listener.getsockname()[1])
+        self.addCleanup(pico.close)
+        pico._socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+
+        futures = [pico.submit_set_channel_value(1 + index % 8, index) for index in range(3000)]
+        self.assertTrue(all(future.result(timeout=10) for future in futures))
+        self.assertEqual(self.server.values[8], 2999)
+
+        pico.close()
+        thread.join(2)
+
+if __name__ == '__main__':
+    unittest.main()
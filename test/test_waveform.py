@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import numpy as np
+
+from g2vpico import G2VPico
+from g2vpico.waveform import (PiecewiseLinear, Samples, Sawtooth, Sine, Square, Timeline, Triangle,
+                              WaveformPlayer, build_timeline)
+from g2vpico.simulator import DEFAULT_PICO_ID as PICO_ID, PicoSimulator
+
+class TestWaveform(unittest.TestCase):
+
+    def test_sawtooth_timeline(self):
+        timeline = Sawtooth(period=1.0, steps=4, trough=20, peak=60).timeline(cycles=2)
+        self.assertEqual(timeline.times.tolist(), [0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75])
+        self.assertEqual(timeline.values.tolist(), [20, 30, 40, 50, 20, 30, 40, 50])
+        self.assertEqual(timeline.duration, 2.0)
+
+    def test_square_drops_duplicate_steps(self):
+        timeline = Square(period=1.0, steps=100, trough=0, peak=100, duty=0.25).timeline(cycles=3)
+        self.assertEqual(len(timeline), 6)
+        self.assertEqual(list(timeline)[:2], [(0.0, 100.0), (0.25, 0.0)])
+
+    def test_quantization(self):
+        timeline = Sine(period=1.0, steps=1000, trough=0, peak=1).timeline(resolution=0.1)
+        self.assertTrue(np.all(np.diff(timeline.values) != 0))
+        self.assertEqual(sorted(set(timeline.values.tolist())), [round(0.1 * step, 1) for step in range(11)])
+
+    def test_quantization_off_power_of_ten(self):
+        timeline = build_timeline([0, 1, 2, 3, 4], [0.25, 0.74, 1.3, 1.2, 0.6], 5, resolution=0.25)
+        self.assertEqual(timeline.values.tolist(), [0.25, 0.75, 1.25, 0.5])
+        self.assertEqual(timeline.times.tolist(), [0, 1, 2, 4])
+        self.assertEqual(build_timeline([0, 1], [7.4, 12.6], 2, resolution=5).values.tolist(), [5, 15])
+
+    def test_triangle(self):
+        timeline = Triangle(period=4.0, steps=4, trough=0, peak=100).timeline()
+        self.assertEqual(timeline.values.tolist(), [0, 50, 100, 50])
+
+    def test_piecewise_linear(self):
+        waveform = PiecewiseLinear([(0, 10), (1, 30), (2, 10)], steps=4)
+        self.assertEqual(waveform.period, 2.0)
+        self.assertEqual(waveform.timeline(resolution=1).values.tolist(), [10, 20, 30, 20])
+
+    def test_samples(self):
+        timeline = Samples([5, 5, 7, 7, 5], interval=0.5).timeline(cycles=2, resolution=1)
+        self.assertEqual(timeline.times.tolist(), [0, 1.0, 2.0, 3.5, 4.5])
+        self.assertEqual(timeline.values.tolist(), [5, 7, 5, 7, 5])
+
+    def test_invalid_timeline(self):
+        with self.assertRaises(ValueError):
+            Timeline([0, 2, 1], [1, 2, 3], 3)
+        with self.assertRaises(ValueError):
+            build_timeline([0, 1], [1], 2)
+        with self.assertRaises(ValueError):
+            Sine(period=0, steps=4)
+
+class TestWaveformPlayer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PicoSimulator()
+        self.pico = G2VPico('127.0.0.1', PICO_ID, port=self.server.start())
+        self.server.commands.clear()
+
+    def tearDown(self):
+        self.pico.close()
+        self.server.stop()
+
+    def test_play_sends_only_changes(self):
+        timeline = Square(period=0.05, steps=50, trough=10, peak=90).timeline(cycles=2)
+        stats = WaveformPlayer(self.pico, timeline).play()
+
+        self.assertEqual(list(self.server.commands), ['set_global_intensity'] * 4)
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(self.server.global_intensity, 10.0)
+
+    def test_play_on_channel(self):
+        timeline = Sawtooth(period=0.04, steps=4, trough=0, peak=400).timeline(resolution=1)
+        WaveformPlayer(self.pico, timeline, channel=3).play()
+        self.assertEqual(self.server.values[3], 300)
+
+    def test_channel_rounds_sub_integer_steps(self):
+        timeline = Timeline([0, 0.005, 0.01, 0.015, 0.02, 0.025], [0, 0.4, 0.6, 1.2, 1.6, 2.4], 0.03)
+        player = WaveformPlayer(self.pico, timeline, channel=3)
+        self.server.commands.clear()
+        stats = player.play()
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(list(self.server.commands), ['set_channel_value'] * 3)
+        self.assertEqual(self.server.values[3], 2)
+
+if __name__ == '__main__':
+    unittest.main()